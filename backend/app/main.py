@@ -13,6 +13,7 @@ from fastapi.responses import JSONResponse
 from app.schemas import (
     TranslateRequest, TranslateResponse, ProcessResponse,
     GroqSuggestRequest, GroqSuggestResponse,
+    FeedbackRequest, FeedbackResponse,
     SendIntentRequest, SendIntentResponse,
     SendConfirmRequest, SendConfirmResponse,
 )
@@ -33,11 +34,53 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# ---------- warm-up ----------
+@app.on_event("startup")
+def _warmup_model():
+    # carrega o classificador no boot (evita o pico de latência na 1ª requisição)
+    if os.getenv("MODEL_WARMUP", "true").lower() in ("1", "true", "yes"):
+        from app.nlp.classify import _load_model
+        _load_model()
+
+@app.on_event("shutdown")
+async def _close_pools():
+    # fecha o cliente PostgREST assíncrono vigente (conexões HTTP/2 do pool) no loop da API
+    from app.services.supabase_async import close_supabase_async
+    await close_supabase_async()
+
 # ---------- health ----------
 @app.get("/health")
 def health():
     return {"status": "ok"}
 
+# ---------- métricas (caches do pipeline) ----------
+@app.get("/api/metrics")
+def api_metrics():
+    # lazy imports
+    from app.services.result_cache import cache_stats
+    from app.services.pdf_reader import pdf_cache_stats
+    from app.services.draft_cache import draft_cache_stats
+    from app.services.draft_pregen import pregen_stats
+    from app.services.groq_client import groq_stats
+    from app.services.supabase_async import pool_config
+    from app.services.email_cache import email_cache_stats
+    from app.services.http_cache import response_cache_stats
+    from app.nlp import classify
+
+    out = {
+        "result_cache": cache_stats(),
+        "pdf_cache": pdf_cache_stats(),
+        "draft_cache": draft_cache_stats(),
+        "email_cache": email_cache_stats(),
+        "response_cache": response_cache_stats(),
+        "draft_pregen": pregen_stats(),
+        "groq": groq_stats(),
+        "supabase_pool": pool_config(),
+    }
+    if classify.online is not None:
+        out["online_model"] = classify.online.online_stats()
+    return out
+
 # ---------- helpers ----------
 def _mask(email: str) -> str:
     try:
@@ -48,6 +91,14 @@ def _mask(email: str) -> str:
     except Exception:
         return "***"
 
+def _is_uuid(value: str) -> bool:
+    import uuid
+    try:
+        uuid.UUID(value)
+        return True
+    except ValueError:
+        return False
+
 # ---------- translate ----------
 @app.post("/api/translate", response_model=TranslateResponse)
 def api_translate(payload: TranslateRequest):
@@ -70,6 +121,7 @@ async def api_process(
     file: Optional[UploadFile] = File(None),
 ):
     # lazy imports
+    from fastapi.concurrency import run_in_threadpool
     from app.services.pdf_reader import extract_text_from_pdf
     from app.pipeline import process_raw_email
 
@@ -82,13 +134,13 @@ async def api_process(
         fname = (file.filename or "").lower()
         ctype = (file.content_type or "").lower()
         if fname.endswith(".pdf") or "pdf" in ctype:
-            body_text = extract_text_from_pdf(content)
+            body_text = await run_in_threadpool(extract_text_from_pdf, content)
         elif fname.endswith(".txt"):
             body_text = content.decode(errors="ignore")
         else:
             raise HTTPException(400, detail="Apenas .pdf ou .txt no upload de arquivo.")
 
-    data = process_raw_email(subject or "", body_text, body_html, attachments)
+    data = await run_in_threadpool(process_raw_email, subject or "", body_text, body_html, attachments)
     return ProcessResponse(**data)
 
 # ---------- ingest (só processa e mostra, sem salvar) ----------
@@ -96,17 +148,21 @@ async def api_process(
 def api_ingest_from_inbox(limit: int = 5):
     # lazy imports
     from app.services.email_ingest import fetch_unread
-    from app.pipeline import process_raw_email
+    from app.services.attachments import release_attachments
+    from app.pipeline import translate_email, process_translated_texts
 
-    items = []
+    translated = []
     for raw in fetch_unread(limit=limit):
-        data = process_raw_email(
-            subject=raw["subject"],
-            body_text=raw["text"],
-            body_html=raw["html"],
-            attachments=raw["attachments"],
-        )
-        items.append(data)
+        try:
+            translated.append(translate_email(raw["subject"], raw["text"], raw["html"], raw["attachments"]))
+        finally:
+            release_attachments(raw["attachments"])
+    # classificação do lote inteiro numa chamada só
+    results = process_translated_texts([t["doc"] for t in translated])
+    items = [
+        {"subject": t["subject"], "text": t["text"], "result": r}
+        for t, r in zip(translated, results)
+    ]
     return JSONResponse(content={
         "count": len(items),
         "items": [ProcessResponse(**it).model_dump() for it in items]
@@ -114,154 +170,301 @@ def api_ingest_from_inbox(limit: int = 5):
 
 # ---------- ingest + salvar no Supabase ----------
 @app.post("/api/ingest-and-save")
-def api_ingest_and_save(limit: int = 5):
+def api_ingest_and_save(limit: int = 5, incremental: bool = False):
     # lazy imports
-    from app.pipeline import translate_email, process_translated_text
-    from app.nlp.summarize import summarize
-    from app.services.importance import compute_importance
-    from app.services.store_email import save_email_pack
+    from app.services.email_ingest import fetch_unread, fetch_incremental
+    from app.services.ingest_runner import run_ingest
 
     items = []
-    from app.services.email_ingest import fetch_unread
-
-    for raw in fetch_unread(limit=limit):
-        t = translate_email(raw["subject"], raw["text"], raw["html"], raw["attachments"])
-        result = process_translated_text(t["subject"], t["text"])
-
-        summary = summarize(t["text"])
-        importance, label, reasons = compute_importance(
-            meta={
-                "subject": raw["subject"],
-                "from_email": raw.get("from_email") or raw.get("from_addr", ""),
-                "attachments": raw["attachments"],
-                "received_at": raw.get("received_at"),
-            },
-            text=t["text"],
-            category=result.category,
-        )
-
-        lite_attachments = [
-            {"filename": a.get("filename"), "content_type": a.get("content_type"), "size": a.get("size")}
-            for a in raw["attachments"]
-        ]
-
-        pack = {
-            "message_uid": raw["message_uid"],
-            "subject": raw["subject"],
-            "from_email": raw.get("from_email") or raw.get("from_addr"),
-            "from_name": raw.get("from_name", ""),
-            "to_emails": raw.get("to_emails", []),
-            "cc_emails": raw.get("cc_emails", []),
-            "received_at": raw.get("received_at"),
-            "category": result.category,
-            "confidence": float(result.confidence),
-            "importance": importance,
-            "importance_label": label,
-            "importance_reasons": reasons,
-            "summary": summary,
-            "reply_suggested": result.reply,
-            "has_pdf": bool(t["has_pdf_text"]),
-            "body_text": t["text"],
-            "body_html": raw["html"],
-            "attachments": lite_attachments,
+    source = fetch_incremental(limit=limit) if incremental else fetch_unread(limit=limit)
+    saved = 0
+    saved_uids = []
+    for uid, pack, res in run_ingest(source):
+        item = {
+            "email_id": res["email_id"],
+            "subject": pack["subject"],
+            "category": pack["category"],
+            "importance": pack["importance"],
+            "label": pack["importance_label"]
         }
+        if res["error"]:
+            item["error"] = res["error"]
+        else:
+            saved += 1
+            saved_uids.append(uid)
+        items.append(item)
 
-        email_id = save_email_pack(pack)
-        items.append({
-            "email_id": email_id,
-            "subject": raw["subject"],
-            "category": result.category,
-            "importance": importance,
-            "label": label
-        })
+    if incremental:
+        source.commit(saved_uids)  # checkpoint/\Seen só depois de gravar
 
-    return {"saved": len(items), "items": items}
+    return {"saved": saved, "items": items}
 
 # ---------- listar/detalhar e-mails do Supabase ----------
 @app.get("/api/emails")
-def list_emails(
+async def list_emails(
+    request: Request,
     limit: int = Query(50, ge=1, le=200),
-    page: int = Query(1, ge=1),
+    cursor: str | None = None,       # next_cursor da página anterior (opaco)
+    fields: str | None = None,       # colunas separadas por vírgula, "*" = todas; padrão EMAIL_LIST_FIELDS
+    page: int | None = Query(None, ge=1),  # legado (OFFSET); ignorado quando há cursor
     importance: str | None = None,   # low|normal|high|urgent
     category: str | None = None,     # Produtivo|Improdutivo
     search: str | None = None,
 ):
-    from app.services.supabase_client import get_supabase
+    from app.services.supabase_async import get_supabase_async
+    from app.services.email_list import parse_fields, apply_cursor, page_from_rows
+    from app.services.http_cache import conditional_json
+    from app.services import generation
 
-    sb = get_supabase()
-    q = sb.table("emails").select("*").order("received_at", desc=True)
+    try:
+        columns = parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+    sb = get_supabase_async()
+    q = sb.table("emails").select(columns)
     if importance: q = q.eq("importance_label", importance)
     if category:   q = q.eq("category", category)
     if search:     q = q.ilike("subject", f"%{search}%")
 
-    start = (page - 1) * limit
-    end = start + limit - 1
-    q = q.range(start, end)
-
-    res = q.execute()
-    return {"items": res.data or [], "page": page, "limit": limit}
+    try:
+        q = apply_cursor(q, cursor)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+    page = None if cursor else page
+
+    async def _build():
+        if page:
+            start = (page - 1) * limit
+            res = await q.range(start, start + limit).execute()
+            out = page_from_rows(res.data or [], limit)
+            out["page"] = page
+            return out
+        res = await q.limit(limit + 1).execute()
+        return page_from_rows(res.data or [], limit)
+
+    # chave = parâmetros já normalizados (colunas resolvidas, page descartado com cursor)
+    key = ("emails", limit, cursor, columns, page, importance, category, search)
+    return await conditional_json(request, key, (generation.EMAILS,), _build)
+
+@app.get("/api/search")
+async def api_search(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=50),
+    page: int = Query(1, ge=1, le=50),
+    importance: str | None = None,
+    category: str | None = None,
+):
+    # busca textual com ranking (assunto/resumo/corpo), sem acento, trecho com <mark>
+    from app.services.search import search_emails
+    return await search_emails(q, limit, page, category=category, importance=importance)
 
 @app.get("/api/emails/{email_id}")
-def get_email(email_id: str):
-    from app.services.supabase_client import get_supabase
-    sb = get_supabase()
+async def get_email(email_id: str, request: Request):
+    import asyncio
+    from app.services.email_cache import fetch_email
+    from app.services.draft_cache import latest_for_email
+    from app.services.http_cache import conditional_json
+    from app.services import generation
+
+    async def _build():
+        # meta + conteúdo numa consulta (id ou message_uid, com cache); com id em mãos o
+        # rascunho vigente (pré-gerado ou sob demanda) vem em paralelo
+        email, draft = await asyncio.gather(
+            fetch_email(email_id),
+            latest_for_email(email_id) if _is_uuid(email_id) else asyncio.sleep(0),
+        )
+        if not email:
+            raise HTTPException(404, f"email não encontrado: {email_id}")
+        if email["meta"]["id"] != email_id:  # achado pelo message_uid
+            draft = await latest_for_email(email["meta"]["id"])
+        return {"meta": email["meta"], "content": email["content"], "draft": draft}
+
+    # o detalhe muda com o e-mail (feedback, regravação) e com o rascunho (draft_cache)
+    return await conditional_json(request, ("email", email_id), (generation.EMAILS, generation.DRAFTS), _build)
+
+
 
-    meta = sb.table("emails").select("*").eq("id", email_id).limit(1).execute().data
-    meta = meta[0] if meta else None
-    if not meta:
-        meta2 = sb.table("emails").select("*").eq("message_uid", email_id).limit(1).execute().data
-        meta = meta2[0] if meta2 else None
+# ---------- Groq: sugestão de resposta ----------
+async def _suggest_input(payload: GroqSuggestRequest):
+    from app.services.email_cache import fetch_email
 
-    if not meta:
-        raise HTTPException(404, f"email não encontrado: {email_id}")
+    subject = payload.subject or ""
+    text = payload.text or ""
+    email_id = None
 
-    real_id = meta["id"]
-    content = sb.table("email_contents").select("*").eq("email_id", real_id).limit(1).execute().data
-    return {"meta": meta, "content": (content[0] if content else None)}
+    if payload.email_id:
+        email = await fetch_email(payload.email_id)  # em geral já no cache (página de detalhe)
+        if not email:
+            raise HTTPException(404, "email_id não encontrado")
+        email_id = email["meta"]["id"]
+        subject = subject or email["meta"].get("subject") or ""
+        content = email["content"] or {}
+        if content.get("body_text"):
+            text = text or content["body_text"]
 
+    if not (subject or text):
+        raise HTTPException(400, "forneça email_id ou subject/text")
+    return subject, text, email_id
 
+def _sse(event: str, data: dict) -> str:
+    import json
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
 
-# ---------- Groq: sugestão de resposta ----------
 @app.post("/api/groq/suggest", response_model=GroqSuggestResponse)
-def api_groq_suggest(payload: GroqSuggestRequest):
+async def api_groq_suggest(payload: GroqSuggestRequest):
     # lazy imports
-    from app.services.supabase_client import get_supabase
+    from fastapi.concurrency import run_in_threadpool
     from app.nlp.classify import classify_productive
-    from app.services.groq_client import suggest_with_groq
+    from app.services.groq_client import suggest_with_fallback, build_request, prompt_hash
+    from app.services.draft_cache import get_draft, put_draft
+
+    # Supabase (cliente assíncrono) e Groq (AsyncGroq) no event loop; classificador no threadpool
+    subject, text, email_id = await _suggest_input(payload)
+    category, confidence, _ = await run_in_threadpool(classify_productive, text or subject)
+
+    # mesmo (modelo, prompt) já respondido: devolve o rascunho guardado
+    model, messages = build_request(subject, text)
+    phash = prompt_hash(model, messages)
+    draft = await run_in_threadpool(get_draft, model, phash)
+    source = "cache"
+    if draft is None:
+        draft, source = await suggest_with_fallback(subject, text, category)
+        if source == "groq":  # template (fallback) não vai para o cache
+            await run_in_threadpool(put_draft, model, phash, draft, email_id)
+    return GroqSuggestResponse(
+        draft_reply=draft, category=category, confidence=float(confidence),
+        cached=source == "cache", source=source,
+    )
+
+@app.post("/api/groq/suggest/stream")
+async def api_groq_suggest_stream(payload: GroqSuggestRequest):
+    # SSE: "meta" (categoria), "delta" a cada pedaço de texto da Groq, "done" com o rascunho
+    # completo e a origem (groq|cache|template) ou "error". O usuário espera só o primeiro
+    # token, não a completion inteira. Sem Groq antes do 1º token => template.
+    # lazy imports
+    from fastapi.concurrency import run_in_threadpool
+    from fastapi.responses import StreamingResponse
+    from app.nlp.classify import classify_productive
+    from app.services.groq_client import (
+        stream_async, build_request, prompt_hash, template_reply, record_fallback, GroqUnavailable,
+    )
+    from app.services.draft_cache import get_draft, put_draft
+
+    subject, text, email_id = await _suggest_input(payload)
+    category, confidence, _ = await run_in_threadpool(classify_productive, text or subject)
+    model, messages = build_request(subject, text)
+    phash = prompt_hash(model, messages)
+    cached_draft = await run_in_threadpool(get_draft, model, phash)
+
+    async def _events():
+        yield _sse("meta", {"category": category, "confidence": float(confidence), "cached": cached_draft is not None})
+        if cached_draft is not None:
+            yield _sse("delta", {"text": cached_draft})
+            yield _sse("done", {"draft": cached_draft, "source": "cache"})
+            return
+        parts: List[str] = []
+        try:
+            async for delta in stream_async(subject, text):
+                parts.append(delta)
+                yield _sse("delta", {"text": delta})
+        except GroqUnavailable as e:
+            if parts:
+                yield _sse("error", {"detail": str(e)})
+                return
+            record_fallback(e.reason)
+            draft = template_reply(category, text or subject)
+            yield _sse("delta", {"text": draft})
+            yield _sse("done", {"draft": draft, "source": "template"})
+            return
+        draft = "".join(parts).strip()
+        await run_in_threadpool(put_draft, model, phash, draft, email_id)  # só completion inteira
+        yield _sse("done", {"draft": draft, "source": "groq"})
+
+    return StreamingResponse(
+        _events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# ---------- feedback: correção de rótulo (aprendizado incremental) ----------
+@app.post("/api/feedback", response_model=FeedbackResponse)
+def api_feedback(payload: FeedbackRequest):
+    # lazy imports
+    from app.services.supabase_client import get_supabase
+    from app.services.email_cache import invalidate_email
+    from app.services import generation
+    from app.nlp import online
+
+    if payload.label not in online.CLASSES:
+        raise HTTPException(400, f"label inválido: use {', '.join(online.CLASSES)}")
 
     sb = get_supabase()
     subject = payload.subject or ""
     text = payload.text or ""
+    previous = None
 
     if payload.email_id:
-        meta = sb.table("emails").select("subject,id").eq("id", payload.email_id).limit(1).execute().data
+        meta = sb.table("emails").select("id,subject,category").eq("id", payload.email_id).limit(1).execute().data
         if not meta:
             raise HTTPException(404, "email_id não encontrado")
         subject = subject or meta[0]["subject"] or ""
-        content = sb.table("email_contents").select("body_text").eq("email_id", payload.email_id).limit(1).execute().data
-        if content and content[0].get("body_text"):
-            text = text or content[0]["body_text"]
-
-    if not (subject or text):
+        previous = meta[0].get("category")
+        if not text:
+            content = sb.table("email_contents").select("body_text").eq("email_id", payload.email_id).limit(1).execute().data
+            if content and content[0].get("body_text"):
+                text = content[0]["body_text"]
+
+    text = text or subject
+    if not text:
         raise HTTPException(400, "forneça email_id ou subject/text")
 
-    category, confidence, _ = classify_productive(text or subject)
-    draft = suggest_with_groq(subject, text)
-    return GroqSuggestResponse(draft_reply=draft, category=category, confidence=float(confidence))
+    # log durável (scripts/apply_feedback.py reaplica o que ficou pendente)
+    ins = sb.table("label_feedback").insert({
+        "email_id": payload.email_id,
+        "label": payload.label,
+        "previous_category": previous,
+        "text": text,
+    }).execute()
+    feedback_id = ins.data[0].get("id") if getattr(ins, "data", None) else None
+    if payload.email_id and previous != payload.label:
+        sb.table("emails").update({"category": payload.label}).eq("id", payload.email_id).execute()
+        invalidate_email(payload.email_id)
+        generation.bump(generation.EMAILS)
+
+    pending, version, applied = online.add_feedback(text, payload.label, feedback_id)
+    if applied:
+        from datetime import datetime, timezone
+        sb.table("label_feedback").update({
+            "applied_at": datetime.now(timezone.utc).isoformat(),
+            "model_version": version,
+        }).in_("id", applied).execute()
+
+    return FeedbackResponse(recorded=True, pending=pending, checkpoint_version=version)
 
 # ---------- OTP: solicitar envio ----------
 @app.post("/api/send-intent", response_model=SendIntentResponse)
-def api_send_intent(payload: SendIntentRequest, request: Request):
+async def api_send_intent(payload: SendIntentRequest, request: Request):
     # lazy imports
-    from app.services.supabase_client import get_supabase
+    import asyncio
+    from fastapi.concurrency import run_in_threadpool
+    from app.services.supabase_async import get_supabase_async
+    from app.services.email_cache import fetch_email
     from app.services.rate_limit import check_email_quota, check_ip_rate
     from app.services.otp import generate_otp, hash_otp
     from app.services.mailer import send_email
 
-    sb = get_supabase()
+    sb = get_supabase_async()
+
+    # destinatário permitido e e-mail de origem: consultas independentes, em paralelo
+    allow, email = await asyncio.gather(
+        sb.table("allowed_recipients").select("email,is_active").eq("email", payload.to_email.lower()).limit(1).execute(),
+        fetch_email(payload.email_id),
+    )
+    allow = allow.data
 
     # allowed recipient?
-    allow = sb.table("allowed_recipients").select("email,is_active").eq("email", payload.to_email.lower()).limit(1).execute().data
     if not allow or not allow[0]["is_active"]:
         raise HTTPException(400, "destinatário não permitido")
 
@@ -274,9 +477,9 @@ def api_send_intent(payload: SendIntentRequest, request: Request):
     if not ok_em:
         raise HTTPException(429, f"quota de destino: {why_em}")
 
-    meta = sb.table("emails").select("id,subject").eq("id", payload.email_id).limit(1).execute().data
-    if not meta:
+    if not email:
         raise HTTPException(404, "email_id não encontrado")
+    email_id = email["meta"]["id"]  # aceita message_uid, mas o token guarda o id
 
     # OTP
     otp = generate_otp()
@@ -286,7 +489,7 @@ def api_send_intent(payload: SendIntentRequest, request: Request):
     expires_at = datetime.now(timezone.utc) + timedelta(minutes=ttl_min)
 
     token_row = {
-        "email_id": payload.email_id,
+        "email_id": email_id,
         "to_email": payload.to_email.lower(),
         "otp_hash": f"{salt}${otp_hash}",
         "expires_at": expires_at.isoformat(),
@@ -295,7 +498,7 @@ def api_send_intent(payload: SendIntentRequest, request: Request):
         "requester_ua": request.headers.get("user-agent", ""),
     }
 
-    ins = sb.table("send_tokens").insert(token_row).execute()
+    ins = await sb.table("send_tokens").insert(token_row).execute()
     request_id = None
     if getattr(ins, "data", None):
         try:
@@ -303,7 +506,7 @@ def api_send_intent(payload: SendIntentRequest, request: Request):
         except Exception:
             request_id = None
     if not request_id:
-        sel = sb.table("send_tokens").select("id").eq("email_id", payload.email_id)\
+        sel = await sb.table("send_tokens").select("id").eq("email_id", email_id)\
             .eq("to_email", payload.to_email.lower()).order("created_at", desc=True).limit(1).execute()
         if not sel.data:
             raise HTTPException(500, "falha ao registrar token")
@@ -313,26 +516,29 @@ def api_send_intent(payload: SendIntentRequest, request: Request):
         if os.getenv("DRY_RUN_EMAIL", "").lower() in ("1", "true", "yes"):
             print(f"[DRY_RUN] OTP {otp} para {payload.to_email} (request_id={request_id})")
         else:
-            send_email(
+            await run_in_threadpool(  # SMTP é bloqueante
+                send_email,
                 to_email=payload.to_email,
                 subject="Código de confirmação (OTP)",
                 body=f"Seu código para confirmar o envio é: {otp}\nEste código expira em {ttl_min} minutos.\n\nRef: {request_id}",
             )
     except Exception as e:
-        sb.table("send_tokens").update({"status": "blocked"}).eq("id", request_id).execute()
+        await sb.table("send_tokens").update({"status": "blocked"}).eq("id", request_id).execute()
         raise HTTPException(502, f"falha ao enviar OTP: {type(e).__name__}")
 
     return SendIntentResponse(request_id=request_id, masked_to=_mask(payload.to_email))
 
 @app.post("/api/send-confirm", response_model=SendConfirmResponse)
-def api_send_confirm(payload: SendConfirmRequest, background: BackgroundTasks):
-    from app.services.supabase_client import get_supabase
+async def api_send_confirm(payload: SendConfirmRequest, background: BackgroundTasks):
+    from fastapi.concurrency import run_in_threadpool
+    from app.services.supabase_async import get_supabase_async
+    from app.services.email_cache import fetch_email
     from app.services.otp import verify_otp
     from app.services.mailer import send_email
 
-    sb = get_supabase()
+    sb = get_supabase_async()
 
-    row = sb.table("send_tokens").select("*").eq("id", payload.request_id).limit(1).execute().data
+    row = (await sb.table("send_tokens").select("*").eq("id", payload.request_id).limit(1).execute()).data
     if not row:
         raise HTTPException(404, "request_id inválido")
     tok = row[0]
@@ -341,12 +547,12 @@ def api_send_confirm(payload: SendConfirmRequest, background: BackgroundTasks):
     if tok["status"] != "pending":
         raise HTTPException(400, f"status atual: {tok['status']}")
     if datetime.fromisoformat(tok["expires_at"].replace("Z","")).astimezone(timezone.utc) < datetime.now(timezone.utc):
-        sb.table("send_tokens").update({"status":"expired"}).eq("id", payload.request_id).execute()
+        await sb.table("send_tokens").update({"status":"expired"}).eq("id", payload.request_id).execute()
         raise HTTPException(400, "token expirado")
 
     attempts = int(tok.get("attempts", 0))
     if attempts >= 5:
-        sb.table("send_tokens").update({"status":"blocked"}).eq("id", payload.request_id).execute()
+        await sb.table("send_tokens").update({"status":"blocked"}).eq("id", payload.request_id).execute()
         raise HTTPException(400, "muitas tentativas")
 
     try:
@@ -354,23 +560,23 @@ def api_send_confirm(payload: SendConfirmRequest, background: BackgroundTasks):
     except Exception:
         raise HTTPException(500, "token malformado")
     if not verify_otp(payload.otp, salt, otp_hash):
-        sb.table("send_tokens").update({"attempts": attempts+1}).eq("id", payload.request_id).execute()
+        await sb.table("send_tokens").update({"attempts": attempts+1}).eq("id", payload.request_id).execute()
         raise HTTPException(400, "código inválido")
 
-    sb.table("send_tokens").update({"status":"used"}).eq("id", payload.request_id).execute()
+    await sb.table("send_tokens").update({"status":"used"}).eq("id", payload.request_id).execute()
 
-    meta = sb.table("emails").select("subject").eq("id", tok["email_id"]).limit(1).execute().data
-    subject = (meta[0]["subject"] if meta else "Resposta")
+    email = await fetch_email(tok["email_id"])  # mesmo e-mail do send-intent: em geral no cache
+    subject = (email["meta"].get("subject") if email else None) or "Resposta"
     draft = tok["draft_snapshot"]
     to_email = tok["to_email"]
 
-    def _do_send():
+    async def _do_send():
         import time
         t0 = time.time()
         try:
-            provider_id = send_email(to_email, f"RE: {subject}", draft)
+            provider_id = await run_in_threadpool(send_email, to_email, f"RE: {subject}", draft)
             latency = int((time.time() - t0) * 1000)
-            sb.table("send_log").insert({
+            await sb.table("send_log").insert({
                 "email_id": tok["email_id"],
                 "to_email": to_email,
                 "draft_snapshot": draft,
@@ -379,7 +585,7 @@ def api_send_confirm(payload: SendConfirmRequest, background: BackgroundTasks):
                 "latency_ms": latency
             }).execute()
         except Exception as e:
-            sb.table("send_log").insert({
+            await sb.table("send_log").insert({
                 "email_id": tok["email_id"],
                 "to_email": to_email,
                 "draft_snapshot": draft,
@@ -1,34 +1,90 @@
 import os
-import unicodedata
-from typing import Tuple, List
+from typing import Tuple, List, Sequence, Union
+from app.nlp import keywords
+from app.nlp.document import EmailDocument, as_document
+
+try:
+    import numpy as np  # type: ignore
+except Exception:
+    np = None  # tipo: ignore
 
 try:
     import joblib  # type: ignore
 except Exception:
     joblib = None  # tipo: ignore
 
+try:
+    from app.nlp import frozen  # type: ignore
+except Exception:
+    frozen = None  # tipo: ignore
+
 
 MODEL_DIR = os.path.join(os.path.dirname(__file__), "models")
 VEC_PATH = os.path.join(MODEL_DIR, "vectorizer.joblib")
 CLF_PATH = os.path.join(MODEL_DIR, "clf.joblib")
+# auto: usa o formato congelado (mmap, scripts/train_baseline.py) se existir, senão os .joblib
+# online: checkpoint incremental (app/nlp/online.py, alimentado por /api/feedback), trocado a quente
+CLASSIFIER_FORMAT = os.getenv("CLASSIFIER_FORMAT", "auto").lower()
+
+online = None
+if CLASSIFIER_FORMAT == "online":
+    try:
+        from app.nlp import online  # type: ignore
+    except Exception:
+        online = None  # tipo: ignore
 
 VECTORIZER = None
 CLF = None
 IDX_CLASS = {}
-
-def _strip_accents(s: str) -> str:
-    s = s.lower()
-    s = unicodedata.normalize("NFD", s)
-    return "".join(ch for ch in s if unicodedata.category(ch) != "Mn")
+FEATURES = None   # índice da coluna -> termo (pré-computado uma vez por modelo)
+COEF_PROD = None  # peso de cada termo a favor de "Produtivo"
+_LOADED_VERSION = None
+
+def model_version() -> str:
+    # assinatura dos artefatos (mtime+tamanho): muda quando o modelo é retreinado
+    parts = []
+    paths = [VEC_PATH, CLF_PATH]
+    if frozen is not None:
+        paths += [os.path.join(MODEL_DIR, f) for f in frozen.FILES]
+    for p in paths:
+        try:
+            st = os.stat(p)
+            parts.append(f"{st.st_mtime_ns}-{st.st_size}")
+        except OSError:
+            parts.append("none")
+    if online is not None:
+        # o ponteiro CURRENT muda (os.replace) a cada mini-lote aplicado
+        ckpt = online.current_checkpoint()
+        parts.append(os.path.basename(ckpt) if ckpt else "none")
+    return ":".join(parts)
 
 def _load_model():
-    global VECTORIZER, CLF, IDX_CLASS
-    if VECTORIZER is not None and CLF is not None:
+    global VECTORIZER, CLF, IDX_CLASS, FEATURES, COEF_PROD, _LOADED_VERSION
+    version = model_version()
+    if VECTORIZER is not None and CLF is not None and version == _LOADED_VERSION:
         return
-    if joblib and os.path.exists(VEC_PATH) and os.path.exists(CLF_PATH):
-        VECTORIZER = joblib.load(VEC_PATH)
-        CLF = joblib.load(CLF_PATH)
+    use_online = online is not None and online.online_available()
+    use_frozen = (not use_online and frozen is not None and CLASSIFIER_FORMAT != "joblib"
+                  and frozen.frozen_available(MODEL_DIR))
+    if use_online or use_frozen or (joblib and os.path.exists(VEC_PATH) and os.path.exists(CLF_PATH)):
+        if use_online:
+            # um objeto só para vectorizer e classificador: a troca nunca mistura versões
+            VECTORIZER = CLF = online.OnlineModel()
+        elif use_frozen:
+            VECTORIZER = CLF = frozen.FrozenModel(MODEL_DIR)
+        else:
+            VECTORIZER = joblib.load(VEC_PATH)
+            CLF = joblib.load(CLF_PATH)
         IDX_CLASS = {c: i for i, c in enumerate(list(CLF.classes_))}
+        FEATURES, COEF_PROD = None, None
+        try:
+            FEATURES = VECTORIZER.get_feature_names_out()
+            # binário: coef_[0] empurra para classes_[1]
+            coef = np.asarray(CLF.coef_[0], dtype=np.float64)
+            COEF_PROD = coef if IDX_CLASS.get("Produtivo") == 1 else -coef
+        except Exception:
+            pass
+        _LOADED_VERSION = version
 
 
 PRODUTIVO_HINTS = [
@@ -38,54 +94,72 @@ PRODUTIVO_HINTS = [
 IMPRODUTIVO_HINTS = [
     "feliz natal", "parabéns", "obrigado", "agradeço", "bom dia", "boa tarde", "boa noite", "ok", "ciente"
 ]
+QUESTION_HINTS = ["?", "favor", "poderiam", "pode verificar"]
 
-def _heuristic(text: str) -> Tuple[str, float, List[str]]:
-    t = (text or "").lower()
-    hits_prod = [w for w in PRODUTIVO_HINTS if w in t]
-    hits_improd = [w for w in IMPRODUTIVO_HINTS if w in t]
+keywords.register("classify.produtivo", PRODUTIVO_HINTS)
+keywords.register("classify.improdutivo", IMPRODUTIVO_HINTS)
+keywords.register("classify.question", QUESTION_HINTS)
+
+def _heuristic(text: Union[str, EmailDocument]) -> Tuple[str, float, List[str]]:
+    m = as_document(text).matches
+    hits_prod = m.found("classify.produtivo")
+    hits_improd = m.found("classify.improdutivo")
 
     if hits_prod and not hits_improd:
         return "Produtivo", min(0.5 + 0.1 * len(hits_prod), 0.95), hits_prod[:6]
     if hits_improd and not hits_prod:
         return "Improdutivo", min(0.5 + 0.1 * len(hits_improd), 0.95), hits_improd[:6]
 
-    if "?" in t or "favor" in t or "poderiam" in t or "pode verificar" in t:
+    if m.has("classify.question"):
         return "Produtivo", 0.6, []
     return "Improdutivo", 0.6, []
 
 
-def classify_productive(text: str) -> Tuple[str, float, List[str]]:
+def _highlights(data, indices, sign: float, k: int = 6) -> List[str]:
+    # termos presentes ordenados pela contribuição (tfidf * peso) para a classe prevista
+    contrib = data * COEF_PROD[indices] * sign
+    out: List[str] = []
+    for j in np.argsort(-contrib, kind="stable"):
+        if contrib[j] <= 0:
+            break
+        term = FEATURES[indices[j]]
+        if len(term) >= 3:
+            out.append(str(term))
+            if len(out) >= k:
+                break
+    return out
+
+def classify_productive_batch(texts: Sequence[Union[str, EmailDocument]]) -> List[Tuple[str, float, List[str]]]:
+    # Uma transform + um predict_proba para o lote inteiro (matriz esparsa N x vocab).
+    # Aceita texto ou EmailDocument (reaproveita o texto dobrado e a varredura de keywords)
+    docs = [as_document(t) for t in texts]
+    if not docs:
+        return []
     _load_model()
-    if VECTORIZER is None or CLF is None:
-        return _heuristic(text)
-
-    t = _strip_accents(text or "")
-    X = VECTORIZER.transform([t])
-    proba = CLF.predict_proba(X)[0]
-    classes = list(CLF.classes_)
-
     idx_prod = IDX_CLASS.get("Produtivo")
     idx_impr = IDX_CLASS.get("Improdutivo")
-    if idx_prod is None or idx_impr is None:
-        return _heuristic(text)
-
-    p_prod = float(proba[idx_prod])
-    p_impr = float(proba[idx_impr])
-
-    if p_prod >= p_impr:
-        category, confidence = "Produtivo", p_prod
-    else:
-        category, confidence = "Improdutivo", p_impr
-
-    highlights: List[str] = []
-    try:
-        feats = getattr(VECTORIZER, "get_feature_names_out")()
-        present_idxs = X.nonzero()[1].tolist()
-        for idx in present_idxs[:15]:
-            term = feats[idx]
-            if len(term) >= 3:
-                highlights.append(term)
-    except Exception:
-        pass
-
-    return category, round(confidence, 2), highlights[:6]
+    if VECTORIZER is None or CLF is None or idx_prod is None or idx_impr is None:
+        return [_heuristic(d) for d in docs]
+
+    # espaços colapsados não mudam os tokens do vectorizer (\b\w\w+\b)
+    X = VECTORIZER.transform([d.folded for d in docs]).tocsr()
+    proba = CLF.predict_proba(X)
+
+    out: List[Tuple[str, float, List[str]]] = []
+    for i in range(len(docs)):
+        p_prod = float(proba[i, idx_prod])
+        p_impr = float(proba[i, idx_impr])
+        if p_prod >= p_impr:
+            category, confidence, sign = "Produtivo", p_prod, 1.0
+        else:
+            category, confidence, sign = "Improdutivo", p_impr, -1.0
+
+        highlights: List[str] = []
+        if FEATURES is not None and COEF_PROD is not None:
+            start, end = X.indptr[i], X.indptr[i + 1]
+            highlights = _highlights(X.data[start:end], X.indices[start:end], sign)
+        out.append((category, round(confidence, 2), highlights))
+    return out
+
+def classify_productive(text: Union[str, EmailDocument]) -> Tuple[str, float, List[str]]:
+    return classify_productive_batch([text])[0]
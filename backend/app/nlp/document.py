@@ -0,0 +1,116 @@
+import re, unicodedata
+from functools import cached_property
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+# Documento compartilhado pelos estágios de NLP/score de um e-mail.
+# translate_email produz um EmailDocument; classify, reply, summarize e importance
+# aceitam o documento (ou texto puro) e reaproveitam o que já foi calculado:
+# texto dobrado (minúsculo, sem acento, espaços colapsados), frases com offsets,
+# tokens por frase e a varredura de palavras-chave (keywords.scan). Tudo preguiçoso.
+
+_WS = re.compile(r"\s{2,}|[^\S ]")  # só o que muda ao colapsar (espaço simples fica como está)
+_SENT_SPLIT = re.compile(r"(?<=[.!?])\s+")
+
+def _fold_table() -> Dict[int, Optional[str]]:
+    # tabela de tradução (BMP): marca combinante -> removida; letra acentuada -> base (NFD sem Mn)
+    table: Dict[int, Optional[str]] = {}
+    for c in range(0x80, 0x10000):
+        ch = chr(c)
+        if unicodedata.category(ch) == "Mn":
+            table[c] = None
+            continue
+        nfd = unicodedata.normalize("NFD", ch)
+        if nfd != ch:
+            table[c] = "".join(x for x in nfd if unicodedata.category(x) != "Mn")
+    return table
+
+FOLD_TABLE = _fold_table()
+_NON_ASCII = re.compile(r"[^\x00-\x7f]+")
+_RUNS: Dict[str, str] = {}  # trechos não-ASCII curtos já traduzidos ("ção", "é", ...)
+
+def _fold_run(m) -> str:
+    run = m.group()
+    out = _RUNS.get(run)
+    if out is None:
+        out = run.translate(FOLD_TABLE)
+        if len(run) <= 8 and len(_RUNS) < 4096:
+            _RUNS[run] = out
+    return out
+
+def strip_accents(s: str) -> str:
+    # minúsculas + sem acentos, via tabela (sem laço Python por caractere);
+    # só os trechos não-ASCII passam pelo translate, o resto fica como está
+    s = (s or "").lower()
+    return s if s.isascii() else _NON_ASCII.sub(_fold_run, s)
+
+def fold(s: str) -> str:
+    # strip_accents + espaços colapsados: base dos offsets de keywords.scan e das frases
+    return _WS.sub(" ", strip_accents(s))
+
+def sentence_spans(collapsed: str) -> List[Tuple[int, int, str]]:
+    # frases (>= 3 chars) com offsets no texto de espaços já colapsados
+    spans = []
+    start = len(collapsed) - len(collapsed.lstrip())
+    stop = len(collapsed.rstrip())
+    for m in _SENT_SPLIT.finditer(collapsed, start, stop):
+        spans.append((start, m.start()))
+        start = m.end()
+    if start < stop:
+        spans.append((start, stop))
+    return [(a, b, collapsed[a:b]) for a, b in spans if b - a >= 3]
+
+class EmailDocument:
+    def __init__(self, text: str, subject: str = ""):
+        self.text = text or ""
+        self.subject = subject or ""
+        self._tokens: Dict[int, Set[str]] = {}
+
+    def __str__(self) -> str:
+        return self.text
+
+    @cached_property
+    def collapsed(self) -> str:
+        return _WS.sub(" ", self.text)
+
+    @cached_property
+    def folded(self) -> str:
+        return fold(self.text)
+
+    @cached_property
+    def aligned(self) -> bool:
+        # a dobra preserva o tamanho quase sempre; aí offsets de collapsed valem em folded
+        return len(self.folded) == len(self.collapsed)
+
+    @cached_property
+    def subject_folded(self) -> str:
+        return fold(self.subject)
+
+    @cached_property
+    def sentences(self) -> List[Tuple[int, int, str]]:
+        return sentence_spans(self.collapsed)
+
+    def sentence_folded(self, i: int) -> str:
+        a, b, s = self.sentences[i]
+        return self.folded[a:b] if self.aligned else fold(s)
+
+    def sentence_tokens(self, i: int) -> Set[str]:
+        toks = self._tokens.get(i)
+        if toks is None:
+            toks = self._tokens[i] = set(self.sentence_folded(i).split(" "))
+        return toks
+
+    @cached_property
+    def subject_tokens(self) -> Set[str]:
+        return set(self.subject_folded.split(" ")) if self.subject_folded else set()
+
+    @property
+    def matches(self):
+        # varredura única de palavras-chave; refeita só se alguma lista for registrada depois
+        from app.nlp import keywords
+        m = self.__dict__.get("_matches")
+        if m is None or m.version != keywords.current_version():
+            m = self.__dict__["_matches"] = keywords.scan_folded(self.folded)
+        return m
+
+def as_document(x: Union[str, "EmailDocument", None], subject: str = "") -> EmailDocument:
+    return x if isinstance(x, EmailDocument) else EmailDocument(x or "", subject)
@@ -0,0 +1,131 @@
+import json, os, re
+from typing import Dict, List, Sequence
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+# Formato "congelado" do classificador (TfidfVectorizer + LogisticRegression binária),
+# exportado por scripts/train_baseline.py ao lado dos .joblib:
+#   frozen_vocab.npy    termos ordenados (dtype <U), busca por np.searchsorted
+#   frozen_weights.npy  float64 [2, V]: idf e coeficiente de cada termo, na ordem do vocabulário
+#   frozen_meta.json    classes, intercepto e parâmetros do tokenizer
+# Os .npy são abertos com mmap_mode="r": carregar é quase instantâneo e os workers do
+# uvicorn compartilham as mesmas páginas (page cache) em vez de um dict Python cada.
+# FrozenModel imita a interface usada em classify.py (transform/predict_proba/classes_/
+# coef_/get_feature_names_out), com as mesmas probabilidades do par joblib.
+
+VOCAB_FILE = "frozen_vocab.npy"
+WEIGHTS_FILE = "frozen_weights.npy"
+META_FILE = "frozen_meta.json"
+FILES = (VOCAB_FILE, WEIGHTS_FILE, META_FILE)
+
+def export_frozen(vectorizer, clf, model_dir: str) -> List[str]:
+    if len(clf.classes_) != 2:
+        raise ValueError("formato congelado suporta só classificador binário")
+    if vectorizer.analyzer != "word" or vectorizer.preprocessor or vectorizer.tokenizer \
+            or vectorizer.strip_accents or vectorizer.stop_words:
+        raise ValueError("formato congelado suporta só TfidfVectorizer(analyzer='word') padrão")
+
+    terms = vectorizer.get_feature_names_out()
+    order = np.argsort(terms)
+    vocab = np.asarray(terms[order], dtype=str)
+    weights = np.vstack([
+        np.asarray(vectorizer.idf_, dtype=np.float64)[order],
+        np.asarray(clf.coef_[0], dtype=np.float64)[order],
+    ])
+    meta = {
+        "format": 1,
+        "classes": [str(c) for c in clf.classes_],
+        "intercept": float(np.ravel(clf.intercept_)[0]),
+        "ngram_range": list(vectorizer.ngram_range),
+        "lowercase": bool(vectorizer.lowercase),
+        "token_pattern": vectorizer.token_pattern,
+        "norm": vectorizer.norm,
+        "sublinear_tf": bool(vectorizer.sublinear_tf),
+        "use_idf": bool(vectorizer.use_idf),
+        "n_terms": int(len(vocab)),
+    }
+
+    paths = [os.path.join(model_dir, f) for f in FILES]
+    # grava em .tmp e troca no fim: worker que recarregar nunca vê arquivo pela metade
+    np.save(paths[0] + ".tmp.npy", vocab)
+    np.save(paths[1] + ".tmp.npy", weights)
+    with open(paths[2] + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    os.replace(paths[0] + ".tmp.npy", paths[0])
+    os.replace(paths[1] + ".tmp.npy", paths[1])
+    os.replace(paths[2] + ".tmp", paths[2])
+    return paths
+
+def frozen_available(model_dir: str) -> bool:
+    return all(os.path.exists(os.path.join(model_dir, f)) for f in FILES)
+
+class FrozenModel:
+    def __init__(self, model_dir: str):
+        with open(os.path.join(model_dir, META_FILE), encoding="utf-8") as f:
+            meta: Dict = json.load(f)
+        self.meta = meta
+        self.vocab = np.load(os.path.join(model_dir, VOCAB_FILE), mmap_mode="r")
+        weights = np.load(os.path.join(model_dir, WEIGHTS_FILE), mmap_mode="r")
+        self.idf = weights[0]
+        self.coef_ = weights[1:2]
+        self.intercept = float(meta["intercept"])
+        self.classes_ = np.asarray(meta["classes"])
+        self._token = re.compile(meta["token_pattern"])
+        self._lowercase = meta.get("lowercase", True)
+        self._ngram = tuple(meta["ngram_range"])
+        self._norm = meta.get("norm", "l2")
+        self._sublinear = meta.get("sublinear_tf", False)
+        self._use_idf = meta.get("use_idf", True)
+
+    def get_feature_names_out(self):
+        return self.vocab
+
+    def _ngrams(self, doc: str) -> List[str]:
+        # mesma análise do TfidfVectorizer (_word_ngrams)
+        tokens = self._token.findall(doc.lower() if self._lowercase else doc)
+        lo, hi = self._ngram
+        out = list(tokens) if lo == 1 else []
+        for n in range(max(lo, 2), hi + 1):
+            out.extend(" ".join(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+        return out
+
+    def transform(self, docs: Sequence[str]) -> csr_matrix:
+        V = len(self.vocab)
+        indptr, indices, data = [0], [], []
+        for doc in docs:
+            grams = self._ngrams(doc or "")
+            nnz = 0
+            if grams and V:
+                cand = np.asarray(grams)
+                pos = np.searchsorted(self.vocab, cand)
+                pos[pos >= V] = 0
+                hit = pos[self.vocab[pos] == cand]
+                cols, counts = np.unique(hit, return_counts=True)
+                vals = counts.astype(np.float64)
+                if self._sublinear:
+                    vals = np.log(vals) + 1.0
+                if self._use_idf:
+                    vals *= self.idf[cols]
+                if self._norm == "l2":
+                    n = np.sqrt(np.dot(vals, vals))
+                    if n > 0:
+                        vals /= n
+                elif self._norm == "l1":
+                    n = np.abs(vals).sum()
+                    if n > 0:
+                        vals /= n
+                indices.append(cols)
+                data.append(vals)
+                nnz = len(cols)
+            indptr.append(indptr[-1] + nnz)
+        idx = np.concatenate(indices) if indices else np.zeros(0, dtype=np.int64)
+        vals = np.concatenate(data) if data else np.zeros(0, dtype=np.float64)
+        return csr_matrix((vals, idx, np.asarray(indptr)), shape=(len(docs), V))
+
+    def decision_function(self, X) -> np.ndarray:
+        return np.asarray(X @ self.coef_[0]).ravel() + self.intercept
+
+    def predict_proba(self, X) -> np.ndarray:
+        p1 = 1.0 / (1.0 + np.exp(-self.decision_function(X)))
+        return np.column_stack([1.0 - p1, p1])
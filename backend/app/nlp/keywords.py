@@ -0,0 +1,135 @@
+import re, threading
+from bisect import bisect_left
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+from app.nlp.document import fold
+
+# Motor único de palavras-chave para os estágios baseados em regras
+# (heurística do classify, reply, summarize, importance).
+# Cada módulo registra suas listas com register(list_id, ...) no import; todas viram
+# UMA regex em trie, compilada na primeira varredura: (?=(trie)) casa, em cada posição,
+# a palavra-chave mais longa que começa ali, e as que são prefixo dela saem por tabela.
+# O custo por posição depende do tamanho da palavra, não de quantas existem: a varredura
+# é linear no tamanho do documento. O texto é dobrado (minúsculas, sem acentos, espaços
+# colapsados, document.fold) e varrido uma vez; scan() devolve todos os hits com offset e list_id.
+
+_NOT_WORD = re.compile(r"\W")
+
+class Hit(NamedTuple):
+    start: int
+    end: int
+    list_id: str
+    key: str  # palavra original da lista (ou id do padrão, ex.: regex expandida)
+
+class _Entry(NamedTuple):
+    list_id: str
+    key: str
+    word: bool   # exige fronteira de palavra (\b) nas duas pontas
+    order: int   # posição na lista (found() devolve nessa ordem)
+
+_entries: Dict[str, List[_Entry]] = {}  # literal dobrado -> entradas
+_lists: Dict[str, Dict[str, int]] = {}  # list_id -> {key: ordem}
+_lock = threading.Lock()
+_version = 0
+_compiled: Optional[Tuple[int, "re.Pattern", Dict[str, List[Tuple[int, _Entry]]]]] = None
+
+def register(list_id: str, keywords: Union[Iterable[str], Dict[str, str]], word: bool = False) -> None:
+    # keywords: lista de palavras (key = a própria palavra) ou {literal: key} quando vários
+    # literais contam como um só item (ex.: variantes de um padrão de urgência)
+    global _version
+    items = keywords.items() if isinstance(keywords, dict) else ((k, k) for k in keywords)
+    with _lock:
+        keys = _lists.setdefault(list_id, {})
+        for literal, key in items:
+            lit = fold(literal)
+            if not lit or any(e.list_id == list_id for e in _entries.get(lit, [])):
+                continue  # mesma forma dobrada já registrada nesta lista: vale a primeira
+            order = keys.setdefault(key, len(keys))
+            _entries.setdefault(lit, []).append(_Entry(list_id, key, word, order))
+        _version += 1
+
+def _trie_regex(words: List[str]) -> str:
+    trie: Dict = {}
+    for w in words:
+        node = trie
+        for ch in w:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def _emit(node: Dict) -> str:
+        end = "" in node
+        branches = [re.escape(ch) + _emit(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if end else body
+
+    return _emit(trie)
+
+def _compile():
+    global _compiled
+    with _lock:
+        if _compiled is not None and _compiled[0] == _version:
+            return _compiled
+        words = sorted(_entries)
+        pattern = re.compile("(?=(%s))" % _trie_regex(words)) if words else None
+        # literal casado -> (tamanho, entrada) de todos os literais que são prefixo dele (inclusive ele)
+        expand = {
+            w: [(i, e) for i in range(1, len(w) + 1) for e in _entries.get(w[:i], ())]
+            for w in words
+        }
+        _compiled = (_version, pattern, expand)
+        return _compiled
+
+def _is_word(ch: str) -> bool:
+    return not _NOT_WORD.match(ch)
+
+class KeywordHits:
+    def __init__(self, text: str, hits: List[Hit], version: int):
+        self.text = text      # texto dobrado (offsets dos hits)
+        self.hits = hits
+        self.version = version
+
+    def found(self, list_id: str) -> List[str]:
+        # keys distintas da lista presentes no texto, na ordem da lista
+        keys = {h.key for h in self.hits if h.list_id == list_id}
+        order = _lists.get(list_id, {})
+        return sorted(keys, key=lambda k: order.get(k, 0))
+
+    def has(self, list_id: str) -> bool:
+        return any(h.list_id == list_id for h in self.hits)
+
+    def count_per_span(self, list_id: str, spans: List[Tuple[int, int]]) -> List[int]:
+        # para cada [start, end): nº de keys distintas da lista com hit inteiro dentro do trecho
+        hits = [h for h in self.hits if h.list_id == list_id]  # já em ordem de início
+        starts = [h.start for h in hits]
+        out = []
+        for a, b in spans:
+            i = bisect_left(starts, a)
+            keys = set()
+            while i < len(hits) and hits[i].start < b:
+                if hits[i].end <= b:
+                    keys.add(hits[i].key)
+                i += 1
+            out.append(len(keys))
+        return out
+
+def current_version() -> int:
+    return _version
+
+def scan(text: str) -> KeywordHits:
+    return scan_folded(fold(text))
+
+def scan_folded(t: str) -> KeywordHits:
+    # t já dobrado (document.fold / EmailDocument.folded)
+    version, pattern, expand = _compile()
+    hits: List[Hit] = []
+    if pattern is not None:
+        n = len(t)
+        for m in pattern.finditer(t):
+            start = m.start()
+            for size, e in expand[m.group(1)]:
+                end = start + size
+                if e.word and ((start > 0 and _is_word(t[start - 1])) or (end < n and _is_word(t[end]))):
+                    continue
+                hits.append(Hit(start, end, e.list_id, e.key))
+    return KeywordHits(t, hits, version)
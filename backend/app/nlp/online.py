@@ -0,0 +1,181 @@
+import csv, os, threading, time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import joblib
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import SGDClassifier
+
+from app.nlp.document import fold
+
+# Modo de aprendizado incremental do classificador (CLASSIFIER_FORMAT=online).
+# HashingVectorizer não tem vocabulário para ajustar e o SGDClassifier aprende com
+# partial_fit: uma correção de rótulo custa um passo de gradiente no mini-lote, não um
+# retreino do zero, então o custo não cresce com o tamanho do conjunto rotulado.
+# Checkpoints versionados em models/online/online-000001.joblib; o arquivo CURRENT
+# aponta para o vigente e é trocado com os.replace (atômico). classify.model_version()
+# inclui o CURRENT: os workers recarregam sozinhos na próxima requisição, sem restart.
+# O primeiro checkpoint é semeado com data/examples.csv (várias passadas de partial_fit).
+
+MODEL_DIR = os.path.join(os.path.dirname(__file__), "models")
+ONLINE_DIR = os.getenv("ONLINE_MODEL_DIR", os.path.join(MODEL_DIR, "online"))
+POINTER = os.path.join(ONLINE_DIR, "CURRENT")
+SEED_PATH = os.getenv(
+    "ONLINE_SEED_CSV", os.path.join(os.path.dirname(__file__), "..", "..", "data", "examples.csv")
+)
+BATCH_SIZE = int(os.getenv("ONLINE_BATCH_SIZE", "8"))  # correções acumuladas por partial_fit
+KEEP = int(os.getenv("ONLINE_KEEP_CHECKPOINTS", "5"))
+SEED_EPOCHS = 10
+
+CLASSES = np.array(["Improdutivo", "Produtivo"])
+HASH_PARAMS = {"n_features": 2 ** 20, "ngram_range": (1, 2), "alternate_sign": False, "norm": "l2"}
+
+try:
+    import fcntl  # type: ignore
+except Exception:
+    fcntl = None  # tipo: ignore (Windows: só o lock em processo)
+
+_lock = threading.Lock()
+_buffer: List[Tuple[str, str, Optional[str]]] = []  # (texto, rótulo, id do feedback)
+_stats = {"applied": 0, "batches": 0, "last_version": None}
+
+class _FileLock:
+    # serializa atualizações entre workers: ler o vigente, treinar, gravar o próximo
+    def __enter__(self):
+        os.makedirs(ONLINE_DIR, exist_ok=True)
+        self.f = open(os.path.join(ONLINE_DIR, ".lock"), "w")
+        if fcntl is not None:
+            fcntl.flock(self.f, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self.f, fcntl.LOCK_UN)
+        self.f.close()
+
+def _vectorizer() -> HashingVectorizer:
+    return HashingVectorizer(**HASH_PARAMS)
+
+def current_checkpoint() -> Optional[str]:
+    try:
+        with open(POINTER, encoding="utf-8") as f:
+            name = f.read().strip()
+    except OSError:
+        return None
+    path = os.path.join(ONLINE_DIR, name)
+    return path if name and os.path.exists(path) else None
+
+def online_available() -> bool:
+    return current_checkpoint() is not None
+
+class OnlineModel:
+    # mesma interface que classify.py usa (transform/predict_proba/classes_/coef_);
+    # sem get_feature_names_out: hashing não guarda os termos, então sem highlights
+    def __init__(self, path: Optional[str] = None):
+        path = path or current_checkpoint()
+        if path is None:
+            raise FileNotFoundError("nenhum checkpoint online")
+        state: Dict = joblib.load(path)
+        self.version = int(state["version"])
+        self.n_seen = int(state.get("n_seen", 0))
+        self.clf: SGDClassifier = state["clf"]
+        self.classes_ = self.clf.classes_
+        self.coef_ = self.clf.coef_
+        self._vec = _vectorizer()
+
+    def transform(self, docs: Sequence[str]):
+        return self._vec.transform(docs)
+
+    def predict_proba(self, X) -> np.ndarray:
+        return self.clf.predict_proba(X)
+
+def _seed_data() -> Tuple[List[str], List[str]]:
+    texts, labels = [], []
+    try:
+        with open(SEED_PATH, "r", encoding="utf-8-sig", newline="") as f:
+            for row in csv.DictReader(f):
+                t = (row.get("text") or "").strip()
+                y = (row.get("label") or "").strip()
+                if t and y in CLASSES:
+                    texts.append(fold(t))
+                    labels.append(y)
+    except OSError:
+        pass
+    return texts, labels
+
+def _new_classifier() -> Tuple[SGDClassifier, int]:
+    texts, labels = _seed_data()
+    y = np.asarray(labels)
+    # pesos por classe fixados na semente (partial_fit não aceita "balanced")
+    weights = {c: (len(y) / (2.0 * max(1, int((y == c).sum())))) for c in CLASSES} if len(y) else None
+    clf = SGDClassifier(loss="log_loss", alpha=1e-4, class_weight=weights, random_state=42)
+    if texts:
+        X = _vectorizer().transform(texts)
+        rng = np.random.RandomState(42)
+        for _ in range(SEED_EPOCHS):
+            idx = rng.permutation(len(texts))
+            clf.partial_fit(X[idx], y[idx], classes=CLASSES)
+    return clf, len(texts)
+
+def _save_checkpoint(clf: SGDClassifier, version: int, n_seen: int) -> str:
+    name = f"online-{version:06d}.joblib"
+    path = os.path.join(ONLINE_DIR, name)
+    joblib.dump({"version": version, "n_seen": n_seen, "clf": clf, "created_at": time.time()}, path + ".tmp")
+    os.replace(path + ".tmp", path)
+    with open(POINTER + ".tmp", "w", encoding="utf-8") as f:
+        f.write(name)
+    os.replace(POINTER + ".tmp", POINTER)  # troca atômica: leitores veem o antigo ou o novo
+    old = sorted(f for f in os.listdir(ONLINE_DIR) if f.startswith("online-") and f.endswith(".joblib"))
+    for f in old[:-KEEP] if KEEP > 0 else []:
+        try:
+            os.remove(os.path.join(ONLINE_DIR, f))
+        except OSError:
+            pass
+    return path
+
+def apply_labels(texts: Sequence[str], labels: Sequence[str]) -> int:
+    # um partial_fit com o mini-lote sobre o checkpoint vigente; devolve a nova versão
+    pairs = [(fold(t), y) for t, y in zip(texts, labels) if (t or "").strip() and y in CLASSES]
+    with _FileLock():
+        path = current_checkpoint()
+        if path is None:
+            clf, n_seen, version = (*_new_classifier(), 0)
+        else:
+            m = OnlineModel(path)
+            clf, n_seen, version = m.clf, m.n_seen, m.version
+        if pairs:
+            X = _vectorizer().transform([t for t, _ in pairs])
+            clf.partial_fit(X, np.asarray([y for _, y in pairs]), classes=CLASSES)
+        version += 1
+        _save_checkpoint(clf, version, n_seen + len(pairs))
+    _stats["applied"] += len(pairs)
+    _stats["batches"] += 1
+    _stats["last_version"] = version
+    return version
+
+def add_feedback(text: str, label: str, feedback_id: Optional[str] = None) -> Tuple[int, Optional[int], List[str]]:
+    # acumula a correção; ao completar BATCH_SIZE aplica o mini-lote.
+    # devolve (pendentes, versão nova ou None, ids dos feedbacks aplicados)
+    with _lock:
+        _buffer.append((text, label, feedback_id))
+        if len(_buffer) < BATCH_SIZE:
+            return len(_buffer), None, []
+        batch = list(_buffer)
+        _buffer.clear()
+    try:
+        version = apply_labels([t for t, _, _ in batch], [y for _, y, _ in batch])
+    except Exception:
+        with _lock:
+            _buffer[:0] = batch  # devolve ao buffer, tenta de novo no próximo lote
+        raise
+    return 0, version, [fid for _, _, fid in batch if fid]
+
+def online_stats() -> Dict:
+    out = dict(_stats)
+    out["pending"] = len(_buffer)
+    out["batch_size"] = BATCH_SIZE
+    path = current_checkpoint()
+    out["checkpoint"] = os.path.basename(path) if path else None
+    return out
+
+__all__ = ["OnlineModel", "online_available", "apply_labels", "add_feedback", "online_stats", "CLASSES"]
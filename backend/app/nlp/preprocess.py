@@ -1,26 +1,149 @@
 import re
-from bs4 import BeautifulSoup
+from typing import List, Optional
+from lxml import etree
 
-def html_to_text(html: str) -> str:
+# limite de caracteres do texto limpo (clean_email_text); html_to_text para de ler aí
+MAX_CHARS = 20000
+
+# conteúdo que não vira texto (mesmos tipos que o get_text do BeautifulSoup descarta, mais o <head>)
+_SKIP_TAGS = {"script", "style", "head", "template", "rt", "rp"}
+_BLOCK_TAGS = {
+    "address", "article", "aside", "blockquote", "br", "dd", "div", "dl", "dt", "fieldset",
+    "figcaption", "figure", "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6", "header",
+    "hr", "li", "main", "nav", "ol", "p", "pre", "section", "table", "tbody", "td", "tfoot",
+    "th", "thead", "tr", "ul",
+}
+_FEED_CHUNK = 16384
+
+class _TextTarget:
+    # alvo SAX do parser HTML do lxml (o mesmo que o BeautifulSoup usa por baixo),
+    # sem montar árvore: só junta os textos visíveis, como get_text(separator=" ")
+    def __init__(self, max_chars: Optional[int]):
+        self.parts: List[str] = []
+        self.buf: List[str] = []
+        self.skip = 0
+        self.max_chars = max_chars
+        self.count = 0         # tamanho do texto já com espaços colapsados (como em clean_email_text)
+        self.space = True      # último caractere contado foi espaço (ou início)
+
+    def _flush(self, sep: str):
+        if self.buf:
+            self.parts.append("".join(self.buf))
+            self.buf = []
+        self.parts.append(sep)
+        self.space = True
+
+    def _count(self, text: str):
+        # conta o texto como ficaria após colapsar espaços (o parser pode picar um nó em vários data())
+        pieces = text.split()
+        for j, piece in enumerate(pieces):
+            glued = j == 0 and not text[0].isspace() and not self.space
+            self.count += len(piece) + (0 if glued or not self.count else 1)
+        if pieces or text:
+            self.space = text[-1].isspace() if pieces else True
+
+    def start(self, tag, attrib):
+        tag = tag.lower() if isinstance(tag, str) else ""
+        self._flush("\n" if tag in _BLOCK_TAGS else " ")
+        if tag in _SKIP_TAGS:
+            self.skip += 1
+
+    def end(self, tag):
+        tag = tag.lower() if isinstance(tag, str) else ""
+        self._flush("\n" if tag in _BLOCK_TAGS else " ")
+        if tag in _SKIP_TAGS and self.skip:
+            self.skip -= 1
+
+    def data(self, data):
+        if not self.skip and data:
+            self.buf.append(data)
+            if self.max_chars:
+                self._count(data)
+
+    def comment(self, text):
+        # comentário não entra no texto, mas separa os nós de texto em volta (como no get_text)
+        self._flush(" ")
+
+    def close(self):
+        self._flush("")
+        return "".join(self.parts)
+
+    @property
+    def full(self) -> bool:
+        return bool(self.max_chars) and self.count > self.max_chars
+
+def html_to_text(html: str, max_chars: Optional[int] = None) -> str:
+    # Extração em streaming: o HTML é entregue ao parser em pedaços e a leitura para
+    # assim que o texto (com espaços colapsados) passa de max_chars.
+    # Elementos de bloco viram quebra de linha; após normalize_whitespace o resultado é
+    # o mesmo do antigo BeautifulSoup(...).get_text(" ") (exceto o <title>, agora ignorado).
     if not html:
         return ""
-    soup = BeautifulSoup(html, "lxml")
-    for tag in soup(["script", "style"]):
-        tag.extract()
-    text = soup.get_text(separator=" ")
-    return text
+    target = _TextTarget(max_chars)
+    parser = etree.HTMLParser(target=target, recover=True, strip_cdata=False)
+    for i in range(0, len(html), _FEED_CHUNK):
+        parser.feed(html[i:i + _FEED_CHUNK])
+        if target.full:
+            break
+    try:
+        return parser.close()
+    except etree.LxmlError:
+        return target.close()
+
+# Cabeçalhos de resposta/encaminhamento (PT/EN/Outlook), sempre no início de uma linha.
+_REPLY_HEADER = re.compile(
+    r"(?:on|em)\s.{0,400}?(?:wrote|escreveu)\s*:\s*$"
+    r"|-{3,}\s*(?:original message|mensagem original|forwarded message|mensagem encaminhada)\s*-{3,}"
+    r"|(?:begin forwarded message|in[ií]cio da mensagem encaminhada)\s*:",
+    re.IGNORECASE,
+)
+_REPLY_START = re.compile(r"(?:on|em)\s", re.IGNORECASE)  # "On ... wrote:" quebrado em 2 linhas
+_FROM_FIELD = re.compile(r"(?:de|from)\s*:\s*\S", re.IGNORECASE)
+_HEADER_FIELD = re.compile(
+    r"\b(?:de|from|para|to|cc|enviad[ao]|sent|data|date|assunto|subject)\s*:", re.IGNORECASE
+)
+_RULE = re.compile(r"[_-]{8,}")  # linha de separação que o Outlook põe antes do bloco "De:"
+# teto de texto bruto examinado; html_to_text já para no limite, isto cobre corpos text/plain enormes
+RAW_SCAN_LIMIT = MAX_CHARS * 10
+
+def _is_quote_start(lines: List[str], i: int, s: str) -> bool:
+    if s[0] == ">":
+        return True
+    if _REPLY_HEADER.match(s):
+        return True
+    if _REPLY_START.match(s) and i + 1 < len(lines):
+        return bool(_REPLY_HEADER.match(s + " " + lines[i + 1].strip()))
+    if _FROM_FIELD.match(s):
+        # bloco de cabeçalho: "De:" + pelo menos mais um campo (na mesma linha ou nas próximas)
+        fields = len(_HEADER_FIELD.findall(s)) - 1
+        for nxt in lines[i + 1:i + 5]:
+            if _HEADER_FIELD.match(nxt.strip()):
+                fields += 1
+        return fields > 0
+    return False
 
-def strip_quoted_replies(text: str) -> str:
+def strip_quoted_replies(text: str, max_chars: Optional[int] = None) -> str:
+    # Varredura única por linha: corta o texto na primeira linha que abre uma citação
+    # (> ..., "On ... wrote:", "Em ... escreveu:", -----Original Message-----, bloco De:/From:).
+    # Com max_chars, para assim que o texto mantido (espaços colapsados) passa do limite:
+    # o que vem depois seria descartado pelo corte de clean_email_text de qualquer forma.
     if not text:
         return ""
-    patterns = [
-        r"On .* wrote:.*",            # EN
-        r"Em .* escreveu:.*",         # PT
-        r"-----Original Message-----",# EN/Outlook
-        r"De: .*",                    # PT
-    ]
-    for p in patterns:
-        text = re.sub(p, "", text, flags=re.IGNORECASE | re.DOTALL)
+    lines = text.split("\n")
+    kept = 0
+    prev = -1  # última linha não vazia
+    for i, line in enumerate(lines):
+        s = line.strip()
+        if not s:
+            continue
+        if _is_quote_start(lines, i, s):
+            cut = prev if prev >= 0 and _RULE.fullmatch(lines[prev].strip()) else i
+            return "\n".join(lines[:cut])
+        if max_chars:
+            kept += len(" ".join(s.split())) + 1
+            if kept > max_chars + 1:
+                return "\n".join(lines[:i + 1])
+        prev = i
     return text
 
 def normalize_whitespace(text: str) -> str:
@@ -31,7 +154,7 @@ def normalize_whitespace(text: str) -> str:
     return text.strip()
 
 def clean_email_text(raw: str) -> str:
-    t = raw or ""
-    t = strip_quoted_replies(t)
+    t = (raw or "")[:RAW_SCAN_LIMIT]
+    t = strip_quoted_replies(t, max_chars=MAX_CHARS)
     t = normalize_whitespace(t)
-    return t[:20000]
+    return t[:MAX_CHARS]
@@ -1,21 +1,31 @@
-def suggest_reply(category: str, text: str) -> str:
-    t = (text or "").lower()
+from typing import Union
+from app.nlp import keywords
+from app.nlp.document import EmailDocument, as_document
 
+STATUS_KEYS = ["status", "protocolo", "andamento", "ticket", "chamado"]
+ANEXO_KEYS = ["anexo", "comprovante", "arquivo", "documento", "segue em anexo"]
+ERRO_KEYS = ["erro", "falha", "indispon", "acesso", "reset de senha", "bloqueio"]
+
+keywords.register("reply.status", STATUS_KEYS)
+keywords.register("reply.anexo", ANEXO_KEYS)
+keywords.register("reply.erro", ERRO_KEYS)
+
+def suggest_reply(category: str, text: Union[str, EmailDocument]) -> str:
     if category == "Produtivo":
-        
-        if any(k in t for k in ["status", "protocolo", "andamento", "ticket", "chamado"]):
+        m = as_document(text).matches
+        if m.has("reply.status"):
             return (
                 "Olá! Recebemos sua solicitação de atualização de status. "
                 "Para agilizar, por favor confirme o número do protocolo/ticket e, se possível, o CPF/CNPJ do cadastro. "
                 "Assim que recebermos as informações, retornaremos com o andamento."
             )
-        if any(k in t for k in ["anexo", "comprovante", "arquivo", "documento", "segue em anexo"]):
+        if m.has("reply.anexo"):
             return (
                 "Olá! Arquivo recebido com sucesso. "
                 "Encaminhamos para análise e retornaremos com os próximos passos. "
                 "Se houver algum detalhe adicional (ex.: nº do pedido), por favor informe neste e-mail."
             )
-        if any(k in t for k in ["erro", "falha", "indispon", "acesso", "reset de senha", "bloqueio"]):
+        if m.has("reply.erro"):
             return (
                 "Olá! Sentimos pelo inconveniente. "
                 "Poderia detalhar o cenário (passo a passo, prints, horário) e informar seu e-mail de acesso e nº de protocolo (se existir)? "
@@ -1,7 +1,8 @@
 from __future__ import annotations
-import re
-import unicodedata
-from typing import List, Optional, Tuple
+import heapq, os, re
+from typing import Iterator, List, Optional, Sequence, Set, Tuple, Union
+from app.nlp import keywords
+from app.nlp.document import EmailDocument, as_document, fold, sentence_spans
 
 # Palavras/expressões que costumam indicar conteúdo útil
 KEYWORDS = [
@@ -16,54 +17,43 @@ KEYWORDS = [
     "ultimo dia", "atrasado", "atrasada",
 ]
 
-_SENT_SPLIT = re.compile(r"(?<=[.!?])\s+")
+keywords.register("summary", KEYWORDS)
+
 _WS = re.compile(r"\s+")
 _PUNCT = re.compile(r"[^\w\s]")
 
+# Modo documento longo (PDFs com milhares de frases): acima de LONG_DOC_SENTENCES as
+# frases são pontuadas numa passada só, guardando só as TOP_K melhores num heap em vez
+# de ordenar tudo. SUMMARY_MAX_SENTENCES (0 = sem limite) ignora frases depois dessa
+# posição; com 0 o resumo é idêntico ao do modo normal.
+LONG_DOC_SENTENCES = int(os.getenv("SUMMARY_LONG_DOC_SENTENCES", "64"))
+MAX_SENTENCES = int(os.getenv("SUMMARY_MAX_SENTENCES", "0"))
+TOP_K = 8
+
 def _norm(s: str) -> str:
-    s = s.lower()
-    s = unicodedata.normalize("NFD", s)
-    return "".join(ch for ch in s if unicodedata.category(ch) != "Mn")
+    return fold(s)
 
 def _split_sentences(t: str) -> List[str]:
-    t = (t or "").strip()
-    if not t:
-        return []
-    parts = _SENT_SPLIT.split(t)
-    cleaned = []
-    for p in parts:
-        p = _WS.sub(" ", p).strip()
-        if len(p) < 3:
-            continue
-        cleaned.append(p)
-    return cleaned
-
-def _overlap(a: str, b: str) -> float:
-    ta = set(_WS.split(_norm(a)))
-    tb = set(_WS.split(_norm(b)))
+    return [s for _, _, s in sentence_spans(_WS.sub(" ", t or ""))]
+
+def _overlap(ta: Set[str], tb: Set[str]) -> float:
     if not ta or not tb:
         return 0.0
     inter = len(ta & tb)
     union = len(ta | tb)
     return inter / union
 
-def _score_sentence(sent: str, idx: int, subject_norm: str) -> float:
-    s_norm = _norm(sent)
+def _score_sentence(sent: str, idx: int, subject_hits: int, kw_hits: int) -> float:
     score = 0.0
 
-    # keywords
-    kw_hits = sum(1 for k in KEYWORDS if k in s_norm)
+    # keywords (contadas a partir da varredura única do documento)
     score += 2.0 * kw_hits
 
     # posição (primeiras frases tendem a carregar contexto)
     score += max(0.0, 1.5 - 0.15 * idx)
 
-    # match com assunto
-    if subject_norm:
-        # interseção de tokens (rápido e robusto)
-        sa = set(_WS.split(subject_norm))
-        ss = set(_WS.split(s_norm))
-        score += 0.8 * len(sa & ss)
+    # match com assunto: nº de tokens do assunto presentes na frase
+    score += 0.8 * subject_hits
 
     # tamanho: ideal entre 40 e 220 chars
     n = len(sent)
@@ -74,39 +64,87 @@ def _score_sentence(sent: str, idx: int, subject_norm: str) -> float:
 
     return score
 
-def summarize(text: str, max_chars: int = 280, subject: Optional[str] = None) -> str:
+def _keyword_counts(doc: EmailDocument) -> List[int]:
+    if doc.aligned:
+        return doc.matches.count_per_span("summary", [(a, b) for a, b, _ in doc.sentences])
+    # dobra mudou o tamanho (ex.: acentos decompostos): cada frase é varrida à parte
+    return [len(keywords.scan(s).found("summary")) for _, _, s in doc.sentences]
+
+def _subject_tokens(doc: EmailDocument, subject: Optional[str]) -> Set[str]:
+    if subject is None or subject == doc.subject:
+        return doc.subject_tokens
+    subj_norm = fold(subject)
+    return set(subj_norm.split(" ")) if subj_norm else set()
+
+def _iter_scores(doc: EmailDocument, subj_tokens: Set[str], limit: int) -> Iterator[Tuple[float, int]]:
+    # passada única; os tokens da frase servem só à interseção com o assunto (sem guardar set)
+    kw_counts = _keyword_counts(doc)
+    sentences = doc.sentences[:limit] if limit else doc.sentences
+    for i, (_, _, s) in enumerate(sentences):
+        hits = len(subj_tokens.intersection(doc.sentence_folded(i).split(" "))) if subj_tokens else 0
+        yield _score_sentence(s, i, hits, kw_counts[i]), i
+
+def _pick_second(doc: EmailDocument, first: int, ranked: Sequence[int]) -> Optional[int]:
+    # primeira candidata (em ordem de score) com baixa sobreposição com a melhor
+    for i in ranked:
+        if _overlap(doc.sentence_tokens(first), doc.sentence_tokens(i)) < 0.5:
+            return i
+    return None
+
+def _top_k(doc: EmailDocument, subj_tokens: Set[str]) -> List[int]:
+    # heap com as TOP_K melhores (score, -índice); os scores ficam guardados só para o
+    # caso raro de nenhuma das TOP_K servir de segunda frase (aí ordena o resto)
+    heap: List[Tuple[float, int]] = []
+    scores: List[float] = []
+    for score, i in _iter_scores(doc, subj_tokens, MAX_SENTENCES):
+        scores.append(score)
+        if len(heap) < TOP_K:
+            heapq.heappush(heap, (score, -i))
+        elif (score, -i) > heap[0]:
+            heapq.heapreplace(heap, (score, -i))
+    ranked = [-neg for _, neg in sorted(heap, reverse=True)]
+    if not ranked:
+        return []
+    second = _pick_second(doc, ranked[0], ranked[1:])
+    if second is None and len(scores) > len(ranked):
+        rest = sorted(range(len(scores)), key=lambda i: (-scores[i], i))[len(ranked):]
+        second = _pick_second(doc, ranked[0], rest)
+    return [ranked[0]] if second is None else [ranked[0], second]
+
+def summarize(text: Union[str, EmailDocument], max_chars: int = 280, subject: Optional[str] = None) -> str:
     if not text:
         return ""
+    doc = as_document(text)
 
-    sentences = _split_sentences(text)
+    sentences = [s for _, _, s in doc.sentences]
     if not sentences:
         # fallback: texto unico, normaliza e corta
-        s = _WS.sub(" ", text).strip()
+        s = doc.collapsed.strip()
         return (s[: max_chars - 1] + "…") if len(s) > max_chars else s
 
-    subj_norm = _norm(subject or "")
-
-    # pontua todas as sentenças
-    scored: List[Tuple[float, int, str]] = []
-    for i, s in enumerate(sentences):
-        scored.append((_score_sentence(s, i, subj_norm), i, s))
+    subj_tokens = _subject_tokens(doc, subject)
 
-    # ordena por score desc, mantendo estabilidade por índice
-    scored.sort(key=lambda x: (-x[0], x[1]))
+    if len(sentences) > LONG_DOC_SENTENCES or MAX_SENTENCES:
+        chosen = _top_k(doc, subj_tokens)
+    else:
+        # pontua todas as sentenças
+        kw_counts = _keyword_counts(doc)
+        scored: List[Tuple[float, int]] = []
+        for i, s in enumerate(sentences):
+            hits = len(subj_tokens & doc.sentence_tokens(i)) if subj_tokens else 0
+            scored.append((_score_sentence(s, i, hits, kw_counts[i]), i))
 
-    # escolhe a melhor e tenta adicionar uma segunda com baixa sobreposição
-    chosen: List[str] = []
-    if scored:
-        chosen.append(scored[0][2])
+        # ordena por score desc, mantendo estabilidade por índice
+        scored.sort(key=lambda x: (-x[0], x[1]))
 
-    for _, _, cand in scored[1:]:
-        if len(chosen) >= 2:
-            break
-        if _overlap(chosen[0], cand) < 0.5:
-            chosen.append(cand)
+        # escolhe a melhor e tenta adicionar uma segunda com baixa sobreposição
+        chosen = [scored[0][1]]
+        second = _pick_second(doc, chosen[0], [i for _, i in scored[1:]])
+        if second is not None:
+            chosen.append(second)
 
     # monta o resumo
-    summary = " ".join(chosen).strip()
+    summary = " ".join(sentences[i] for i in chosen).strip()
     summary = _WS.sub(" ", summary)
 
     # corta no limite
@@ -115,4 +153,14 @@ def summarize(text: str, max_chars: int = 280, subject: Optional[str] = None) ->
 
     return summary
 
-__all__ = ["summarize"]
+def summarize_many(
+    docs: Sequence[Union[str, EmailDocument]],
+    max_chars: int = 280,
+    subjects: Optional[Sequence[Optional[str]]] = None,
+) -> List[str]:
+    # lote (ingest/daemon): um resumo por documento, na mesma ordem
+    if subjects is None:
+        subjects = [None] * len(docs)
+    return [summarize(d, max_chars=max_chars, subject=subj) for d, subj in zip(docs, subjects)]
+
+__all__ = ["summarize", "summarize_many"]
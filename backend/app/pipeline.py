@@ -1,24 +1,55 @@
-from typing import List, Dict
+from typing import List, Dict, Union
 from app.schemas import ProcessResult
-from app.nlp.preprocess import html_to_text, clean_email_text
-from app.services.pdf_reader import extract_text_from_pdf
-from app.nlp.classify import classify_productive
+from app.nlp.preprocess import html_to_text, clean_email_text, MAX_CHARS
+from app.services.pdf_reader import extract_pdf, limits_key as pdf_limits_key
+from app.services.attachments import attachment_source, release_attachments
+from app.nlp.classify import classify_productive_batch, model_version
 from app.nlp.reply import suggest_reply
+from app.nlp.summarize import summarize_many
+from app.nlp.document import EmailDocument, as_document
+from app.services.importance import compute_importance
+from app.services import result_cache
+
+def _is_pdf(att: Dict) -> bool:
+    ctype = (att.get("content_type") or "").lower()
+    fname = (att.get("filename") or "").lower()
+    return "pdf" in ctype or fname.endswith(".pdf")
+
+def _limits_key() -> str:
+    # limites que mudam o texto (PDF: páginas/caracteres; download: bytes por parte/mensagem;
+    # clean_email_text: MAX_CHARS): trocar um deles não serve entrada antiga
+    from app.services.email_ingest import MAX_PART_BYTES, MAX_MESSAGE_BYTES
+    return repr((pdf_limits_key(), MAX_PART_BYTES, MAX_MESSAGE_BYTES, MAX_CHARS))
 
 def translate_email(subject: str, body_text: str, body_html: str, attachments: List[Dict]) -> dict:
+    key = result_cache.make_key(
+        "translate", subject, result_cache.normalize_body(body_text), result_cache.normalize_body(body_html),
+        _limits_key(), attachments=[a for a in attachments or [] if _is_pdf(a)],
+    )
+    out = result_cache.get(key)
+    if out is None:
+        out = _translate_email(subject, body_text, body_html, attachments)
+        if not out.pop("pdf_failed"):  # PDF que falhou agora (timeout, crash) não vai para o cache
+            result_cache.put(key, out)
+    out = dict(out)
+    # documento compartilhado pelos estágios seguintes (fora do cache: não é JSON)
+    out["doc"] = EmailDocument(out["text"], out["subject"])
+    return out
+
+def _translate_email(subject: str, body_text: str, body_html: str, attachments: List[Dict]) -> dict:
     if body_text and body_text.strip():
         base = body_text
     else:
-        base = html_to_text(body_html)
+        base = html_to_text(body_html, max_chars=MAX_CHARS)  # para de ler o HTML no limite do clean_email_text
 
     base_clean = clean_email_text(base)
 
     pdf_texts: List[str] = []
+    pdf_failed = False
     for att in attachments or []:
-        ctype = (att.get("content_type") or "").lower()
-        fname = (att.get("filename") or "").lower()
-        if "pdf" in ctype or fname.endswith(".pdf"):
-            t = extract_text_from_pdf(att.get("content") or b"")
+        if _is_pdf(att):
+            t, ok = extract_pdf(attachment_source(att))
+            pdf_failed |= not ok
             t = clean_email_text(t)
             if t:
                 pdf_texts.append(t)
@@ -36,22 +67,36 @@ def translate_email(subject: str, body_text: str, body_html: str, attachments: L
         "text": (final_text or "").strip(),
         "has_pdf_text": len(pdf_texts) > 0,
         "length": len(final_text or ""),
+        "pdf_failed": pdf_failed,
     }
 
-def process_translated_text(subject: str, text: str) -> ProcessResult:
-    category, confidence, highlights = classify_productive(text)
-    reply = suggest_reply(category, text)
-    return ProcessResult(
-        category=category,
-        confidence=round(confidence, 2),
-        subcategory=None,
-        reply=reply,
-        highlights=highlights,
-    )
+def process_translated_text(subject: str, text: Union[str, EmailDocument]) -> ProcessResult:
+    return process_translated_texts([text])[0]
+
+def process_translated_texts(texts: List[Union[str, EmailDocument]]) -> List[ProcessResult]:
+    # Versão em lote: só os textos fora do cache vão para o classificador, numa chamada só.
+    # A classificação depende só do texto e do modelo carregado.
+    docs = [as_document(t) for t in texts]
+    version = model_version()
+    keys = [result_cache.make_key("process", version, d.text) for d in docs]
+    found = [result_cache.get(k) for k in keys]
+    todo = [i for i, v in enumerate(found) if v is None]
+    if todo:
+        scored = classify_productive_batch([docs[i] for i in todo])
+        for i, (category, confidence, highlights) in zip(todo, scored):
+            found[i] = ProcessResult(
+                category=category,
+                confidence=round(confidence, 2),
+                subcategory=None,
+                reply=suggest_reply(category, docs[i]),
+                highlights=highlights,
+            ).model_dump()
+            result_cache.put(keys[i], found[i])
+    return [ProcessResult(**v) for v in found]
 
 def process_raw_email(subject: str, body_text: str, body_html: str, attachments: List[Dict]) -> dict:
     t = translate_email(subject, body_text, body_html, attachments)
-    result = process_translated_text(t["subject"], t["text"])
+    result = process_translated_text(t["subject"], t["doc"])
     return {
         "subject": t["subject"],
         "text": t["text"],
@@ -60,4 +105,62 @@ def process_raw_email(subject: str, body_text: str, body_html: str, attachments:
 
 def process_email_payload(subject: str, body_text: str, body_html: str = "") -> ProcessResult:
     t = translate_email(subject, body_text, body_html, attachments=[])
-    return process_translated_text(t["subject"], t["text"])
+    return process_translated_text(t["subject"], t["doc"])
+
+def build_email_pack(raw: Dict) -> dict:
+    return build_email_packs([raw])[0]
+
+def build_email_packs(raws: List[Dict]) -> List[dict]:
+    # e-mails brutos do IMAP (email_ingest) -> packs prontos para save_email_packs,
+    # com a classificação do lote inteiro numa única chamada
+    try:
+        translated = [translate_email(r["subject"], r["text"], r["html"], r["attachments"]) for r in raws]
+    finally:
+        for raw in raws:
+            release_attachments(raw["attachments"])  # apaga anexos em spool (último consumidor)
+    # t["doc"] (EmailDocument) é compartilhado por classify, reply, summarize e importance
+    docs = [t["doc"] for t in translated]
+    results = process_translated_texts(docs)
+    summaries = summarize_many(docs, subjects=[raw["subject"] for raw in raws])
+    return [
+        _assemble_pack(raw, t, result, summary)
+        for raw, t, result, summary in zip(raws, translated, results, summaries)
+    ]
+
+def _assemble_pack(raw: Dict, t: dict, result: ProcessResult, summary: str) -> dict:
+    importance, label, reasons = compute_importance(
+        meta={
+            "subject": raw["subject"],
+            "from_email": raw.get("from_email") or raw.get("from_addr", ""),
+            "attachments": raw["attachments"],
+            "received_at": raw.get("received_at"),
+        },
+        text=t["doc"],
+        category=result.category,
+    )
+
+    lite_attachments = [
+        {"filename": a.get("filename"), "content_type": a.get("content_type"), "size": a.get("size")}
+        for a in raw["attachments"]
+    ]
+
+    return {
+        "message_uid": raw["message_uid"],
+        "subject": raw["subject"],
+        "from_email": raw.get("from_email") or raw.get("from_addr"),
+        "from_name": raw.get("from_name", ""),
+        "to_emails": raw.get("to_emails", []),
+        "cc_emails": raw.get("cc_emails", []),
+        "received_at": raw.get("received_at"),
+        "category": result.category,
+        "confidence": float(result.confidence),
+        "importance": importance,
+        "importance_label": label,
+        "importance_reasons": reasons,
+        "summary": summary,
+        "reply_suggested": result.reply,
+        "has_pdf": bool(t["has_pdf_text"]),
+        "body_text": t["text"],
+        "body_html": raw["html"],
+        "attachments": lite_attachments,
+    }
@@ -33,6 +33,19 @@ class GroqSuggestResponse(BaseModel):
     draft_reply: str
     category: str
     confidence: float
+    cached: bool = False  # rascunho veio do cache (modelo + hash do prompt)
+    source: str = Field("groq", examples=["groq", "cache", "template"])  # template = fallback sem Groq
+
+class FeedbackRequest(BaseModel):
+    email_id: Optional[str] = None
+    subject: Optional[str] = None
+    text: Optional[str] = None
+    label: str = Field(..., examples=["Produtivo", "Improdutivo"])
+
+class FeedbackResponse(BaseModel):
+    recorded: bool = True
+    pending: int = 0                     # correções aguardando o próximo mini-lote
+    checkpoint_version: Optional[int] = None  # checkpoint online gerado por este feedback
 
 class SendIntentRequest(BaseModel):
     email_id: str
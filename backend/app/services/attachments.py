@@ -0,0 +1,28 @@
+import os
+from typing import Any, Dict, Iterable, Union
+
+# Anexos vindos do IMAP: {filename, content_type, size, content(bytes|None), path(str|None)}
+# - content: payload em memória (partes pequenas)
+# - path: payload grande em arquivo temporário (spool), removido por release_attachments
+# - ambos None: só metadados (parte não necessária ao pipeline ou acima do limite)
+
+def attachment_source(att: Dict[str, Any]) -> Union[bytes, str]:
+    return att.get("content") or att.get("path") or b""
+
+def read_attachment(att: Dict[str, Any]) -> bytes:
+    if att.get("content"):
+        return att["content"]
+    path = att.get("path")
+    if path and os.path.exists(path):
+        with open(path, "rb") as f:
+            return f.read()
+    return b""
+
+def release_attachments(atts: Iterable[Dict[str, Any]]) -> None:
+    for att in atts or []:
+        path = att.pop("path", None)
+        if path:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
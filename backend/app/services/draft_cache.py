@@ -0,0 +1,92 @@
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+from app.services.lru import LRUCache
+
+# Cache de rascunhos da Groq, chave = (modelo, hash do prompt) (groq_client.prompt_hash).
+# Pedir sugestão duas vezes para o mesmo e-mail não paga outra completion:
+# LRU em processo (com TTL) e, atrás dele, a tabela email_drafts no Supabase, ao lado
+# do e-mail (compartilhada entre workers e restarts). Entradas vencem em GROQ_DRAFT_TTL_SECONDS.
+# source: "on_demand" (pedido pelo operador) ou "pregen" (gerado em segundo plano na
+# ingestão, draft_pregen); as leituras contam quantas sugestões saíram de cada um.
+
+DRAFT_TTL = int(os.getenv("GROQ_DRAFT_TTL_SECONDS", "86400"))
+DRAFT_CACHE_SIZE = int(os.getenv("GROQ_DRAFT_CACHE_SIZE", "256"))
+
+_memory = LRUCache(DRAFT_CACHE_SIZE, ttl=DRAFT_TTL or None)
+_stats = {"lookups": 0, "served_on_demand": 0, "served_pregen": 0, "db_hits": 0, "db_misses": 0, "db_errors": 0}
+
+def _served(entry: Tuple[str, str], count: bool) -> Tuple[str, str]:
+    if not count:
+        return entry
+    key = "served_pregen" if entry[1] == "pregen" else "served_on_demand"
+    _stats[key] += 1
+    return entry
+
+def get_draft_entry(model: str, phash: str, count: bool = True) -> Optional[Tuple[str, str]]:
+    # (rascunho, origem) ou None; count=False para consultas internas (não é sugestão servida)
+    if count:
+        _stats["lookups"] += 1
+    entry = _memory.get((model, phash))
+    if entry is not None:
+        return _served(entry, count)
+    try:
+        from app.services.supabase_client import get_supabase
+        rows = get_supabase().table("email_drafts").select("draft,source").eq("model", model)\
+            .eq("prompt_hash", phash).gt("expires_at", datetime.now(timezone.utc).isoformat())\
+            .limit(1).execute().data
+    except Exception:
+        _stats["db_errors"] += 1
+        return None
+    if not rows:
+        _stats["db_misses"] += 1
+        return None
+    _stats["db_hits"] += 1
+    entry = (rows[0]["draft"], rows[0].get("source") or "on_demand")
+    _memory.set((model, phash), entry)
+    return _served(entry, count)
+
+def get_draft(model: str, phash: str, count: bool = True) -> Optional[str]:
+    entry = get_draft_entry(model, phash, count)
+    return entry[0] if entry else None
+
+def put_draft(model: str, phash: str, draft: str, email_id: Optional[str] = None, source: str = "on_demand") -> None:
+    if not draft:
+        return
+    _memory.set((model, phash), (draft, source))
+    now = datetime.now(timezone.utc)
+    try:
+        from app.services.supabase_client import get_supabase
+        get_supabase().table("email_drafts").upsert({
+            "email_id": email_id,
+            "model": model,
+            "prompt_hash": phash,
+            "draft": draft,
+            "source": source,
+            "created_at": now.isoformat(),
+            "expires_at": (now + timedelta(seconds=DRAFT_TTL)).isoformat(),
+        }, on_conflict="model,prompt_hash").execute()
+    except Exception:
+        _stats["db_errors"] += 1  # cache é opcional: falha no banco não derruba a sugestão
+        return
+    if email_id:  # muda o "draft" do detalhe do e-mail (ETag em http_cache)
+        from app.services import generation
+        generation.bump(generation.DRAFTS)
+
+async def latest_for_email(email_id: str) -> Optional[dict]:
+    # rascunho vigente mais recente do e-mail (página de detalhe; cliente assíncrono da API)
+    try:
+        from app.services.supabase_async import get_supabase_async
+        res = await get_supabase_async().table("email_drafts").select("draft,model,source,created_at")\
+            .eq("email_id", email_id).gt("expires_at", datetime.now(timezone.utc).isoformat())\
+            .order("created_at", desc=True).limit(1).execute()
+    except Exception:
+        _stats["db_errors"] += 1
+        return None
+    return res.data[0] if res.data else None
+
+def draft_cache_stats() -> dict:
+    out = {"memory": _memory.stats()}
+    out.update(_stats)
+    out["pregen_hit_rate"] = round(_stats["served_pregen"] / _stats["lookups"], 4) if _stats["lookups"] else 0.0
+    return out
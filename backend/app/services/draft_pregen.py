@@ -0,0 +1,137 @@
+import os, itertools, queue, threading, time
+from collections import deque
+from typing import Any, Dict, Optional
+
+# Pré-geração de rascunhos da Groq para e-mails importantes (estágio opcional da ingestão).
+# Depois de salvo (precisa do email_id), cada e-mail com importance_label em
+# DRAFT_PREGEN_LABELS entra numa fila com prioridade (urgent antes de high). Uma thread de
+# fundo gera o rascunho com o mesmo prompt de /api/groq/suggest e grava em draft_cache
+# (source="pregen"): quando o operador abrir o e-mail, a sugestão sai do cache na hora.
+# Orçamento: no máximo DRAFT_PREGEN_RPM chamadas e DRAFT_PREGEN_TOKENS_PER_MIN tokens
+# (estimados: prompt/4 + 300 de resposta) por janela deslizante de 60 s; a thread espera
+# a janela liberar em vez de estourar a cota da Groq. Fila cheia => o e-mail é descartado
+# (o operador ainda pode pedir a sugestão na hora). A chamada passa por suggest_guarded
+# (prazo, retentativas e disjuntor da Groq): Groq fora do ar => o item é descartado
+# (contado em unavailable_*), sem travar a fila nem gravar template como rascunho.
+
+ENABLED = os.getenv("DRAFT_PREGEN", "false").lower() in ("1", "true", "yes")
+LABELS = [l.strip() for l in os.getenv("DRAFT_PREGEN_LABELS", "urgent,high").split(",") if l.strip()]
+QUEUE_SIZE = int(os.getenv("DRAFT_PREGEN_QUEUE", "100"))
+RPM = int(os.getenv("DRAFT_PREGEN_RPM", "10"))
+TOKENS_PER_MIN = int(os.getenv("DRAFT_PREGEN_TOKENS_PER_MIN", "20000"))
+COMPLETION_TOKENS = 300
+WINDOW = 60.0
+
+_queue: "queue.PriorityQueue" = queue.PriorityQueue(maxsize=max(1, QUEUE_SIZE))
+_seq = itertools.count()
+_window: deque = deque()  # (instante, tokens) das chamadas na janela
+_lock = threading.Lock()
+_worker: Optional[threading.Thread] = None
+_busy = threading.Event()
+_stats = {
+    "enqueued": 0, "dropped": 0, "generated": 0, "skipped_cached": 0, "errors": 0,
+    "unavailable_breaker_open": 0, "unavailable_deadline": 0, "unavailable_error": 0,
+    "budget_waits": 0, "tokens_used": 0, "last_error": None,
+}
+
+def _estimate_tokens(messages) -> int:
+    return sum(len(m["content"]) for m in messages) // 4 + COMPLETION_TOKENS
+
+def _window_usage(now: float):
+    while _window and now - _window[0][0] >= WINDOW:
+        _window.popleft()
+    return len(_window), sum(t for _, t in _window)
+
+def _wait_budget(tokens: int):
+    # bloqueia até a janela de 60 s comportar mais uma chamada com esses tokens
+    waited = False
+    while True:
+        now = time.monotonic()
+        with _lock:
+            calls, used = _window_usage(now)
+            fits_tokens = used + tokens <= TOKENS_PER_MIN or not _window
+            if (RPM <= 0 or calls < RPM) and (TOKENS_PER_MIN <= 0 or fits_tokens):
+                _window.append((now, tokens))
+                _stats["tokens_used"] += tokens
+                return
+            wait = WINDOW - (now - _window[0][0]) if _window else 1.0
+        if not waited:
+            _stats["budget_waits"] += 1
+            waited = True
+        time.sleep(max(0.05, wait))
+
+def _generate(item: Dict[str, Any]):
+    from app.services.groq_client import build_request, prompt_hash, suggest_guarded, GroqUnavailable
+    from app.services.draft_cache import get_draft, put_draft
+
+    model, messages = build_request(item["subject"], item["text"])
+    phash = prompt_hash(model, messages)
+    if get_draft(model, phash, count=False) is not None:
+        _stats["skipped_cached"] += 1
+        return
+    _wait_budget(_estimate_tokens(messages))
+    try:
+        draft = suggest_guarded(item["subject"], item["text"])
+    except GroqUnavailable as e:
+        _stats[f"unavailable_{e.reason}"] += 1
+        _stats["last_error"] = str(e)
+        return
+    put_draft(model, phash, draft, item.get("email_id"), source="pregen")
+    _stats["generated"] += 1
+
+def _run():
+    while True:
+        _, _, item = _queue.get()
+        _busy.set()
+        try:
+            _generate(item)
+        except Exception as e:
+            _stats["errors"] += 1  # visível em /api/metrics (draft_pregen)
+            _stats["last_error"] = f"email_id={item.get('email_id')}: {type(e).__name__}: {e}"
+        finally:
+            _busy.clear()
+            _queue.task_done()
+
+def _ensure_worker():
+    global _worker
+    with _lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run, name="draft-pregen", daemon=True)
+            _worker.start()
+
+def maybe_enqueue(pack: Dict[str, Any], email_id: Optional[str]) -> bool:
+    # chamado após salvar o pack; assunto/texto iguais aos que /api/groq/suggest lê do banco
+    label = pack.get("importance_label")
+    if not ENABLED or label not in LABELS or not os.getenv("GROQ_API_KEY"):
+        return False
+    item = {"email_id": email_id, "subject": pack.get("subject") or "", "text": pack.get("body_text") or ""}
+    try:
+        _queue.put_nowait((LABELS.index(label), next(_seq), item))
+    except queue.Full:
+        _stats["dropped"] += 1
+        return False
+    _stats["enqueued"] += 1
+    _ensure_worker()
+    return True
+
+def drain(timeout: Optional[float] = None) -> bool:
+    # scripts de execução única: espera a fila esvaziar antes de sair (True se esvaziou)
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while _queue.unfinished_tasks:
+        if deadline is not None and time.monotonic() >= deadline:
+            return False
+        time.sleep(0.1)
+    return True
+
+def pregen_stats() -> Dict[str, Any]:
+    with _lock:
+        calls, used = _window_usage(time.monotonic())
+    out: Dict[str, Any] = {"enabled": ENABLED, "labels": LABELS, "queue_depth": _queue.qsize(), "busy": _busy.is_set()}
+    out.update(_stats)
+    out["budget"] = {
+        "rpm": RPM, "tokens_per_min": TOKENS_PER_MIN,
+        "calls_last_min": calls, "tokens_last_min": used,
+        "rpm_used": round(calls / RPM, 4) if RPM > 0 else None,
+        "tokens_used_ratio": round(used / TOKENS_PER_MIN, 4) if TOKENS_PER_MIN > 0 else None,
+    }
+    return out
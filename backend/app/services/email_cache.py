@@ -0,0 +1,95 @@
+import os, uuid
+from typing import Any, Dict, Optional
+from app.services.lru import LRUCache
+
+# Leitura de um e-mail (meta + conteúdo) numa ida ao banco, com cache read-through.
+# Uma consulta só: emails com email_contents embutido (select "*, email_contents(*)"),
+# achando pelo id ou pelo message_uid. Detalhe, sugestão da Groq e envio (intent/confirm)
+# leem o mesmo e-mail em sequência: o LRU (EMAIL_CACHE_SIZE, TTL EMAIL_CACHE_TTL_SECONDS)
+# evita repetir a consulta. store_email invalida ao gravar; gravações em outro processo
+# (cron, daemon IDLE, apply_feedback, outro worker) incrementam a geração "emails"
+# (generation.py): quando a geração lida muda, o cache inteiro é descartado, então um ETag
+# novo em http_cache sempre vem com leitura nova. Sem app_state, vale só o TTL.
+
+EMAIL_CACHE_TTL = float(os.getenv("EMAIL_CACHE_TTL_SECONDS", "60"))
+EMAIL_CACHE_SIZE = int(os.getenv("EMAIL_CACHE_SIZE", "512"))
+
+_memory = LRUCache(EMAIL_CACHE_SIZE, ttl=EMAIL_CACHE_TTL or None)   # id -> {"meta", "content"}
+_aliases = LRUCache(EMAIL_CACHE_SIZE, ttl=EMAIL_CACHE_TTL or None)  # message_uid -> id
+_stats = {"db_fetches": 0, "not_found": 0, "invalidations": 0, "generation_resets": 0}
+_generation: Optional[int] = None  # geração "emails" a que o conteúdo do cache corresponde
+
+def _as_uuid(ident: str) -> Optional[str]:
+    try:
+        return str(uuid.UUID(ident))
+    except (ValueError, AttributeError, TypeError):
+        return None
+
+def _quote(value: str) -> str:
+    # valor entre aspas num filtro or=(...) do PostgREST
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+def _split(row: Dict[str, Any]) -> Dict[str, Any]:
+    meta = dict(row)
+    content = meta.pop("email_contents", None)
+    if isinstance(content, list):  # 1:1 sem unique em email_id => PostgREST devolve lista
+        content = content[0] if content else None
+    return {"meta": meta, "content": content}
+
+def _cached(ident: str) -> Optional[Dict[str, Any]]:
+    key = _as_uuid(ident) or _aliases.get(ident)
+    return _memory.get(key) if key else None
+
+async def _sync_generation() -> None:
+    global _generation
+    from app.services import generation
+    snapshot = await generation.current()
+    if snapshot is None:
+        return
+    gen = snapshot.get(generation.EMAILS, (0, None))[0]
+    if gen != _generation:
+        _memory.clear()
+        _aliases.clear()
+        _stats["generation_resets"] += 1
+        _generation = gen
+
+async def fetch_email(ident: str) -> Optional[Dict[str, Any]]:
+    # {"meta": linha de emails, "content": linha de email_contents ou None}; None se não existe
+    await _sync_generation()
+    hit = _cached(ident)
+    if hit is not None:
+        return hit
+    from app.services.supabase_async import get_supabase_async
+
+    q = get_supabase_async().table("emails").select("*, email_contents(*)")
+    as_id = _as_uuid(ident)
+    if as_id:
+        q = q.or_(f"id.eq.{as_id},message_uid.eq.{_quote(ident)}")
+    else:
+        q = q.eq("message_uid", ident)  # não é uuid: comparar com id seria erro de tipo no Postgres
+    _stats["db_fetches"] += 1
+    rows = (await q.limit(2).execute()).data or []
+    if not rows:
+        _stats["not_found"] += 1
+        return None
+    # id vence message_uid se os dois casarem (linhas diferentes)
+    row = next((r for r in rows if r.get("id") == as_id), rows[0])
+    email = _split(row)
+    _memory.set(row["id"], email)
+    if row.get("message_uid"):
+        _aliases.set(row["message_uid"], row["id"])
+    return email
+
+def invalidate_email(email_id: Optional[str] = None, message_uid: Optional[str] = None) -> None:
+    # chamado por quem grava em emails/email_contents (store_email, feedback)
+    if message_uid:
+        email_id = email_id or _aliases.get(message_uid)
+        _aliases.pop(message_uid)
+    if email_id:
+        _memory.pop(email_id)
+    _stats["invalidations"] += 1
+
+def email_cache_stats() -> dict:
+    out = {"memory": _memory.stats()}
+    out.update(_stats)
+    return out
@@ -1,71 +1,298 @@
-import os
-from typing import Generator, Dict, Any, List
-from imap_tools import MailBox, A
+import os, re, tempfile
+from typing import Generator, Dict, Any, List, Optional, Set
+from imap_tools import MailBox, MailMessage, A, U
+from app.services.imap_pool import get_imap_pool
+from app.services.imap_parts import parse_fetch, bodystructure_parts, StreamDecoder, decode_part, decode_text
 
-def fetch_unread(limit: int = 10) -> Generator[Dict[str, Any], None, None]:
+# UIDs por comando FETCH de cabeçalhos+BODYSTRUCTURE / de corpos
+FETCH_CHUNK = int(os.getenv("IMAP_FETCH_CHUNK", "200"))
+BODY_CHUNK = int(os.getenv("IMAP_BODY_CHUNK", "20"))
+
+# Download seletivo: BODYSTRUCTURE primeiro; baixa só texto/HTML e os anexos que o pipeline
+# usa (PDF), respeitando limites por parte e por mensagem. Partes acima de INGEST_SPOOL_BYTES
+# são baixadas em pedaços direto para arquivo temporário (att["path"]), sem ficar em memória.
+MAX_PART_BYTES = int(os.getenv("INGEST_MAX_PART_BYTES", str(10 * 1024 * 1024)))
+MAX_MESSAGE_BYTES = int(os.getenv("INGEST_MAX_MESSAGE_BYTES", str(25 * 1024 * 1024)))
+MAX_TEXT_BYTES = int(os.getenv("INGEST_MAX_TEXT_BYTES", str(2 * 1024 * 1024)))
+SPOOL_BYTES = int(os.getenv("INGEST_SPOOL_BYTES", str(1024 * 1024)))
+
+_SECTION = re.compile(r"BODY\[([^\]]*)\]")
+
+def _imap_env():
     host    = os.getenv("IMAP_HOST", "imap.gmail.com")
     user    = os.getenv("IMAP_USER")
     passwd  = os.getenv("IMAP_PASS")
     folder  = os.getenv("IMAP_FOLDER", "INBOX")
+    return host, user, passwd, folder
 
-    if not (host and user and passwd):
-        raise RuntimeError("IMAP_HOST/IMAP_USER/IMAP_PASS não configurados (.env).")
+def message_key(uidvalidity: Optional[int], uid: str) -> str:
+    # emails.message_uid: UID escopado pela UIDVALIDITY ("UIDVALIDITY:UID"). Quando a
+    # UIDVALIDITY muda o servidor reaproveita UIDs; com o UID puro, mensagens novas colidiriam
+    # com linhas antigas (dedup as descartaria e o upsert por message_uid as sobrescreveria).
+    return f"{uidvalidity}:{uid}" if uidvalidity else str(uid)
+
+def _uidvalidity(mailbox: MailBox, folder: str) -> Optional[int]:
+    return mailbox.folder.status(folder, ["UIDVALIDITY"]).get("UIDVALIDITY")
+
+def _msg_to_dict(msg: MailMessage, uid: str, text: str, html: str, atts: List[Dict[str, Any]],
+                 uidvalidity: Optional[int] = None) -> Dict[str, Any]:
+    from_addr = (msg.from_ or "")
+    from_name = ""
+    from_email = ""
+    try:
+        if msg.from_values:  # list[Address]
+            from_name = msg.from_values[0].name or ""
+            from_email = msg.from_values[0].email or ""
+    except Exception:
+        pass
+
+    to_emails = []
+    try:
+        to_emails = [a.email for a in (msg.to_values or []) if getattr(a, "email", None)]
+    except Exception:
+        pass
+
+    cc_emails = []
+    try:
+        cc_emails = [a.email for a in (msg.cc_values or []) if getattr(a, "email", None)]
+    except Exception:
+        pass
+
+    return {
+        "uid": uid,
+        "message_uid": message_key(uidvalidity, uid) if uid is not None else (msg.message_id or ""),
+        "subject": msg.subject or "",
+        "text": text or "",
+        "html": html or "",
+        "attachments": atts,          # [{filename, content(bytes|None), path(str|None), content_type, size}]
+        "from_addr": from_addr,
+        "from_name": from_name,
+        "from_email": from_email or from_addr,
+        "to_emails": to_emails,
+        "cc_emails": cc_emails,
+        "received_at": getattr(msg, "date", None),
+    }
+
+def _uid_fetch(mailbox: MailBox, uids: List[str], message_parts: str) -> List[Dict[str, Any]]:
+    res = mailbox.client.uid("fetch", ",".join(uids), message_parts)
+    if res[0] != "OK":
+        raise RuntimeError(f"IMAP FETCH falhou: {res}")
+    return [it for it in parse_fetch(res[1]) if it.get("UID")]
+
+def _fetch_heads(mailbox: MailBox, uids: List[str]) -> List[Dict[str, Any]]:
+    # cabeçalhos + BODYSTRUCTURE em lote, sem baixar corpo nem anexos (PEEK: não marca \Seen)
+    heads: List[Dict[str, Any]] = []
+    for i in range(0, len(uids), FETCH_CHUNK):
+        part = uids[i:i + FETCH_CHUNK]
+        by_uid = {}
+        for it in _uid_fetch(mailbox, part, "(UID RFC822.SIZE BODYSTRUCTURE BODY.PEEK[HEADER])"):
+            by_uid[str(it["UID"])] = {
+                "uid": str(it["UID"]),
+                "header": MailMessage.from_bytes(it.get("BODY[HEADER]") or b""),
+                "parts": bodystructure_parts(it.get("BODYSTRUCTURE")),
+            }
+        heads.extend(by_uid[u] for u in part if u in by_uid)
+    return heads
+
+def _wanted_attachment(p: Dict[str, Any]) -> bool:
+    return "pdf" in p["content_type"] or p["filename"].lower().endswith(".pdf")
+
+def _plan(parts: List[Dict[str, Any]]):
+    # -> (partes baixadas inline, partes baixadas em spool)
+    inline, spooled = [], []
+    budget = MAX_MESSAGE_BYTES
+    for p in parts:
+        if not p["is_attachment"] and p["content_type"] in ("text/plain", "text/html"):
+            inline.append(p)
+        elif p["is_attachment"] and _wanted_attachment(p) and p["size"] <= min(MAX_PART_BYTES, budget):
+            budget -= p["size"]
+            (spooled if p["size"] > SPOOL_BYTES else inline).append(p)
+    return inline, spooled
+
+def _fetch_item(p: Dict[str, Any]) -> str:
+    if p["is_attachment"]:
+        return f"BODY.PEEK[{p['section']}]"
+    return f"BODY.PEEK[{p['section']}]<0.{MAX_TEXT_BYTES}>"
+
+def _spool_part(mailbox: MailBox, uid: str, p: Dict[str, Any]) -> str:
+    dec = StreamDecoder(p["encoding"])
+    suffix = os.path.splitext(p["filename"])[1] or ".bin"
+    with tempfile.NamedTemporaryFile(prefix="ingest-", suffix=suffix, delete=False) as f:
+        offset = 0
+        while True:
+            items = _uid_fetch(mailbox, [uid], f"(UID BODY.PEEK[{p['section']}]<{offset}.{SPOOL_BYTES}>)")
+            data = next((v for it in items for k, v in it.items() if k.startswith("BODY[")), None) or b""
+            f.write(dec.feed(data))
+            offset += len(data)
+            if len(data) < SPOOL_BYTES:
+                break
+        f.write(dec.flush())
+        return f.name
+
+def _fetch_bodies(mailbox: MailBox, heads: List[Dict[str, Any]], mark_seen: bool = True,
+                  uidvalidity: Optional[int] = None) -> Generator[Dict[str, Any], None, None]:
+    for i in range(0, len(heads), BODY_CHUNK):
+        chunk = heads[i:i + BODY_CHUNK]
+
+        # agrupa mensagens com o mesmo conjunto de partes -> 1 FETCH por grupo
+        plans, groups = {}, {}
+        for h in chunk:
+            inline, spooled = _plan(h["parts"])
+            plans[h["uid"]] = (inline, spooled)
+            if inline:
+                groups.setdefault(" ".join(_fetch_item(p) for p in inline), []).append(h["uid"])
+        data: Dict[str, Dict[str, bytes]] = {}
+        for items, uids in groups.items():
+            for it in _uid_fetch(mailbox, uids, f"(UID {items})"):
+                sections = data.setdefault(str(it["UID"]), {})
+                for k, v in it.items():
+                    m = _SECTION.match(k)
+                    if m and isinstance(v, bytes):
+                        sections[m.group(1)] = v
 
-    with MailBox(host).login(user, passwd, folder) as mailbox:
-        for msg in mailbox.fetch(A(seen=False), limit=limit, reverse=True):
-            atts: List[Dict[str, Any]] = []
-            for att in getattr(msg, "attachments", []):
+        for h in chunk:
+            inline, spooled = plans[h["uid"]]
+            raw_parts = data.get(h["uid"], {})
+            spool_paths = {p["section"]: _spool_part(mailbox, h["uid"], p) for p in spooled}
+
+            text, html, atts = [], [], []
+            for p in h["parts"]:
+                payload = raw_parts.get(p["section"])
+                if not p["is_attachment"]:
+                    if payload is not None and p["content_type"] == "text/plain":
+                        text.append(decode_text(decode_part(payload, p["encoding"]), p["charset"]))
+                    elif payload is not None and p["content_type"] == "text/html":
+                        html.append(decode_text(decode_part(payload, p["encoding"]), p["charset"]))
+                    continue
+                content = decode_part(payload, p["encoding"]) if payload is not None else None
+                path = spool_paths.get(p["section"])
+                size = len(content) if content is not None else (os.path.getsize(path) if path else p["size"])
                 atts.append({
-                    "filename": att.filename,
-                    "content": att.payload,        
-                    "content_type": (att.content_type or ""),
-                    "size": (att.size or 0),
+                    "filename": p["filename"],
+                    "content": content,
+                    "path": path,
+                    "content_type": p["content_type"],
+                    "size": size,
                 })
-            from_addr = (msg.from_ or "")
-            from_name = ""
-            from_email = ""
-            try:
-                if msg.from_values:  # list[Address]
-                    from_name = msg.from_values[0].name or ""
-                    from_email = msg.from_values[0].email or ""
-            except Exception:
-                pass
-
-            to_emails = []
-            try:
-                to_emails = [a.email for a in (msg.to_values or []) if getattr(a, "email", None)]
-            except Exception:
-                pass
-
-            cc_emails = []
-            try:
-                cc_emails = [a.email for a in (msg.cc_values or []) if getattr(a, "email", None)]
-            except Exception:
-                pass
-
-            yield {
-                "uid": getattr(msg, "uid", None),
-                "message_uid": str(msg.uid) if getattr(msg, "uid", None) is not None else (msg.message_id or ""),
-                "subject": msg.subject or "",
-                "text": msg.text or "",
-                "html": msg.html or "",
-                "attachments": atts,          # [{filename, content(bytes), content_type, size}]
-                "from_addr": from_addr,
-                "from_name": from_name,
-                "from_email": from_email or from_addr,
-                "to_emails": to_emails,
-                "cc_emails": cc_emails,
-                "received_at": getattr(msg, "date", None),     
-            }
+            yield _msg_to_dict(h["header"], h["uid"], "".join(text), "".join(html), atts, uidvalidity)
+
+        if mark_seen:
+            mailbox.flag([h["uid"] for h in chunk], ["\\Seen"], True)
+
+def fetch_unread(limit: int = 10) -> Generator[Dict[str, Any], None, None]:
+    host, user, passwd, folder = _imap_env()
+
+    if not (host and user and passwd):
+        raise RuntimeError("IMAP_HOST/IMAP_USER/IMAP_PASS não configurados (.env).")
+
+    with get_imap_pool().session(folder) as mailbox:
+        uids = list(reversed(mailbox.uids(A(seen=False))))[:limit]
+        yield from _fetch_bodies(mailbox, _fetch_heads(mailbox, uids), uidvalidity=_uidvalidity(mailbox, folder))
+
+class IncrementalFetch:
+    # Ingestão incremental: só UIDs acima do checkpoint (UIDVALIDITY, último UID) da pasta.
+    # Cabeçalhos em lote -> dedup contra emails.message_uid ("UIDVALIDITY:UID") -> corpos só das novas.
+    # UIDVALIDITY diferente => resync completo. Iterar só busca (sem \Seen, sem checkpoint);
+    # depois de salvar, o chamador chama commit(uids salvos): o checkpoint avança até logo
+    # antes do 1º UID que não foi salvo (falha no NLP/gravação, ou lote não consumido), e só
+    # os salvos viram lidos. Assim nada fica abaixo da marca sem ter sido gravado.
+    # `mailbox`: sessão já autenticada na pasta (ex.: daemon IDLE); senão usa o pool.
+    # Com `limit`, depois do commit `more` diz se o lote foi todo confirmado e ainda há UIDs
+    # acima dele: o chamador busca o próximo lote (o checkpoint já está no lugar).
+    def __init__(self, limit: Optional[int] = None, folder: Optional[str] = None,
+                 mailbox: Optional[MailBox] = None):
+        host, user, passwd, default_folder = _imap_env()
+        if not (host and user and passwd):
+            raise RuntimeError("IMAP_HOST/IMAP_USER/IMAP_PASS não configurados (.env).")
+        self.folder = folder or default_folder
+        self.key = f"{host}:{user}:{self.folder}"
+        self.limit = limit
+        self._mailbox = mailbox
+        self._listed = False
+        self._uidvalidity: Optional[int] = None
+        self._resync = False
+        self._last_uid = 0
+        self._scanned: List[str] = []  # UIDs acima do checkpoint, em ordem crescente
+        self._known: Set[str] = set()  # já gravados antes (dedup): contam como feitos
+        self._truncated = False
+        self.more = False
+
+    def __iter__(self) -> Generator[Dict[str, Any], None, None]:
+        if self._mailbox is not None:
+            yield from self._fetch(self._mailbox)
+            return
+        with get_imap_pool().session(self.folder) as mb:
+            yield from self._fetch(mb)
+
+    def _fetch(self, mailbox: MailBox) -> Generator[Dict[str, Any], None, None]:
+        from app.services.ingest_state import load_checkpoint
+        from app.services.store_email import existing_message_uids
+
+        self._uidvalidity = _uidvalidity(mailbox, self.folder)
+        saved_validity, last_uid = load_checkpoint(self.key)
+        self._resync = saved_validity != self._uidvalidity
+        if self._resync:
+            last_uid = 0  # UIDVALIDITY mudou (ou primeira execução): resync completo
+        self._last_uid = last_uid
+
+        # "N:*" sempre devolve ao menos o maior UID, mesmo que < N -> filtra no cliente
+        uids = sorted(int(u) for u in mailbox.uids(A(uid=U(str(last_uid + 1), "*"))) if int(u) > last_uid)
+        self._truncated = bool(self.limit) and len(uids) > self.limit
+        if self._truncated:
+            uids = uids[:self.limit]
+        self._scanned = [str(u) for u in uids]
+        self._listed = True
+        if not uids:
+            return
+
+        heads = _fetch_heads(mailbox, self._scanned)
+        # dedup pela chave escopada (message_key): após um resync os UIDs reaproveitados não
+        # batem com as linhas da UIDVALIDITY anterior
+        keys = {message_key(self._uidvalidity, h["uid"]): h["uid"] for h in heads}
+        self._known = {keys[k] for k in existing_message_uids(list(keys))}
+        self._known |= set(self._scanned) - {h["uid"] for h in heads}  # expurgados entre a busca e o FETCH
+        fresh = [h for h in heads if h["uid"] not in self._known]
+
+        yield from _fetch_bodies(mailbox, fresh, mark_seen=False, uidvalidity=self._uidvalidity)
+
+    def commit(self, saved_uids, skipped_uids=()) -> int:
+        # grava o checkpoint e marca como lidos os salvos; devolve o último UID confirmado.
+        # skipped_uids: desistidos (quarentena) — o checkpoint passa por eles, mas ficam não lidos
+        from app.services.ingest_state import save_checkpoint
+
+        if not self._listed:
+            return self._last_uid
+        saved = {str(u) for u in saved_uids if u is not None}
+        skipped = {str(u) for u in skipped_uids if u is not None}
+        upto = self._last_uid
+        for uid in self._scanned:
+            if uid not in saved and uid not in skipped and uid not in self._known:
+                break
+            upto = int(uid)
+        seen = [u for u in self._scanned if u in saved]
+        if seen:
+            if self._mailbox is not None:
+                self._mailbox.flag(seen, ["\\Seen"], True)
+            else:
+                with get_imap_pool().session(self.folder) as mb:
+                    mb.flag(seen, ["\\Seen"], True)
+        if upto != self._last_uid or self._resync:
+            save_checkpoint(self.key, self._uidvalidity, upto)
+            self._last_uid, self._resync = upto, False
+        self.more = self._truncated and upto == int(self._scanned[-1])
+        return upto
+
+def fetch_incremental(limit: Optional[int] = None, folder: Optional[str] = None,
+                      mailbox: Optional[MailBox] = None) -> IncrementalFetch:
+    # iterável de e-mails novos; chame .commit(uids salvos) depois de gravar
+    return IncrementalFetch(limit=limit, folder=folder, mailbox=mailbox)
 
 def _login_mailbox():
-    host = os.getenv("IMAP_HOST", "imap.gmail.com")
-    user = os.getenv("IMAP_USER"); pwd = os.getenv("IMAP_PASS")
-    folder = os.getenv("IMAP_FOLDER", "INBOX")
+    # sessão emprestada do pool (usar com `with`); devolvida ao pool no fim do bloco
+    host, user, pwd, folder = _imap_env()
     if not (host and user and pwd):
         raise RuntimeError("IMAP env faltando")
-    mb = MailBox(host).login(user, pwd, folder)
-    return mb
+    return get_imap_pool().session(folder)
 
 def mark_seen(uids: list[str]) -> int:
     if not uids: return 0
@@ -77,4 +304,4 @@ def move_to(uids: list[str], dest_folder: str) -> int:
     if not uids: return 0
     with _login_mailbox() as m:
         m.move(uids, dest_folder)
-    return len(uids)
\ No newline at end of file
+    return len(uids)
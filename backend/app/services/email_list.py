@@ -0,0 +1,67 @@
+import os, base64, json, uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+# Paginação por cursor (keyset) e projeção de colunas para GET /api/emails.
+# Ordem: received_at desc (nulos primeiro, padrão do Postgres), id desc. O cursor é o
+# par (received_at, id) da última linha da página, em base64url(JSON) opaco; a próxima
+# página é "tudo depois desse par", então a página 100 custa o mesmo índice
+# (emails_received_id_idx) que a primeira, sem OFFSET.
+# Projeção: só as colunas da lista (EMAIL_LIST_FIELDS); ?fields=a,b,c escolhe outras
+# (dentre EMAIL_COLUMNS) e ?fields=* devolve a linha inteira.
+
+EMAIL_COLUMNS = (
+    "id", "message_uid", "subject", "from_email", "from_name", "to_emails", "cc_emails",
+    "received_at", "category", "confidence", "importance", "importance_label",
+    "importance_reasons", "summary", "reply_suggested", "has_pdf", "created_at",
+)
+LIST_FIELDS = [
+    f.strip() for f in os.getenv(
+        "EMAIL_LIST_FIELDS", "id,message_uid,subject,from_email,received_at,category,importance_label,summary",
+    ).split(",") if f.strip()
+]
+_KEY = ("received_at", "id")  # sempre projetadas: o cursor sai delas
+
+def parse_fields(fields: Optional[str]) -> str:
+    # ValueError se pedir coluna desconhecida (o valor vai direto para o select do PostgREST)
+    if fields and fields.strip() == "*":
+        return "*"
+    cols = [f.strip() for f in fields.split(",") if f.strip()] if fields else list(LIST_FIELDS)
+    unknown = [c for c in cols if c not in EMAIL_COLUMNS]
+    if unknown:
+        raise ValueError(f"campos desconhecidos: {', '.join(unknown)}")
+    cols += [k for k in _KEY if k not in cols]
+    return ",".join(dict.fromkeys(cols))
+
+def encode_cursor(row: Dict[str, Any]) -> str:
+    raw = json.dumps([row.get("received_at"), row.get("id")], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple:
+    # ValueError se malformado; os valores são validados porque entram num filtro or=(...)
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        received_at, email_id = json.loads(raw)
+        email_id = str(uuid.UUID(str(email_id)))
+        if received_at is not None:
+            received_at = datetime.fromisoformat(str(received_at).replace("Z", "+00:00")).isoformat()
+    except Exception as e:
+        raise ValueError("cursor inválido") from e
+    return received_at, email_id
+
+def apply_cursor(q, cursor: Optional[str]):
+    # encadeia no builder (síncrono ou assíncrono) a ordem da paginação e o "depois do cursor"
+    q = q.order("received_at", desc=True).order("id", desc=True)
+    if not cursor:
+        return q
+    received_at, email_id = decode_cursor(cursor)
+    if received_at is None:
+        # ainda nos nulos (que vêm primeiro): resto dos nulos + todas as datas
+        return q.or_(f"and(received_at.is.null,id.lt.{email_id}),received_at.not.is.null")
+    return q.or_(f'received_at.lt."{received_at}",and(received_at.eq."{received_at}",id.lt.{email_id})')
+
+def page_from_rows(rows: List[Dict[str, Any]], limit: int) -> Dict[str, Any]:
+    # a consulta pede limit+1: a linha extra só diz se há próxima página
+    items = rows[:limit]
+    more = len(rows) > limit and bool(items)
+    return {"items": items, "limit": limit, "next_cursor": encode_cursor(items[-1]) if more else None}
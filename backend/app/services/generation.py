@@ -0,0 +1,56 @@
+import os, time
+from typing import Dict, Optional, Tuple
+
+# Contadores de geração (marcadores de mudança) para GET condicional e cache de respostas.
+# Cada escrita que muda o que as listas/detalhes mostram incrementa um contador na tabela
+# app_state (RPC bump_generation, atômica): "emails" (store_email, feedback) e "drafts"
+# (draft_cache). Os handlers leem os contadores (uma linha por nome, relida no máximo a
+# cada GENERATION_POLL_SECONDS) e montam ETag/Last-Modified com eles: nada mudou =>
+# mesmo ETag => 304, sem consultar emails. Sem a tabela (ou com erro), devolve None e a
+# API segue sem validação condicional.
+
+EMAILS = "emails"
+DRAFTS = "drafts"
+POLL_SECONDS = float(os.getenv("GENERATION_POLL_SECONDS", "1"))
+
+_snapshot: Dict[str, Tuple[int, Optional[str]]] = {}  # nome -> (valor, updated_at ISO)
+_read_at = 0.0
+_ok = False
+_stats = {"bumps": 0, "reads": 0, "errors": 0}
+
+def bump(name: str) -> Optional[int]:
+    # síncrono: chamado por store_email, feedback e draft_cache (scripts, threads, threadpool)
+    global _read_at
+    try:
+        from app.services.supabase_client import get_supabase
+        value = get_supabase().rpc("bump_generation", {"name": name}).execute().data
+    except Exception:
+        _stats["errors"] += 1
+        return None
+    _stats["bumps"] += 1
+    _read_at = 0.0  # a próxima leitura no processo já vê a mudança
+    return int(value) if value is not None else None
+
+async def current() -> Optional[Dict[str, Tuple[int, Optional[str]]]]:
+    global _snapshot, _read_at, _ok
+    now = time.monotonic()
+    if now - _read_at < POLL_SECONDS:
+        return dict(_snapshot) if _ok else None
+    _read_at = now
+    try:
+        from app.services.supabase_async import get_supabase_async
+        rows = (await get_supabase_async().table("app_state").select("key,value,updated_at")
+                .in_("key", [EMAILS, DRAFTS]).execute()).data or []
+    except Exception:
+        _stats["errors"] += 1
+        _ok = False
+        return None
+    _stats["reads"] += 1
+    _snapshot = {r["key"]: (int(r["value"]), r.get("updated_at")) for r in rows}
+    _ok = True
+    return dict(_snapshot)
+
+def generation_stats() -> dict:
+    out = dict(_stats)
+    out["snapshot"] = {k: v[0] for k, v in _snapshot.items()} if _ok else None
+    return out
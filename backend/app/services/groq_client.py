@@ -1,7 +1,31 @@
-import os
-from groq import Groq, BadRequestError
+import os, asyncio, hashlib, json, random, time
+from collections import deque
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+import threading
+from groq import (
+    Groq, AsyncGroq, BadRequestError, APIConnectionError, APITimeoutError, RateLimitError, InternalServerError,
+)
+
+# Caminho assíncrono (API): AsyncGroq com no máximo GROQ_MAX_INFLIGHT chamadas em voo,
+# prazo total por requisição (GROQ_DEADLINE_SECONDS, inclui a fila do semáforo e as
+# retentativas), retentativas com backoff exponencial e jitter para erros transitórios
+# (conexão, 429, 5xx) e disjuntor: após GROQ_BREAKER_FAILURES falhas seguidas fica aberto
+# por GROQ_BREAKER_COOLDOWN_SECONDS e as sugestões caem direto no template de
+# app/nlp/reply.suggest_reply, sem empilhar requisições numa Groq fora do ar.
+# O cliente síncrono continua para scripts; threads de fundo (pré-geração de rascunhos) usam
+# suggest_guarded, com o mesmo prazo, retentativas e disjuntor do caminho assíncrono.
+
+MAX_INFLIGHT = int(os.getenv("GROQ_MAX_INFLIGHT", "8"))
+DEADLINE_SECONDS = float(os.getenv("GROQ_DEADLINE_SECONDS", "20"))
+RETRIES = int(os.getenv("GROQ_RETRIES", "2"))
+BACKOFF_SECONDS = float(os.getenv("GROQ_BACKOFF_SECONDS", "0.5"))
+BREAKER_FAILURES = int(os.getenv("GROQ_BREAKER_FAILURES", "5"))
+BREAKER_COOLDOWN = float(os.getenv("GROQ_BREAKER_COOLDOWN_SECONDS", "30"))
+_RETRYABLE = (APIConnectionError, RateLimitError, InternalServerError)
 
 _client = None
+_async_client = None
+_semaphore: Optional[asyncio.Semaphore] = None
 
 def _get_client() -> Groq:
     global _client
@@ -12,7 +36,23 @@ def _get_client() -> Groq:
         _client = Groq(api_key=api_key)
     return _client
 
-def suggest_with_groq(subject: str, text: str) -> str:
+def _get_async_client() -> AsyncGroq:
+    global _async_client
+    if _async_client is None:
+        api_key = os.getenv("GROQ_API_KEY")
+        if not api_key:
+            raise RuntimeError("GROQ_API_KEY não configurado")
+        # retentativas ficam por nossa conta (jitter + prazo); o SDK não repete sozinho
+        _async_client = AsyncGroq(api_key=api_key, max_retries=0, timeout=DEADLINE_SECONDS)
+    return _async_client
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(max(1, MAX_INFLIGHT))
+    return _semaphore
+
+def build_request(subject: str, text: str) -> Tuple[str, List[Dict[str, str]]]:
     model = os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile")
     prompt = (
         "Você é um assistente de atendimento ao cliente. "
@@ -23,21 +63,262 @@ def suggest_with_groq(subject: str, text: str) -> str:
         f"Corpo:\n{text}\n\n"
         "Responda apenas com o texto do e-mail (sem rótulos)."
     )
+    messages = [
+        {"role": "system", "content": "Você escreve e-mails profissionais e concisos em português."},
+        {"role": "user",   "content": prompt},
+    ]
+    return model, messages
+
+def prompt_hash(model: str, messages: List[Dict[str, str]]) -> str:
+    # chave do cache de rascunhos: mesmo modelo + mesmo prompt => mesma resposta reaproveitável
+    raw = json.dumps({"model": model, "messages": messages, "temperature": 0.3}, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def _create(model: str, messages: List[Dict[str, str]], **extra):
     client = _get_client()
-    base_kwargs = dict(
-        model=model,
-        messages=[
-            {"role": "system", "content": "Você escreve e-mails profissionais e concisos em português."},
-            {"role": "user",   "content": prompt},
-        ],
-        temperature=0.3,
-    )
+    base_kwargs = dict(model=model, messages=messages, temperature=0.3, **extra)
     try:
-        resp = client.chat.completions.create(max_completion_tokens=300, **base_kwargs)
+        return client.chat.completions.create(max_completion_tokens=300, **base_kwargs)
     except TypeError:
-        resp = client.chat.completions.create(max_tokens=300, **base_kwargs)
+        return client.chat.completions.create(max_tokens=300, **base_kwargs)
     except BadRequestError as e:
         raise RuntimeError(
             f"Erro da Groq: {e}. Tente definir GROQ_MODEL=llama-3.3-70b-versatile ou llama-3.1-8b-instant no .env."
         )
-    return resp.choices[0].message.content.strip()
\ No newline at end of file
+
+def suggest_with_groq(subject: str, text: str) -> str:
+    model, messages = build_request(subject, text)
+    resp = _create(model, messages)
+    return resp.choices[0].message.content.strip()
+
+def stream_with_groq(subject: str, text: str) -> Iterator[str]:
+    # tokens conforme chegam (stream=True); quem consome junta e faz o strip no fim
+    model, messages = build_request(subject, text)
+    for chunk in _create(model, messages, stream=True):
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            yield delta
+
+
+class GroqUnavailable(RuntimeError):
+    # reason: breaker_open | deadline | error
+    def __init__(self, reason: str, detail: str = ""):
+        super().__init__(f"{reason}: {detail}" if detail else reason)
+        self.reason = reason
+
+class _CircuitBreaker:
+    # fechado -> (N falhas seguidas) aberto -> (cooldown) meio-aberto: 1 sonda; sucesso fecha
+    # compartilhado entre o event loop da API e a thread de pré-geração (lock)
+    def __init__(self, failures: int, cooldown: float):
+        self.failures = failures
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.consecutive = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "open":
+                if time.monotonic() - self.opened_at < self.cooldown:
+                    return False
+                self.state, self.probing = "half_open", False
+            if self.state == "half_open":
+                if self.probing:
+                    return False
+                self.probing = True
+            return True
+
+    def success(self):
+        with self._lock:
+            self.state, self.consecutive, self.probing = "closed", 0, False
+
+    def failure(self):
+        with self._lock:
+            self.consecutive += 1
+            if self.state == "half_open" or (self.failures > 0 and self.consecutive >= self.failures):
+                self.state, self.opened_at, self.probing = "open", time.monotonic(), False
+
+_breaker = _CircuitBreaker(BREAKER_FAILURES, BREAKER_COOLDOWN)
+_latencies = deque(maxlen=512)  # ms das chamadas bem-sucedidas
+_metrics = {
+    "requests": 0, "ok": 0, "retries": 0, "inflight": 0,
+    "fallback_breaker_open": 0, "fallback_deadline": 0, "fallback_error": 0,
+    "background_requests": 0, "background_ok": 0,  # suggest_guarded (fora da taxa de fallback)
+}
+
+def _backoff(attempt: int) -> float:
+    # exponencial com jitter ("full jitter"): espalha as retentativas de vários workers
+    return random.uniform(0, BACKOFF_SECONDS * (2 ** attempt))
+
+async def _create_async(model: str, messages: List[Dict[str, str]], deadline: float, **extra):
+    client = _get_async_client()
+    kwargs = dict(model=model, messages=messages, temperature=0.3, **extra)
+    attempt = 0
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise asyncio.TimeoutError()
+        try:
+            try:
+                call = client.chat.completions.create(max_completion_tokens=300, **kwargs)
+            except TypeError:  # SDK antigo: só max_tokens (mesmo fallback do caminho síncrono)
+                call = client.chat.completions.create(max_tokens=300, **kwargs)
+            return await asyncio.wait_for(call, remaining)
+        except _RETRYABLE:
+            if attempt >= RETRIES:
+                raise
+            wait = _backoff(attempt)
+            if time.monotonic() + wait >= deadline:
+                raise
+            attempt += 1
+            _metrics["retries"] += 1
+            await asyncio.sleep(wait)
+
+async def _acquire(deadline: float):
+    sem = _get_semaphore()
+    await asyncio.wait_for(sem.acquire(), max(0.0, deadline - time.monotonic()))
+    _metrics["inflight"] += 1
+
+def _release():
+    _metrics["inflight"] -= 1
+    _get_semaphore().release()
+
+def _fail(reason: str, exc: BaseException) -> GroqUnavailable:
+    _breaker.failure()
+    return GroqUnavailable(reason, f"{type(exc).__name__}: {exc}")
+
+async def suggest_async(subject: str, text: str) -> str:
+    # uma completion com semáforo, prazo, retentativas e disjuntor; GroqUnavailable se não deu
+    _metrics["requests"] += 1
+    if not _breaker.allow():
+        raise GroqUnavailable("breaker_open")
+    model, messages = build_request(subject, text)
+    t0 = time.monotonic()
+    deadline = t0 + DEADLINE_SECONDS
+    try:
+        await _acquire(deadline)
+    except asyncio.TimeoutError as e:
+        raise _fail("deadline", e)
+    try:
+        resp = await _create_async(model, messages, deadline)
+    except asyncio.TimeoutError as e:
+        raise _fail("deadline", e)
+    except Exception as e:
+        raise _fail("error", e)
+    finally:
+        _release()
+    _breaker.success()
+    _metrics["ok"] += 1
+    _latencies.append((time.monotonic() - t0) * 1000)
+    return resp.choices[0].message.content.strip()
+
+async def stream_async(subject: str, text: str) -> AsyncIterator[str]:
+    # streaming com as mesmas proteções; o prazo vale para a resposta inteira
+    _metrics["requests"] += 1
+    if not _breaker.allow():
+        raise GroqUnavailable("breaker_open")
+    model, messages = build_request(subject, text)
+    t0 = time.monotonic()
+    deadline = t0 + DEADLINE_SECONDS
+    try:
+        await _acquire(deadline)
+    except asyncio.TimeoutError as e:
+        raise _fail("deadline", e)
+    try:
+        stream = await _create_async(model, messages, deadline, stream=True)
+        chunks = stream.__aiter__()
+        while True:
+            try:
+                chunk = await asyncio.wait_for(chunks.__anext__(), max(0.0, deadline - time.monotonic()))
+            except StopAsyncIteration:
+                break
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                yield delta
+    except asyncio.TimeoutError as e:
+        raise _fail("deadline", e)
+    except GeneratorExit:
+        _breaker.probing = False  # cliente desconectou: não conta como falha nem sucesso
+        raise
+    except Exception as e:
+        raise _fail("error", e)
+    finally:
+        _release()
+    _breaker.success()
+    _metrics["ok"] += 1
+    _latencies.append((time.monotonic() - t0) * 1000)
+
+def _create_guarded(model: str, messages: List[Dict[str, str]], deadline: float):
+    # _create_async para threads: timeout do SDK = o que resta do prazo, retentativas nossas
+    kwargs = dict(model=model, messages=messages, temperature=0.3)
+    attempt = 0
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError()
+        client = _get_client().with_options(max_retries=0, timeout=remaining)
+        try:
+            try:
+                return client.chat.completions.create(max_completion_tokens=300, **kwargs)
+            except TypeError:  # SDK antigo: só max_tokens
+                return client.chat.completions.create(max_tokens=300, **kwargs)
+        except APITimeoutError as e:  # subclasse de APIConnectionError: prazo, não retentativa
+            raise TimeoutError() from e
+        except _RETRYABLE:
+            if attempt >= RETRIES:
+                raise
+            wait = _backoff(attempt)
+            if time.monotonic() + wait >= deadline:
+                raise
+            attempt += 1
+            _metrics["retries"] += 1
+            time.sleep(wait)
+
+def suggest_guarded(subject: str, text: str) -> str:
+    # versão síncrona de suggest_async para threads de fundo: mesmo prazo, retentativas e
+    # disjuntor (sem o semáforo: a thread já faz uma chamada por vez); GroqUnavailable se não deu
+    _metrics["background_requests"] += 1
+    if not _breaker.allow():
+        raise GroqUnavailable("breaker_open")
+    model, messages = build_request(subject, text)
+    t0 = time.monotonic()
+    try:
+        resp = _create_guarded(model, messages, t0 + DEADLINE_SECONDS)
+    except TimeoutError as e:
+        raise _fail("deadline", e)
+    except Exception as e:
+        raise _fail("error", e)
+    _breaker.success()
+    _metrics["background_ok"] += 1
+    _latencies.append((time.monotonic() - t0) * 1000)
+    return resp.choices[0].message.content.strip()
+
+def template_reply(category: str, text: str) -> str:
+    from app.nlp.reply import suggest_reply
+    return suggest_reply(category, text)
+
+async def suggest_with_fallback(subject: str, text: str, category: str) -> Tuple[str, str]:
+    # (rascunho, origem): "groq" ou "template" (disjuntor aberto, prazo estourado, erro)
+    try:
+        return await suggest_async(subject, text), "groq"
+    except GroqUnavailable as e:
+        record_fallback(e.reason)
+        return template_reply(category, text or subject), "template"
+
+def record_fallback(reason: str):
+    key = f"fallback_{reason}"
+    _metrics[key] = _metrics.get(key, 0) + 1
+
+def groq_stats() -> Dict:
+    out = dict(_metrics)
+    fallbacks = sum(v for k, v in _metrics.items() if k.startswith("fallback_"))
+    out["fallback_rate"] = round(fallbacks / _metrics["requests"], 4) if _metrics["requests"] else 0.0
+    out["breaker_state"] = _breaker.state
+    lat = sorted(_latencies)
+    for name, q in (("p50", 0.50), ("p95", 0.95), ("p99", 0.99)):
+        out[f"latency_{name}_ms"] = round(lat[min(len(lat) - 1, int(q * len(lat)))], 1) if lat else None
+    return out
@@ -0,0 +1,82 @@
+import os, json, hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Iterable, Optional, Tuple
+
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+
+from app.services import generation
+from app.services.lru import LRUCache
+
+# GET condicional + cache curto de respostas para /api/emails e /api/emails/{id}.
+# ETag = contadores de geração (generation.py) + hash dos parâmetros normalizados;
+# Last-Modified = último incremento desses contadores. If-None-Match/If-Modified-Since
+# batendo => 304 sem tocar em emails. A resposta montada fica num LRU
+# (RESPONSE_CACHE_SIZE, TTL RESPONSE_CACHE_TTL_SECONDS) com a geração na chave: uma
+# gravação muda a chave na hora; o TTL só limita o que não incrementa contador.
+
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "5"))
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "256"))
+
+_responses = LRUCache(RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL or None)
+_stats = {"not_modified": 0, "built": 0}
+
+def _parse_ts(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        ts = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+def _validators(key: Tuple, names: Iterable[str], snapshot) -> Tuple[Optional[str], Optional[datetime], Tuple]:
+    if snapshot is None:  # sem marcador de mudança: nada de 304, cache só pelo TTL
+        return None, None, ()
+    gens = tuple(snapshot.get(n, (0, None))[0] for n in names)
+    stamps = [ts for ts in (_parse_ts(snapshot.get(n, (0, None))[1]) for n in names) if ts]
+    digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()[:16]
+    etag = 'W/"' + ".".join(map(str, gens)) + "-" + digest + '"'
+    return etag, (max(stamps).replace(microsecond=0) if stamps else None), gens
+
+def _not_modified(request: Request, etag: Optional[str], modified: Optional[datetime]) -> bool:
+    inm = request.headers.get("if-none-match")
+    if inm is not None:  # If-None-Match vence If-Modified-Since (RFC 9110)
+        return etag is not None and (inm.strip() == "*" or etag in [t.strip() for t in inm.split(",")])
+    ims = request.headers.get("if-modified-since")
+    if ims and modified:
+        try:
+            since = parsedate_to_datetime(ims)
+        except (TypeError, ValueError):
+            return False
+        return since.tzinfo is not None and modified <= since
+    return False
+
+async def conditional_json(request: Request, key: Tuple, names: Iterable[str],
+                           build: Callable[[], Awaitable[Any]]) -> Response:
+    # key = parâmetros normalizados da consulta; names = contadores de que a resposta depende
+    names = tuple(names)
+    etag, modified, gens = _validators(key, names, await generation.current())
+    headers = {"Cache-Control": "private, no-cache"}  # cliente guarda, mas revalida sempre
+    if etag:
+        headers["ETag"] = etag
+    if modified:
+        headers["Last-Modified"] = format_datetime(modified, usegmt=True)
+    if etag and _not_modified(request, etag, modified):
+        _stats["not_modified"] += 1
+        return Response(status_code=304, headers=headers)
+
+    cache_key = (key, gens)
+    body = _responses.get(cache_key)
+    if body is None:
+        body = json.dumps(jsonable_encoder(await build()), ensure_ascii=False).encode("utf-8")
+        _responses.set(cache_key, body)
+        _stats["built"] += 1
+    return Response(body, media_type=JSONResponse.media_type, headers=headers)
+
+def response_cache_stats() -> dict:
+    out = {"memory": _responses.stats(), "generation": generation.generation_stats()}
+    out.update(_stats)
+    return out
@@ -0,0 +1,208 @@
+import binascii, quopri, re
+from email.header import decode_header, make_header
+from email.utils import collapse_rfc2231_value, decode_params, unquote
+from typing import Any, Dict, List, Optional
+
+# Parser mínimo das respostas FETCH do IMAP (rfc3501): átomos, strings, literais {n}
+# e listas. Usado para ler BODYSTRUCTURE e baixar só as partes que o pipeline usa.
+
+_DELIMS = b" ()\r\n"
+
+def _parse_values(buf: bytes, pos: int = 0, depth: int = 0):
+    out: List[Any] = []
+    n = len(buf)
+    while pos < n:
+        c = buf[pos:pos + 1]
+        if c in (b" ", b"\r", b"\n"):
+            pos += 1
+        elif c == b"(":
+            val, pos = _parse_values(buf, pos + 1, depth + 1)
+            out.append(val)
+        elif c == b")":
+            if depth:
+                return out, pos + 1
+            pos += 1
+        elif c == b'"':
+            pos += 1
+            chunk = bytearray()
+            while pos < n and buf[pos:pos + 1] != b'"':
+                if buf[pos:pos + 1] == b"\\":
+                    pos += 1
+                chunk += buf[pos:pos + 1]
+                pos += 1
+            out.append(bytes(chunk))
+            pos += 1
+        elif c == b"{":
+            end = buf.index(b"}", pos)
+            size = int(buf[pos + 1:end])
+            start = end + 1
+            if buf[start:start + 2] == b"\r\n":
+                start += 2
+            out.append(bytes(buf[start:start + size]))
+            pos = start + size
+        else:
+            start = pos
+            bracket = 0
+            while pos < n:
+                ch = buf[pos:pos + 1]
+                if ch == b"[":
+                    bracket += 1
+                elif ch == b"]":
+                    bracket -= 1
+                elif bracket <= 0 and ch in _DELIMS:
+                    break
+                pos += 1
+            atom = buf[start:pos].decode("ascii", "replace")
+            out.append(None if atom.upper() == "NIL" else atom)
+    return out, pos
+
+def parse_fetch(data: list) -> List[Dict[str, Any]]:
+    # imaplib entrega literais como tuplas (prefixo "{n}", bytes); remonta o buffer e parseia.
+    buf = bytearray()
+    for item in data or []:
+        if isinstance(item, tuple):
+            buf += item[0] + b"\r\n" + item[1]
+        elif item:
+            buf += item
+    values, _ = _parse_values(bytes(buf))
+    out = []
+    for v in values:
+        if isinstance(v, list):
+            out.append({str(k).upper(): val for k, val in zip(v[0::2], v[1::2])})
+    return out
+
+def _s(v) -> str:
+    if v is None:
+        return ""
+    if isinstance(v, bytes):
+        return v.decode("utf-8", "replace")
+    return str(v)
+
+def _params(lst) -> Dict[str, str]:
+    out: Dict[str, str] = {}
+    if isinstance(lst, list):
+        for k, v in zip(lst[0::2], lst[1::2]):
+            out[_s(k).lower()] = _s(v)
+    return out
+
+_EXTENDED = re.compile(r"^(filename|name)\*(\d+\*?)?$")
+
+def _rfc2231(src: Dict[str, str], key: str) -> Optional[str]:
+    # FILENAME*=utf-8''rel%C3%B3rio.pdf e continuações FILENAME*0*=/FILENAME*1*= (rfc2231);
+    # None se não houver; parâmetro malformado => ""
+    items = [(k, v) for k, v in src.items() if (m := _EXTENDED.match(k)) and m.group(1) == key]
+    if not items:
+        return None
+    try:
+        for name, value in decode_params([("", "")] + items)[1:]:
+            if name == key:
+                return unquote(collapse_rfc2231_value(value))
+    except Exception:
+        pass
+    return ""
+
+def _filename(params: Dict[str, str], dparams: Dict[str, str]) -> str:
+    for src in (dparams, params):
+        for key in ("filename", "name"):
+            if key in src:
+                return _decode_words(src[key])
+            value = _rfc2231(src, key)
+            if value is not None:
+                return value
+    return ""
+
+def _decode_words(value: str) -> str:
+    try:
+        return str(make_header(decode_header(value)))
+    except Exception:
+        return value
+
+def bodystructure_parts(bs, prefix: str = "") -> List[Dict[str, Any]]:
+    # Folhas do BODYSTRUCTURE: [{section, content_type, encoding, size, charset, filename, is_attachment}]
+    parts: List[Dict[str, Any]] = []
+    if not isinstance(bs, list) or not bs:
+        return parts
+    if isinstance(bs[0], list):  # multipart: filhos primeiro, depois subtipo e extensões
+        i = 0
+        for child in bs:
+            if not isinstance(child, list):
+                break
+            i += 1
+            parts.extend(bodystructure_parts(child, f"{prefix}.{i}" if prefix else str(i)))
+        return parts
+
+    ctype = f"{_s(bs[0])}/{_s(bs[1])}".lower()
+    params = _params(bs[2] if len(bs) > 2 else None)
+    encoding = _s(bs[5] if len(bs) > 5 else "7bit").lower()
+    size = int(bs[6]) if len(bs) > 6 and str(bs[6]).isdigit() else 0
+    if ctype.startswith("text/"):
+        ext = 8
+    elif ctype == "message/rfc822":
+        ext = 10
+    else:
+        ext = 7
+    disp = bs[ext + 1] if len(bs) > ext + 1 else None
+    disposition = _s(disp[0]).lower() if isinstance(disp, list) and disp else ""
+    dparams = _params(disp[1] if isinstance(disp, list) and len(disp) > 1 else None)
+    filename = _filename(params, dparams)
+
+    if encoding == "base64":
+        size = size * 3 // 4  # tamanho aproximado já decodificado
+    parts.append({
+        "section": prefix or "1",
+        "content_type": ctype,
+        "encoding": encoding,
+        "size": size,
+        "charset": params.get("charset", ""),
+        "filename": filename,
+        "is_attachment": disposition == "attachment" or bool(filename) or ctype == "message/rfc822",
+    })
+    return parts
+
+class StreamDecoder:
+    # Decodifica Content-Transfer-Encoding em pedaços (base64 alinhado em 4, QP sem cortar "=XX")
+    def __init__(self, encoding: str):
+        self.encoding = (encoding or "").lower()
+        self._rest = b""
+
+    def feed(self, data: bytes) -> bytes:
+        if self.encoding == "base64":
+            data = self._rest + re.sub(rb"[^A-Za-z0-9+/=]", b"", data)
+            cut = len(data) - len(data) % 4
+            self._rest = data[cut:]
+            try:
+                return binascii.a2b_base64(data[:cut])
+            except binascii.Error:
+                return b""
+        if self.encoding == "quoted-printable":
+            data = self._rest + data
+            cut = data.rfind(b"=", max(0, len(data) - 2))
+            if cut != -1:
+                self._rest, data = data[cut:], data[:cut]
+            else:
+                self._rest = b""
+            return quopri.decodestring(data)
+        return data
+
+    def flush(self) -> bytes:
+        rest, self._rest = self._rest, b""
+        if not rest:
+            return b""
+        if self.encoding == "base64":
+            try:
+                return binascii.a2b_base64(rest + b"=" * (-len(rest) % 4))
+            except binascii.Error:
+                return b""
+        if self.encoding == "quoted-printable":
+            return quopri.decodestring(rest)
+        return rest
+
+def decode_part(data: bytes, encoding: str) -> bytes:
+    dec = StreamDecoder(encoding)
+    return dec.feed(data or b"") + dec.flush()
+
+def decode_text(data: bytes, charset: Optional[str]) -> str:
+    try:
+        return data.decode(charset or "utf-8", "replace")
+    except LookupError:
+        return data.decode("latin-1", "replace")
@@ -0,0 +1,152 @@
+import os, imaplib, socket, ssl, threading, time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+from imap_tools import MailBox
+
+# Pool de sessões IMAP autenticadas, por (host, usuário, pasta).
+# Evita TCP+TLS+LOGIN a cada fetch/flag/move: a sessão é emprestada com
+# `with get_imap_pool().session() as mb:` e devolvida ao final. Sessões ociosas
+# recebem NOOP periódico (thread de keepalive) e são validadas no empréstimo;
+# conexão quebrada é descartada e substituída por uma nova.
+
+NOOP_SECONDS = float(os.getenv("IMAP_POOL_NOOP_SECONDS", "120"))
+MAX_IDLE = int(os.getenv("IMAP_POOL_MAX_IDLE", "2"))           # sessões ociosas por chave
+MAX_AGE = float(os.getenv("IMAP_POOL_MAX_AGE_SECONDS", "1500"))  # recicla antes do timeout do servidor
+
+_BROKEN = (imaplib.IMAP4.abort, socket.error, ssl.SSLError, EOFError)
+
+Key = Tuple[str, str, str]
+
+class _Session:
+    __slots__ = ("mailbox", "created", "last_used")
+
+    def __init__(self, mailbox: MailBox):
+        self.mailbox = mailbox
+        self.created = self.last_used = time.monotonic()
+
+def _close(s: _Session):
+    try:
+        s.mailbox.logout()
+    except Exception:
+        pass
+
+class ImapSessionPool:
+    def __init__(self, noop_seconds: float = NOOP_SECONDS, max_idle: int = MAX_IDLE, max_age: float = MAX_AGE):
+        self.noop_seconds = noop_seconds
+        self.max_idle = max_idle
+        self.max_age = max_age
+        self._idle: Dict[Key, List[_Session]] = {}
+        self._lock = threading.Lock()
+        self._keepalive: Optional[threading.Thread] = None
+        self.stats = {"logins": 0, "reused": 0, "reconnects": 0}
+
+    def _login(self, key: Key, passwd: str) -> _Session:
+        host, user, folder = key
+        mb = MailBox(host).login(user, passwd, folder)
+        self.stats["logins"] += 1
+        return _Session(mb)
+
+    def _healthy(self, s: _Session) -> bool:
+        now = time.monotonic()
+        if now - s.created > self.max_age:
+            return False
+        if now - s.last_used < self.noop_seconds:
+            return True
+        try:
+            s.mailbox.client.noop()
+            s.last_used = now
+            return True
+        except _BROKEN:
+            return False
+
+    def _acquire(self, key: Key, passwd: str) -> _Session:
+        while True:
+            with self._lock:
+                s = self._idle.get(key, []).pop() if self._idle.get(key) else None
+            if s is None:
+                return self._login(key, passwd)
+            if self._healthy(s):
+                self.stats["reused"] += 1
+                return s
+            self.stats["reconnects"] += 1
+            _close(s)
+
+    def _release(self, key: Key, s: _Session):
+        s.last_used = time.monotonic()
+        if s.mailbox.folder.get() != key[2]:
+            try:
+                s.mailbox.folder.set(key[2])
+            except _BROKEN:
+                _close(s)
+                return
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle:
+                idle.append(s)
+                s = None
+        if s is not None:
+            _close(s)
+        self._start_keepalive()
+
+    @contextmanager
+    def session(self, folder: Optional[str] = None, host: Optional[str] = None,
+                user: Optional[str] = None, passwd: Optional[str] = None) -> Iterator[MailBox]:
+        host = host or os.getenv("IMAP_HOST", "imap.gmail.com")
+        user = user or os.getenv("IMAP_USER")
+        passwd = passwd or os.getenv("IMAP_PASS")
+        folder = folder or os.getenv("IMAP_FOLDER", "INBOX")
+        if not (host and user and passwd):
+            raise RuntimeError("IMAP_HOST/IMAP_USER/IMAP_PASS não configurados (.env).")
+
+        key = (host, user, folder)
+        s = self._acquire(key, passwd)
+        try:
+            yield s.mailbox
+        except _BROKEN:
+            _close(s)
+            s = None
+            raise
+        finally:
+            if s is not None:
+                self._release(key, s)
+
+    def keepalive(self):
+        # NOOP nas sessões ociosas há mais de noop_seconds; descarta as quebradas/velhas
+        now = time.monotonic()
+        with self._lock:
+            pending = []
+            for key, lst in self._idle.items():
+                stale = [s for s in lst if now - s.last_used >= self.noop_seconds]
+                lst[:] = [s for s in lst if s not in stale]
+                pending.extend((key, s) for s in stale)
+        for key, s in pending:
+            if self._healthy(s):
+                with self._lock:
+                    self._idle.setdefault(key, []).append(s)
+            else:
+                _close(s)
+
+    def _start_keepalive(self):
+        if self._keepalive is not None or self.noop_seconds <= 0:
+            return
+        def _loop():
+            while True:
+                time.sleep(self.noop_seconds)
+                self.keepalive()
+        self._keepalive = threading.Thread(target=_loop, name="imap-pool-keepalive", daemon=True)
+        self._keepalive.start()
+
+    def close_all(self):
+        with self._lock:
+            pending = [s for lst in self._idle.values() for s in lst]
+            self._idle = {}
+        for s in pending:
+            _close(s)
+
+_pool: Optional[ImapSessionPool] = None
+
+def get_imap_pool() -> ImapSessionPool:
+    global _pool
+    if _pool is None:
+        _pool = ImapSessionPool()
+    return _pool
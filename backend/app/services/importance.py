@@ -1,6 +1,8 @@
 import os, re
 from datetime import datetime, timezone
-from typing import Tuple, List, Dict
+from typing import Tuple, List, Dict, Union
+from app.nlp import keywords
+from app.nlp.document import EmailDocument, as_document
 
 def _now() -> datetime:
     return datetime.now(timezone.utc)
@@ -15,16 +17,33 @@ URGENCY_PATTERNS = [
     r"\bultimo\s*dia\b", r"\batrasad[ao]\b",
 ]
 
+# URGENCY_PATTERNS expandidos em literais (texto já dobrado: minúsculo, sem acento, espaço único)
+# -> padrão de origem; todos com fronteira de palavra, como o \b das regex. No texto dobrado
+# é só pré-filtro: cada padrão candidato é confirmado com a regex no texto original em
+# minúsculas, como antes da varredura compartilhada ("último dia" não casa `ultimo\s*dia`)
+URGENCY_LITERALS = {
+    "urgent": URGENCY_PATTERNS[0], "urgente": URGENCY_PATTERNS[0],
+    "asap": URGENCY_PATTERNS[1],
+    "prioridade": URGENCY_PATTERNS[2],
+    "p1": URGENCY_PATTERNS[3],
+    "prazo": URGENCY_PATTERNS[4],
+    "hoje": URGENCY_PATTERNS[5],
+    "amanha": URGENCY_PATTERNS[6],
+    "deadline": URGENCY_PATTERNS[7],
+    "ultimo dia": URGENCY_PATTERNS[8], "ultimodia": URGENCY_PATTERNS[8],
+    "atrasado": URGENCY_PATTERNS[9], "atrasada": URGENCY_PATTERNS[9],
+}
+keywords.register("importance.urgency", URGENCY_LITERALS, word=True)
+_URGENCY_RE = {p: re.compile(p) for p in URGENCY_PATTERNS}
+
 PROD_ATTACH_HINTS = [r"comprovante", r"contrato", r"boleto", r"nf|nota\s*fiscal", r"documento"]
 
 VIP_DOMAINS = set(_csv_env("VIP_DOMAINS"))
 
-def compute_importance(meta: Dict, text: str, category: str) -> Tuple[int, str, List[str]]:
+def compute_importance(meta: Dict, text: Union[str, EmailDocument], category: str) -> Tuple[int, str, List[str]]:
     score = 0
     reasons: List[str] = []
 
-    t = (text or "").lower()
-    subject = (meta.get("subject") or "").lower()
     sender = (meta.get("from_email") or "").lower()
     attachments = meta.get("attachments") or []
     received_at = meta.get("received_at")
@@ -39,7 +58,15 @@ def compute_importance(meta: Dict, text: str, category: str) -> Tuple[int, str,
         score += 20
         reasons.append("vip_domain")
 
-    urg_hits = [p for p in URGENCY_PATTERNS if re.search(p, t) or re.search(p, subject)]
+    doc = as_document(text)
+    subject = meta.get("subject") or ""
+    candidates = set(doc.matches.found("importance.urgency"))
+    candidates.update(keywords.scan(subject).found("importance.urgency"))
+    urg_hits = []
+    if candidates:
+        t, subject = doc.text.lower(), subject.lower()
+        urg_hits = [p for p in URGENCY_PATTERNS
+                    if p in candidates and (_URGENCY_RE[p].search(t) or _URGENCY_RE[p].search(subject))]
     if urg_hits:
         score += 20 + 5 * min(3, len(urg_hits))
         reasons.append("urgency_keywords")
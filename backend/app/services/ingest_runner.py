@@ -0,0 +1,136 @@
+import os, multiprocessing
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+from app.pipeline import build_email_packs
+from app.services.store_email import save_email_packs
+from app.services.draft_pregen import maybe_enqueue
+from app.services.attachments import release_attachments
+from app.services.pdf_reader import mark_inline_worker
+
+# Pipeline de ingestão em estágios:
+#   fetch (gerador IMAP, thread atual) -> NLP em lotes (build_email_packs, pool de processos, CPU)
+#   -> persistência em lote (save_email_packs, pool de threads, I/O)
+# Os estágios são ligados por janelas limitadas (INGEST_QUEUE_SIZE): o fetch só avança quando há
+# vaga, então a memória fica limitada e a espera de rede sobrepõe o processamento nos outros núcleos.
+# A saída sai na mesma ordem da entrada (determinística).
+# INGEST_NLP_WORKERS=0 / INGEST_IO_WORKERS=0 executam o estágio inline (sem pool).
+# O pool de NLP usa forkserver, não fork: na API o processo já tem threads (pool httpx do
+# Supabase, pré-geração de rascunhos, threadpool do Starlette) e um fork herdaria locks
+# presos, travando os filhos.
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+NLP_WORKERS = _env_int("INGEST_NLP_WORKERS", os.cpu_count() or 1)
+IO_WORKERS = _env_int("INGEST_IO_WORKERS", 4)
+QUEUE_SIZE = _env_int("INGEST_QUEUE_SIZE", 0)  # 0 => 2x workers do estágio
+SAVE_BATCH = _env_int("INGEST_SAVE_BATCH", 50)  # packs por chamada de save_email_packs
+NLP_BATCH = _env_int("INGEST_NLP_BATCH", 16)    # e-mails por tarefa de NLP (uma classificação por lote)
+
+class _InlineExecutor(Executor):
+    def submit(self, fn, *args, **kwargs):
+        fut: Future = Future()
+        try:
+            fut.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            fut.set_exception(e)
+        return fut
+
+_POOLS: Dict[Tuple[str, int], Executor] = {}
+
+def _pool(kind: str, workers: int) -> Executor:
+    # pools reaproveitados entre execuções (evita recarregar modelos em cada chamada da API)
+    if workers <= 0:
+        return _InlineExecutor()
+    key = (kind, workers)
+    if key not in _POOLS:
+        if kind == "nlp":
+            # workers marcados: o PDF roda inline neles (pdf_reader), sem abrir outro nível de processos
+            _POOLS[key] = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("forkserver"),
+                initializer=mark_inline_worker,
+            )
+        else:
+            _POOLS[key] = ThreadPoolExecutor(max_workers=workers)
+    return _POOLS[key]
+
+def run_ingest(
+    raws: Iterable[Dict[str, Any]],
+    nlp_workers: Optional[int] = None,
+    io_workers: Optional[int] = None,
+    queue_size: Optional[int] = None,
+    save_batch: Optional[int] = None,
+    nlp_batch: Optional[int] = None,
+) -> Iterator[Tuple[Any, Dict[str, Any], Dict[str, Any]]]:
+    # Gera (uid IMAP, pack, {message_uid, email_id, error}) na ordem de chegada dos e-mails.
+    nlp_workers = NLP_WORKERS if nlp_workers is None else nlp_workers
+    io_workers = IO_WORKERS if io_workers is None else io_workers
+    queue_size = queue_size or QUEUE_SIZE
+    save_batch = max(1, save_batch or SAVE_BATCH)
+    nlp_batch = max(1, nlp_batch or NLP_BATCH)
+    nlp_depth = queue_size or max(1, 2 * nlp_workers)
+    io_depth = queue_size or max(1, 2 * io_workers)
+
+    nlp_pool = _pool("nlp", nlp_workers)
+    io_pool = _pool("io", io_workers)
+    nlp_q: deque = deque()  # ([uid], Future[[pack]])
+    io_q: deque = deque()   # ([(uid, pack)], Future[[result]])
+    pending: list = []      # e-mails brutos aguardando completar um lote de NLP
+    batch: list = []
+
+    def _flush():
+        if batch:
+            items = list(batch)
+            batch.clear()
+            io_q.append((items, io_pool.submit(save_email_packs, [p for _, p in items], save_batch)))
+
+    def _submit():
+        if pending:
+            raws_ = list(pending)
+            pending.clear()
+            nlp_q.append(([r.get("uid") for r in raws_], nlp_pool.submit(build_email_packs, raws_)))
+
+    def _to_io():
+        uids, fut = nlp_q.popleft()
+        for uid, pack in zip(uids, fut.result()):
+            batch.append((uid, pack))
+            if len(batch) >= save_batch:
+                _flush()
+
+    def _out():
+        items, fut = io_q.popleft()
+        for (uid, pack), res in zip(items, fut.result()):
+            if not res["error"]:
+                maybe_enqueue(pack, res["email_id"])  # rascunho em segundo plano (high/urgent)
+            yield uid, pack, res
+
+    try:
+        for raw in raws:
+            pending.append(raw)
+            if len(pending) < nlp_batch:
+                continue
+            _submit()
+            while len(nlp_q) >= nlp_depth:
+                _to_io()
+            while len(io_q) >= io_depth:
+                yield from _out()
+        _submit()
+        while nlp_q:
+            _to_io()
+            while len(io_q) >= io_depth:
+                yield from _out()
+        _flush()
+        while io_q:
+            yield from _out()
+    finally:
+        for raw in pending:
+            release_attachments(raw.get("attachments"))
+        for _, fut in nlp_q:
+            fut.cancel()
+        for _, fut in io_q:
+            fut.cancel()
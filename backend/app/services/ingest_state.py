@@ -0,0 +1,22 @@
+from typing import Optional, Tuple
+from datetime import datetime, timezone
+from app.services.supabase_client import get_supabase
+
+# Checkpoint da ingestão incremental por pasta IMAP (tabela imap_checkpoints).
+# key = "host:user:folder"
+
+def load_checkpoint(key: str) -> Tuple[Optional[int], int]:
+    sb = get_supabase()
+    rows = sb.table("imap_checkpoints").select("uidvalidity,last_uid").eq("key", key).limit(1).execute().data
+    if not rows:
+        return None, 0
+    return rows[0].get("uidvalidity"), int(rows[0].get("last_uid") or 0)
+
+def save_checkpoint(key: str, uidvalidity: Optional[int], last_uid: int) -> None:
+    sb = get_supabase()
+    sb.table("imap_checkpoints").upsert({
+        "key": key,
+        "uidvalidity": uidvalidity,
+        "last_uid": int(last_uid),
+        "updated_at": datetime.now(timezone.utc).isoformat(),
+    }, on_conflict="key").execute()
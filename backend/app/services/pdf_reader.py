@@ -1,10 +1,169 @@
-from io import BytesIO
-from pdfminer.high_level import extract_text
+import os, hashlib, multiprocessing, signal, threading
+from io import BytesIO, StringIO
+from typing import Optional, Tuple, Union
+from pdfminer.converter import TextConverter
+from pdfminer.layout import LAParams
+from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+from pdfminer.pdfpage import PDFPage
+from app.services.lru import LRUCache
 
-def extract_text_from_pdf(data: bytes) -> str:
+# Extração de PDF isolada: PDF_WORKERS processos dedicados (forkserver: a API já roda
+# threads, fork herdaria locks), cada um com seu pipe, timeout por documento, limite de
+# páginas e de caracteres, e cache por SHA-256 dos bytes (o mesmo anexo encaminhado para
+# várias pessoas é parseado uma vez só). PDF travado => só o processo que o está lendo é
+# morto e substituído; as outras extrações seguem. O prazo conta a partir do envio ao
+# worker (não inclui a espera por vaga). Só extrações bem-sucedidas vão para o cache.
+# Nos workers do pool de NLP da ingestão (marcados por mark_inline_worker, initializer do
+# pool) roda inline, com o timeout via SIGALRM: já estão isolados e não devem criar outros
+# processos. Não dá para inferir isso de parent_process(): `uvicorn --reload`/`--workers`
+# também rodam a API num processo filho.
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "2"))
+PDF_TIMEOUT = float(os.getenv("PDF_TIMEOUT_SECONDS", "15"))
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "30"))
+PDF_MAX_CHARS = int(os.getenv("PDF_MAX_CHARS", "20000"))
+MAX_TASKS_PER_WORKER = 100  # recicla o processo (memória do pdfminer)
+
+_cache = LRUCache(int(os.getenv("PDF_CACHE_SIZE", "256")))
+_slots = threading.BoundedSemaphore(max(1, PDF_WORKERS))
+_idle: list = []  # workers ociosos
+_idle_lock = threading.Lock()
+_inline_worker = False
+
+def mark_inline_worker() -> None:
+    # initializer do ProcessPoolExecutor de NLP (ingest_runner)
+    global _inline_worker
+    _inline_worker = True
+
+class _Timeout(Exception):
+    pass
+
+def _extract(data: Union[bytes, str], max_pages: int, max_chars: int) -> str:
+    # mesmo fluxo do pdfminer.high_level.extract_text, parando no orçamento de caracteres
+    fp = open(data, "rb") if isinstance(data, str) else BytesIO(data)
+    with fp, StringIO() as out:
+        rsrcmgr = PDFResourceManager(caching=True)
+        device = TextConverter(rsrcmgr, out, laparams=LAParams())
+        interpreter = PDFPageInterpreter(rsrcmgr, device)
+        for page in PDFPage.get_pages(fp, maxpages=max_pages, caching=True):
+            interpreter.process_page(page)
+            if max_chars and out.tell() >= max_chars:
+                break
+        text = out.getvalue()
+    return text[:max_chars] if max_chars else text
+
+def _on_alarm(signum, frame):
+    raise _Timeout()
+
+def _extract_inline(data: Union[bytes, str]) -> str:
+    use_alarm = (PDF_TIMEOUT > 0 and hasattr(signal, "setitimer")
+                 and threading.current_thread() is threading.main_thread())
+    if use_alarm:
+        old = signal.signal(signal.SIGALRM, _on_alarm)
+        signal.setitimer(signal.ITIMER_REAL, PDF_TIMEOUT)
+    try:
+        return _extract(data, PDF_MAX_PAGES, PDF_MAX_CHARS)
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, old)
+
+def _serve(conn) -> None:
+    # laço do processo worker: (dados, páginas, caracteres) -> (ok, texto ou erro)
+    while True:
+        try:
+            data, max_pages, max_chars = conn.recv()
+        except (EOFError, OSError):
+            return
+        try:
+            conn.send((True, _extract(data, max_pages, max_chars)))
+        except Exception as e:
+            conn.send((False, f"{type(e).__name__}: {e}"))
+
+class _Worker:
+    def __init__(self):
+        ctx = multiprocessing.get_context("forkserver")
+        self.conn, child = ctx.Pipe()
+        self.proc = ctx.Process(target=_serve, args=(child,), daemon=True)
+        self.proc.start()
+        child.close()
+        self.tasks = 0
+
+    def kill(self) -> None:
+        self.conn.close()
+        if self.proc.is_alive():
+            self.proc.kill()
+        self.proc.join(1)
+
+def _extract_isolated(data: Union[bytes, str]) -> Optional[str]:
+    # None = timeout, crash do worker ou erro do pdfminer (não entra no cache)
+    with _slots:
+        with _idle_lock:
+            worker = _idle.pop() if _idle else None
+        if worker is None or not worker.proc.is_alive():
+            if worker is not None:
+                worker.kill()
+            worker = _Worker()
+        reusable = False
+        try:
+            worker.conn.send((data, PDF_MAX_PAGES, PDF_MAX_CHARS))
+            worker.tasks += 1
+            if not worker.conn.poll(PDF_TIMEOUT if PDF_TIMEOUT > 0 else None):
+                return None  # travado: só este worker é morto (finally)
+            ok, result = worker.conn.recv()
+            reusable = worker.tasks < MAX_TASKS_PER_WORKER
+            return result if ok else None
+        except (EOFError, OSError):
+            return None  # worker morreu no meio (ex.: falta de memória)
+        finally:
+            if reusable:
+                with _idle_lock:
+                    _idle.append(worker)
+            else:
+                worker.kill()
+
+def _digest(data: Union[bytes, str]) -> str:
+    h = hashlib.sha256()
+    if isinstance(data, str):
+        with open(data, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+    else:
+        h.update(data)
+    return h.hexdigest()
+
+def extract_pdf(data: Union[bytes, str]) -> Tuple[str, bool]:
+    # (texto, ok): ok=False = falhou agora (timeout sob carga, crash, arquivo sumiu) e vale
+    # tentar de novo; ok=True com "" = PDF sem texto. Quem guarda o resultado (result_cache)
+    # não deve guardar falha.
     if not data:
-        return ""
+        return "", True
     try:
-        return extract_text(BytesIO(data)) or ""
+        key = _digest(data)
+    except OSError:
+        return "", False
+    cached = _cache.get(key)
+    if cached is not None:
+        return cached, True
+
+    try:
+        if PDF_WORKERS <= 0 or _inline_worker:
+            text = _extract_inline(data)
+        else:
+            text = _extract_isolated(data)
     except Exception:
-        return ""
+        text = None
+    if text is None:
+        return "", False
+    _cache.set(key, text)
+    return text, True
+
+def extract_text_from_pdf(data: Union[bytes, str]) -> str:
+    # data: bytes do PDF ou caminho de arquivo (anexo em spool); falha => ""
+    return extract_pdf(data)[0]
+
+def limits_key() -> Tuple[int, int]:
+    # limites que mudam o texto extraído (entram na chave do result_cache)
+    return PDF_MAX_PAGES, PDF_MAX_CHARS
+
+def pdf_cache_stats() -> dict:
+    return _cache.stats()
@@ -0,0 +1,117 @@
+import os, hashlib, json, threading, time
+from typing import Any, Callable, Dict, Iterable, Optional
+from app.services.lru import LRUCache
+
+# Cache endereçado por conteúdo para o pipeline (translate/process).
+# Chave = sha256(namespace, assunto, corpo normalizado, digests dos anexos, versão do modelo):
+# newsletters/notificações idênticas e chamadas repetidas do front não recalculam
+# HTML -> texto, extração de PDF, classificação e resposta.
+# Camadas: LRU em processo (RESULT_CACHE_SIZE) e, se REDIS_URL estiver definido,
+# Redis compartilhado entre workers (RESULT_CACHE_TTL). A versão do modelo entra na
+# chave, então trocar os artefatos do classificador invalida as entradas sozinho.
+
+CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "1024"))
+CACHE_TTL = int(os.getenv("RESULT_CACHE_TTL", "86400"))
+REDIS_URL = os.getenv("REDIS_URL", "")
+_PREFIX = "autou:result:"
+
+_memory = LRUCache(CACHE_SIZE)
+_redis = None
+_redis_lock = threading.Lock()
+_redis_down_until = 0.0  # após erro de conexão, pula o Redis por REDIS_RETRY_SECONDS
+REDIS_RETRY_SECONDS = float(os.getenv("REDIS_RETRY_SECONDS", "30"))
+_stats = {"redis_hits": 0, "redis_misses": 0, "redis_errors": 0}
+
+def _redis_failed():
+    global _redis_down_until
+    _stats["redis_errors"] += 1
+    _redis_down_until = time.monotonic() + REDIS_RETRY_SECONDS
+
+def _get_redis():
+    global _redis
+    if not REDIS_URL or time.monotonic() < _redis_down_until:
+        return None
+    with _redis_lock:
+        if _redis is None:
+            try:
+                import redis  # type: ignore
+                _redis = redis.Redis.from_url(REDIS_URL, socket_timeout=0.5, socket_connect_timeout=0.5)
+            except Exception:
+                _redis_failed()
+                return None
+        return _redis
+
+def normalize_body(s: Optional[str]) -> str:
+    # só diferenças que o pipeline descarta de qualquer forma (CRLF, espaços nas pontas)
+    return (s or "").replace("\r\n", "\n").strip()
+
+def attachment_digest(att: Dict[str, Any]) -> str:
+    h = hashlib.sha256()
+    h.update((att.get("filename") or "").encode("utf-8", "replace") + b"\0")
+    h.update((att.get("content_type") or "").lower().encode("utf-8", "replace") + b"\0")
+    if att.get("content"):
+        h.update(att["content"])
+    elif att.get("path"):
+        try:
+            with open(att["path"], "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    h.update(block)
+        except OSError:
+            pass
+    return h.hexdigest()
+
+def make_key(namespace: str, *parts: Any, attachments: Iterable[Dict[str, Any]] = ()) -> str:
+    h = hashlib.sha256(namespace.encode())
+    for p in parts:
+        b = p if isinstance(p, bytes) else str(p if p is not None else "").encode("utf-8", "replace")
+        h.update(len(b).to_bytes(8, "big"))
+        h.update(b)
+    for att in attachments or []:
+        h.update(attachment_digest(att).encode())
+    return f"{namespace}:{h.hexdigest()}"
+
+def get(key: str) -> Any:
+    val = _memory.get(key)
+    if val is not None:
+        return val
+    r = _get_redis()
+    if r is None:
+        return None
+    try:
+        raw = r.get(_PREFIX + key)
+    except Exception:
+        _redis_failed()
+        return None
+    if raw is None:
+        _stats["redis_misses"] += 1
+        return None
+    _stats["redis_hits"] += 1
+    val = json.loads(raw)
+    _memory.set(key, val)
+    return val
+
+def put(key: str, value: Any) -> None:
+    _memory.set(key, value)
+    r = _get_redis()
+    if r is None:
+        return
+    try:
+        r.set(_PREFIX + key, json.dumps(value, ensure_ascii=False, default=str), ex=CACHE_TTL or None)
+    except Exception:
+        _redis_failed()
+
+def cached(key: str, compute: Callable[[], Any]) -> Any:
+    # valores guardados devem ser JSON (dict/list/str/num) para poder ir ao Redis
+    val = get(key)
+    if val is None:
+        val = compute()
+        put(key, val)
+    return val
+
+def clear() -> None:
+    _memory.clear()
+
+def cache_stats() -> Dict[str, Any]:
+    out: Dict[str, Any] = {"memory": _memory.stats(), "redis_enabled": bool(REDIS_URL)}
+    out.update(_stats)
+    return out
@@ -0,0 +1,48 @@
+import os, html
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.search_index import BODY_CHARS, MARK_START, MARK_END
+
+# Busca textual com ranking (GET /api/search) sobre assunto, resumo e corpo.
+# SEARCH_BACKEND=postgres (padrão): coluna emails.search_text (trecho do corpo, gravado
+# por store_email) + search_tsv gerada com a configuração pt_unaccent (português, sem
+# acento) e índice GIN; a RPC search_emails ordena por ts_rank_cd e monta o trecho com
+# ts_headline só para as linhas da página. SQL no README.
+# SEARCH_BACKEND=local: índice invertido em processo (search_index), sem Postgres.
+# Nos dois casos o trecho volta com os termos em <mark> e o resto escapado (é conteúdo
+# de e-mail, vindo de fora).
+
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "postgres").lower()
+
+def search_text(body_text: Optional[str]) -> Optional[str]:
+    # trecho do corpo indexado na coluna emails.search_text (modo postgres)
+    return (body_text or "")[:BODY_CHARS] if SEARCH_BACKEND == "postgres" else None
+
+def index_saved(saved: List[Tuple[Dict[str, Any], Optional[str], str]]) -> None:
+    # modo local: (linha de emails, corpo, email_id) dos e-mails recém-gravados
+    if SEARCH_BACKEND != "local" or not saved:
+        return
+    from app.services.search_index import add_documents, document_for
+    add_documents([document_for(meta, body, email_id) for meta, body, email_id in saved])
+
+def render_snippet(raw: Optional[str]) -> str:
+    return html.escape(raw or "").replace(MARK_START, "<mark>").replace(MARK_END, "</mark>")
+
+async def search_emails(q: str, limit: int, page: int,
+                        category: Optional[str] = None, importance: Optional[str] = None) -> Dict[str, Any]:
+    offset = (page - 1) * limit
+    if SEARCH_BACKEND == "local":
+        from fastapi.concurrency import run_in_threadpool
+        from app.services.search_index import get_index
+        rows = await run_in_threadpool(get_index().search, q, limit + 1, offset, category, importance)
+    else:
+        from app.services.supabase_async import get_supabase_async
+        res = await get_supabase_async().rpc("search_emails", {
+            "q": q, "max_rows": limit + 1, "skip": offset,
+            "filter_category": category, "filter_importance": importance,
+        }).execute()
+        rows = res.data or []
+    items = rows[:limit]
+    for r in items:
+        r["snippet"] = render_snippet(r.get("snippet"))
+    return {"items": items, "page": page, "limit": limit, "has_more": len(rows) > limit, "backend": SEARCH_BACKEND}
@@ -0,0 +1,239 @@
+import os, json, math, re, threading
+from array import array
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.nlp.document import strip_accents
+
+# Índice invertido local para a busca textual (SEARCH_BACKEND=local, sem Postgres).
+# Documentos (assunto, resumo, trecho do corpo) são acrescentados a um JSONL em
+# SEARCH_INDEX_DIR na gravação (store_email); o processo da API relê só o que cresceu
+# desde a última consulta. Termos: minúsculos, sem acento, sem stopwords. Ranking BM25
+# com o assunto pesando 3x e o resumo 2x (tf repetido); listas de postings em numpy,
+# então a consulta custa O(tamanho das listas dos termos), não O(e-mails).
+# Semântica: todos os termos precisam aparecer (como o websearch_to_tsquery do Postgres).
+
+INDEX_DIR = os.getenv(
+    "SEARCH_INDEX_DIR", os.path.join(os.path.dirname(__file__), "..", "..", "data", "search_index")
+)
+DOCS_PATH = os.path.join(INDEX_DIR, "docs.jsonl")
+BODY_CHARS = int(os.getenv("SEARCH_BODY_CHARS", "5000"))
+FIELD_WEIGHTS = (("subject", 3), ("summary", 2), ("body", 1))
+K1, B = 1.2, 0.75
+SNIPPET_CHARS = 160
+MARK_START, MARK_END = "⟦", "⟧"  # destaque; a API escapa o HTML e troca por <mark> (igual ao ts_headline)
+
+STOPWORDS = frozenset("""
+a ao aos as ate com como da das de dela dele deles do dos e ela elas ele eles em entre era
+essa esse esta este eu foi ha isso isto ja la lhe mais mas me mesmo meu minha muito na nao
+nas nem no nos nossa nosso num numa o os ou para pela pelas pelo pelos por qual quando que
+quem se sem ser seu seus so sua suas tambem te tem um uma voce voces
+""".split())
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN.findall(strip_accents(text)) if t not in STOPWORDS and len(t) > 1]
+
+def document_for(meta: Dict[str, Any], body_text: Optional[str], email_id: str) -> Dict[str, Any]:
+    # meta = linha de emails (store_email._meta_row, datas já em ISO)
+    doc = {k: meta.get(k) for k in ("message_uid", "subject", "summary", "received_at", "category", "importance_label")}
+    doc["id"] = email_id
+    doc["body"] = (body_text or "")[:BODY_CHARS]
+    return doc
+
+def add_documents(docs: List[Dict[str, Any]]) -> None:
+    # escrita só acrescenta (várias fontes: cron, daemon IDLE, API); a leitura aplica em ordem
+    if not docs:
+        return
+    os.makedirs(INDEX_DIR, exist_ok=True)
+    with open(DOCS_PATH, "a", encoding="utf-8") as f:
+        f.write("".join(json.dumps(d, ensure_ascii=False) + "\n" for d in docs))
+
+class LocalIndex:
+    # só postings e colunas numéricas ficam em memória; o documento (para o trecho) é relido
+    # do JSONL pelo offset da linha, apenas para os resultados da página
+    def __init__(self, path: str = DOCS_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._offset = 0
+        self._n = 0
+        self._pos: Dict[str, int] = {}      # email_id -> posição vigente
+        # colunas por documento em arrays que crescem dobrando (sem reconstruir a cada e-mail novo)
+        self._alive = np.zeros(0, dtype=bool)
+        self._length = np.zeros(0, dtype=np.float32)
+        self._line = np.zeros(0, dtype=np.int64)
+        self._category = np.zeros(0, dtype=np.int16)
+        self._importance = np.zeros(0, dtype=np.int16)
+        self._codes: Dict[str, int] = {"": 0}  # rótulo -> código (filtros por comparação de inteiros)
+        self._total_len = 0.0
+        self._live = 0
+        self._post: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}   # termo -> (docs, tf) compactados
+        self._tail: Dict[str, Tuple[array, array]] = {}             # postings ainda não compactados
+
+    def _code(self, label: Optional[str]) -> int:
+        return self._codes.setdefault(label or "", len(self._codes))
+
+    def _grow(self, size: int) -> None:
+        if size <= len(self._alive):
+            return
+        cap = max(1024, 2 * len(self._alive), size)
+        for name in ("_alive", "_length", "_line", "_category", "_importance"):
+            arr = getattr(self, name)
+            new = np.zeros(cap, dtype=arr.dtype)
+            new[:len(arr)] = arr
+            setattr(self, name, new)
+
+    def _add(self, doc: Dict[str, Any], line_offset: int) -> None:
+        idx = self._n
+        old = self._pos.get(doc["id"])
+        if old is not None:  # regravação do mesmo e-mail: a versão nova substitui
+            self._alive[old] = False
+            self._total_len -= float(self._length[old])
+            self._live -= 1
+        tf: Counter = Counter()
+        for field, weight in FIELD_WEIGHTS:
+            for tok in tokenize(doc.get(field) or ""):
+                tf[tok] += weight
+        for term, n in tf.items():
+            ids, counts = self._tail.get(term) or self._tail.setdefault(term, (array("i"), array("f")))
+            ids.append(idx)
+            counts.append(n)
+        length = sum(tf.values())
+        self._grow(idx + 1)
+        self._pos[doc["id"]] = idx
+        self._alive[idx] = True
+        self._length[idx] = length
+        self._line[idx] = line_offset
+        self._category[idx] = self._code(doc.get("category"))
+        self._importance[idx] = self._code(doc.get("importance_label"))
+        self._total_len += length
+        self._live += 1
+        self._n += 1
+
+    def refresh(self) -> int:
+        # lê só as linhas novas do JSONL; devolve quantas entraram
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return 0
+        if size <= self._offset:
+            return 0
+        added = 0
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # linha ainda sendo escrita: fica para a próxima
+                at = self._offset
+                self._offset += len(line)
+                try:
+                    self._add(json.loads(line), at)
+                    added += 1
+                except (ValueError, KeyError):
+                    continue
+        return added
+
+    def _postings(self, term: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        tail = self._tail.pop(term, None)
+        base = self._post.get(term)
+        if tail is not None:
+            ids, counts = np.frombuffer(tail[0], dtype=np.int32), np.frombuffer(tail[1], dtype=np.float32)
+            base = (ids, counts) if base is None else (np.concatenate([base[0], ids]), np.concatenate([base[1], counts]))
+            self._post[term] = base
+        return base
+
+    def _bm25(self, docs: np.ndarray, tf: np.ndarray, df: int, avg: float) -> np.ndarray:
+        idf = math.log(1.0 + (self._live - df + 0.5) / (df + 0.5))
+        return idf * tf * (K1 + 1.0) / (tf + K1 * (1.0 - B + B * self._length[docs] / avg))
+
+    def search(self, query: str, limit: int = 20, offset: int = 0,
+               category: Optional[str] = None, importance: Optional[str] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            self.refresh()
+            terms = list(dict.fromkeys(tokenize(query)))
+            if not terms or not self._live:
+                return []
+            posts = []
+            for term in terms:
+                post = self._postings(term)
+                if post is None:
+                    return []  # termo ausente: nenhum documento tem todos
+                posts.append(post)
+            # interseção a partir da lista mais curta: postings estão em ordem de posição,
+            # então os demais termos entram por busca binária só nos candidatos restantes
+            posts.sort(key=lambda p: len(p[0]))
+            avg = self._total_len / max(1, self._live)
+            ids, tf = posts[0]
+            keep = self._alive[ids]
+            if category:
+                keep &= self._category[ids] == self._codes.get(category, -1)
+            if importance:
+                keep &= self._importance[ids] == self._codes.get(importance, -1)
+            cand = ids[keep]
+            scores = self._bm25(cand, tf[keep], len(ids), avg)
+            if len(posts) > 1 and len(cand) * 8 > self._n:
+                # termos muito frequentes: acumular num vetor denso sai mais barato que a busca binária
+                dense = np.zeros(self._n, dtype=np.float32)
+                hits = np.zeros(self._n, dtype=np.int16)
+                dense[cand] = scores
+                hits[cand] = 1
+                for ids, tf in posts[1:]:
+                    dense[ids] += self._bm25(ids, tf, len(ids), avg)
+                    hits[ids] += 1
+                cand = np.flatnonzero(hits == len(posts))
+                scores, posts = dense[cand], []
+            for ids, tf in posts[1:]:
+                if not len(cand):
+                    break
+                pos = np.minimum(np.searchsorted(ids, cand), len(ids) - 1)
+                ok = ids[pos] == cand
+                cand, scores, pos = cand[ok], scores[ok], pos[ok]
+                scores += self._bm25(cand, tf[pos], len(ids), avg)
+            if not len(cand):
+                return []
+            want = offset + limit
+            if len(cand) > want:
+                part = np.argpartition(-scores, want - 1)[:want]
+                cand, scores = cand[part], scores[part]
+            order = np.lexsort((-cand, -scores))[offset:want]  # empate: mais recente no índice primeiro
+            with open(self.path, "rb") as f:
+                return [self._hit(f, int(cand[i]), float(scores[i]), terms) for i in order]
+
+    def _hit(self, f, idx: int, score: float, terms: List[str]) -> Dict[str, Any]:
+        f.seek(int(self._line[idx]))
+        doc = json.loads(f.readline())
+        out = {k: doc.get(k) for k in ("id", "message_uid", "subject", "summary", "received_at", "category", "importance_label")}
+        out["rank"] = round(score, 4)
+        out["snippet"] = snippet(" ".join(x for x in (doc.get("summary"), doc.get("body")) if x) or doc.get("subject") or "", terms)
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        return {"documents": self._live, "terms": len(set(self._post) | set(self._tail)), "path": self.path}
+
+def snippet(text: str, terms: List[str]) -> str:
+    # janela em volta do 1º termo encontrado, termos marcados com MARK_START/MARK_END
+    text = text.replace(MARK_START, "").replace(MARK_END, "")
+    low = strip_accents(text)
+    if len(low) != len(text):  # dobra mudou o tamanho (raro): usa o texto dobrado
+        text = low
+    pat = re.compile(r"\b(?:" + "|".join(re.escape(t) for t in terms) + r")[a-z0-9]*")
+    first = pat.search(low)
+    start = max(0, (first.start() if first else 0) - SNIPPET_CHARS // 3)
+    end = min(len(text), start + SNIPPET_CHARS)
+    parts, pos = [], start
+    for m in pat.finditer(low, start, end):
+        parts.append(text[pos:m.start()])
+        parts.append(MARK_START + text[m.start():m.end()] + MARK_END)
+        pos = m.end()
+    parts.append(text[pos:end])
+    return ("…" if start > 0 else "") + " ".join("".join(parts).split()) + ("…" if end < len(text) else "")
+
+_index: Optional[LocalIndex] = None
+
+def get_index() -> LocalIndex:
+    global _index
+    if _index is None:
+        _index = LocalIndex()
+    return _index
@@ -1,6 +1,13 @@
-from typing import Dict, Any
+import os
+from typing import Dict, Any, List, Optional, Set
 from datetime import datetime, timezone
 from app.services.supabase_client import get_supabase
+from app.services.search import search_text, index_saved
+from app.services.email_cache import invalidate_email
+from app.services import generation
+
+# linhas por requisição no upsert em lote (save_email_packs)
+BATCH_SIZE = int(os.getenv("STORE_BATCH_SIZE", "100"))
 
 def _iso(dt):
     if isinstance(dt, datetime):
@@ -9,10 +16,18 @@ def _iso(dt):
         return dt.isoformat()
     return dt
 
-def save_email_pack(pack: Dict[str, Any]) -> str:
+def existing_message_uids(uids: List[str], chunk: int = 200) -> Set[str]:
+    if not uids:
+        return set()
     sb = get_supabase()
+    found: Set[str] = set()
+    for i in range(0, len(uids), chunk):
+        res = sb.table("emails").select("message_uid").in_("message_uid", uids[i:i + chunk]).execute()
+        found.update(r["message_uid"] for r in (res.data or []) if r.get("message_uid"))
+    return found
 
-    meta = {
+def _meta_row(pack: Dict[str, Any]) -> Dict[str, Any]:
+    row = {
         "message_uid": pack.get("message_uid"),
         "subject": pack.get("subject"),
         "from_email": pack.get("from_email"),
@@ -29,7 +44,23 @@ def save_email_pack(pack: Dict[str, Any]) -> str:
         "reply_suggested": pack.get("reply_suggested"),
         "has_pdf": pack.get("has_pdf"),
     }
+    text = search_text(pack.get("body_text"))
+    if text is not None:
+        row["search_text"] = text  # busca textual: alimenta o search_tsv (coluna gerada + GIN)
+    return row
 
+def _contents_row(pack: Dict[str, Any], email_id: str) -> Dict[str, Any]:
+    return {
+        "email_id": email_id,
+        "body_text": pack.get("body_text"),
+        "body_html": pack.get("body_html"),
+        "attachments": pack.get("attachments"),
+    }
+
+def save_email_pack(pack: Dict[str, Any]) -> str:
+    sb = get_supabase()
+
+    meta = _meta_row(pack)
     if not meta["message_uid"]:
         raise RuntimeError("message_uid ausente no pack — precisa ser único para upsert.")
     up = sb.table("emails").upsert(meta, on_conflict="message_uid").execute()
@@ -44,11 +75,100 @@ def save_email_pack(pack: Dict[str, Any]) -> str:
             raise RuntimeError(f"Upsert OK, mas não consegui buscar id de message_uid={meta['message_uid']}")
         email_id = sel.data[0]["id"]
 
-    contents = {
-        "email_id": email_id,
-        "body_text": pack.get("body_text"),
-        "body_html": pack.get("body_html"),
-        "attachments": pack.get("attachments"),
-    }
-    sb.table("email_contents").upsert(contents, on_conflict="email_id").execute()
+    sb.table("email_contents").upsert(_contents_row(pack, email_id), on_conflict="email_id").execute()
+    invalidate_email(email_id, meta["message_uid"])  # leitura em cache da API (email_cache)
+    generation.bump(generation.EMAILS)  # ETag/cache de respostas da API (http_cache)
+    index_saved([(meta, pack.get("body_text"), email_id)])
     return email_id
+
+def _err(e: Exception) -> str:
+    return f"{type(e).__name__}: {e}"
+
+def _save_batch(sb, packs: List[Dict[str, Any]], results: List[Dict[str, Any]]) -> None:
+    # 1) emails: um upsert para o lote inteiro (último pack vence em message_uid repetido,
+    #    o Postgres recusa o mesmo conflito duas vezes no mesmo comando)
+    metas: Dict[str, Dict[str, Any]] = {}
+    for pack, res in zip(packs, results):
+        if not res["message_uid"]:
+            res["error"] = "message_uid ausente no pack — precisa ser único para upsert."
+            continue
+        metas[res["message_uid"]] = _meta_row(pack)
+    if not metas:
+        return
+
+    ids: Dict[str, str] = {}
+    try:
+        up = sb.table("emails").upsert(list(metas.values()), on_conflict="message_uid").execute()
+        for row in (getattr(up, "data", None) or []):
+            if row.get("message_uid") and row.get("id"):
+                ids[row["message_uid"]] = row["id"]
+        missing = [uid for uid in metas if uid not in ids]
+        if missing:
+            sel = sb.table("emails").select("id,message_uid").in_("message_uid", missing).execute()
+            for row in (sel.data or []):
+                ids[row["message_uid"]] = row["id"]
+    except Exception:
+        # lote recusado: refaz linha a linha para isolar quem falhou
+        for uid, meta in metas.items():
+            try:
+                up = sb.table("emails").upsert(meta, on_conflict="message_uid").execute()
+                row = (getattr(up, "data", None) or [{}])[0]
+                if row.get("id"):
+                    ids[uid] = row["id"]
+                else:
+                    sel = sb.table("emails").select("id").eq("message_uid", uid).limit(1).execute()
+                    if sel.data:
+                        ids[uid] = sel.data[0]["id"]
+            except Exception as e:
+                for res in results:
+                    if res["message_uid"] == uid:
+                        res["error"] = _err(e)
+
+    # 2) email_contents: um upsert com todas as linhas que receberam id
+    contents: Dict[str, Dict[str, Any]] = {}
+    bodies: Dict[str, Optional[str]] = {}
+    for pack, res in zip(packs, results):
+        if res["error"]:
+            continue
+        email_id = ids.get(res["message_uid"])
+        if not email_id:
+            res["error"] = f"Upsert OK, mas não consegui buscar id de message_uid={res['message_uid']}"
+            continue
+        res["email_id"] = email_id
+        contents[email_id] = _contents_row(pack, email_id)
+        bodies[email_id] = pack.get("body_text")
+    if not contents:
+        return
+
+    try:
+        sb.table("email_contents").upsert(list(contents.values()), on_conflict="email_id").execute()
+    except Exception:
+        for email_id, row in contents.items():
+            try:
+                sb.table("email_contents").upsert(row, on_conflict="email_id").execute()
+            except Exception as e:
+                for res in results:
+                    if res["email_id"] == email_id:
+                        res["error"] = _err(e)
+
+    for uid, email_id in ids.items():
+        invalidate_email(email_id, uid)  # leitura em cache da API (email_cache)
+    index_saved([
+        (metas[res["message_uid"]], bodies[res["email_id"]], res["email_id"])
+        for res in results if not res["error"] and res["email_id"] in bodies
+    ])
+
+def save_email_packs(packs: List[Dict[str, Any]], batch_size: Optional[int] = None) -> List[Dict[str, Any]]:
+    # Versão em lote de save_email_pack: 2 requisições PostgREST por lote (emails + email_contents).
+    # Devolve, na ordem dos packs, [{message_uid, email_id, error}] — error=None quando salvou.
+    batch_size = max(1, batch_size or BATCH_SIZE)
+    results = [{"message_uid": p.get("message_uid"), "email_id": None, "error": None} for p in packs]
+    if not packs:
+        return results
+
+    sb = get_supabase()
+    for i in range(0, len(packs), batch_size):
+        _save_batch(sb, packs[i:i + batch_size], results[i:i + batch_size])
+    if any(res["email_id"] for res in results):
+        generation.bump(generation.EMAILS)  # um incremento por chamada, não por lote
+    return results
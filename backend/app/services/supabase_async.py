@@ -0,0 +1,112 @@
+import os, asyncio, threading
+from typing import Dict, Optional, Union
+
+import httpx
+from postgrest import AsyncPostgrestClient
+from postgrest.constants import DEFAULT_POSTGREST_CLIENT_HEADERS
+
+# Cliente PostgREST assíncrono para os handlers da API (o get_supabase() síncrono
+# continua nos scripts e jobs). Uma conexão httpx por event loop, com pool explícito:
+# SUPABASE_POOL_SIZE conexões no máximo, SUPABASE_POOL_KEEPALIVE ociosas mantidas por
+# SUPABASE_KEEPALIVE_SECONDS e HTTP/2 (várias requisições multiplexadas na mesma conexão).
+# Sem isso cada requisição segurava uma thread do threadpool esperando o banco.
+
+POOL_SIZE = int(os.getenv("SUPABASE_POOL_SIZE", "50"))
+POOL_KEEPALIVE = int(os.getenv("SUPABASE_POOL_KEEPALIVE", "20"))
+KEEPALIVE_SECONDS = float(os.getenv("SUPABASE_KEEPALIVE_SECONDS", "30"))
+HTTP2 = os.getenv("SUPABASE_HTTP2", "true").lower() in ("1", "true", "yes")
+TIMEOUT = float(os.getenv("SUPABASE_TIMEOUT_SECONDS", "10"))
+
+class PooledPostgrestClient(AsyncPostgrestClient):
+    # o AsyncPostgrestClient padrão cria o httpx.AsyncClient sem limites de pool
+    def create_session(
+        self,
+        base_url: str,
+        headers: Dict[str, str],
+        timeout: Union[int, float, httpx.Timeout],
+        verify: bool = True,
+    ) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=timeout,
+            verify=verify,
+            follow_redirects=True,
+            http2=HTTP2,
+            limits=httpx.Limits(
+                max_connections=POOL_SIZE,
+                max_keepalive_connections=POOL_KEEPALIVE,
+                keepalive_expiry=KEEPALIVE_SECONDS,
+            ),
+        )
+
+_client: Optional[PooledPostgrestClient] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_guard: Optional[asyncio.Task] = None
+
+async def _close_with_loop(client: PooledPostgrestClient) -> None:
+    # fica pendente enquanto o loop vive; asyncio.run, uvicorn e os runners de teste cancelam
+    # as tarefas antes de fechar o loop, e o aclose roda ali, no loop dono das conexões
+    try:
+        await asyncio.get_running_loop().create_future()
+    finally:
+        await client.aclose()
+
+def _retire(client: PooledPostgrestClient, loop: asyncio.AbstractEventLoop, guard: Optional[asyncio.Task]) -> None:
+    # cliente de um loop anterior: o aclose precisa rodar no loop que abriu as conexões
+    if loop.is_closed():
+        return  # o guarda já fechou ao encerrar o loop
+    if loop.is_running():  # loop vivo em outra thread
+        loop.call_soon_threadsafe(guard.cancel) if guard else asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+        return
+    # loop parado, mas aberto: roda o fechamento nele numa thread auxiliar (aqui já há um loop rodando)
+    def _close():
+        try:
+            if guard is not None:
+                guard.cancel()  # o finally do guarda faz o aclose
+                loop.run_until_complete(asyncio.gather(guard, return_exceptions=True))
+            else:
+                loop.run_until_complete(client.aclose())
+        except Exception:
+            pass
+    t = threading.Thread(target=_close, name="supabase-async-close", daemon=True)
+    t.start()
+    t.join(5)
+
+def get_supabase_async() -> PooledPostgrestClient:
+    # conexões httpx ficam presas ao loop que as abriu: loop novo (testes, reload, asyncio.run
+    # em scripts) => cliente novo, e o anterior é fechado no loop dele
+    global _client, _loop, _guard
+    loop = asyncio.get_running_loop()
+    if _client is None or _loop is not loop:
+        url = os.getenv("SUPABASE_URL")
+        key = os.getenv("SUPABASE_SERVICE_ROLE_KEY") or os.getenv("SUPABASE_ANON_KEY")
+        if not (url and key):
+            raise RuntimeError("SUPABASE_URL / SUPABASE_SERVICE_ROLE_KEY não configurados no .env")
+        if _client is not None:
+            _retire(_client, _loop, _guard)
+        headers = {**DEFAULT_POSTGREST_CLIENT_HEADERS, "apiKey": key, "Authorization": f"Bearer {key}"}
+        _client = PooledPostgrestClient(f"{url.rstrip('/')}/rest/v1", headers=headers, timeout=TIMEOUT)
+        _loop = loop
+        _guard = loop.create_task(_close_with_loop(_client))
+    return _client
+
+async def close_supabase_async() -> None:
+    # hook de shutdown da API (main.py); de outro loop, delega a _retire
+    global _client, _loop, _guard
+    client, loop, guard = _client, _loop, _guard
+    _client, _loop, _guard = None, None, None
+    if client is None:
+        return
+    if loop is asyncio.get_running_loop():
+        if guard is not None:
+            guard.cancel()
+        await client.aclose()
+    else:
+        _retire(client, loop, guard)
+
+def pool_config() -> dict:
+    return {
+        "max_connections": POOL_SIZE, "max_keepalive": POOL_KEEPALIVE,
+        "keepalive_seconds": KEEPALIVE_SECONDS, "http2": HTTP2, "open": _client is not None,
+    }
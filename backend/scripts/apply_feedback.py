@@ -0,0 +1,42 @@
+# backend/scripts/apply_feedback.py
+import argparse
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+load_dotenv()
+from app.services.supabase_client import get_supabase
+from app.nlp import online
+
+# Aplica no classificador online as correções de label_feedback ainda pendentes
+# (applied_at nulo): buffer de worker perdido em restart, várias instâncias, etc.
+# Cada mini-lote é um partial_fit sobre o checkpoint vigente + um checkpoint novo;
+# os workers com CLASSIFIER_FORMAT=online trocam de modelo sozinhos.
+
+def main():
+    p = argparse.ArgumentParser(description="Aplica correções pendentes de rótulo no modelo online")
+    p.add_argument("--batch", type=int, default=online.BATCH_SIZE, help="correções por partial_fit")
+    p.add_argument("--limit", type=int, default=1000, help="máximo de correções por execução")
+    p.add_argument("--seed", action="store_true", help="só cria o checkpoint inicial (data/examples.csv)")
+    args = p.parse_args()
+
+    if not online.online_available():
+        version = online.apply_labels([], [])
+        print(f"Checkpoint inicial semeado: versão {version}")
+    if args.seed:
+        return
+
+    sb = get_supabase()
+    rows = sb.table("label_feedback").select("id,text,label").is_("applied_at", "null")\
+        .order("created_at").limit(args.limit).execute().data or []
+    print(f"{len(rows)} correções pendentes")
+
+    for i in range(0, len(rows), max(1, args.batch)):
+        batch = rows[i:i + args.batch]
+        version = online.apply_labels([r["text"] or "" for r in batch], [r["label"] for r in batch])
+        sb.table("label_feedback").update({
+            "applied_at": datetime.now(timezone.utc).isoformat(),
+            "model_version": version,
+        }).in_("id", [r["id"] for r in batch]).execute()
+        print(f"  +{len(batch)} -> versão {version}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import random, re, time
+from bs4 import BeautifulSoup
+from app.nlp.preprocess import html_to_text, clean_email_text, normalize_whitespace, MAX_CHARS
+
+# Compara o html_to_text antigo (árvore BeautifulSoup inteira + get_text) com o
+# extrator em streaming, num e-mail de marketing com tabelas e estilos inline, e o
+# strip_quoted_replies antigo (regex DOTALL no texto inteiro) com a varredura por linha,
+# em threads encaminhadas de tamanho crescente.
+# Uso: python -m scripts.bench_preprocess
+
+WORDS = "olá pagamento fatura reunião urgente boleto contrato oferta desconto ação cliente".split()
+
+def old_html_to_text(html: str) -> str:
+    soup = BeautifulSoup(html, "lxml")
+    for tag in soup(["script", "style"]):
+        tag.extract()
+    return soup.get_text(separator=" ")
+
+def old_clean_email_text(raw: str) -> str:
+    t = raw or ""
+    for p in (r"On .* wrote:.*", r"Em .* escreveu:.*", r"-----Original Message-----", r"De: .*"):
+        t = re.sub(p, "", t, flags=re.IGNORECASE | re.DOTALL)
+    return normalize_whitespace(t)[:MAX_CHARS]
+
+def forwarded_thread(target_bytes: int) -> str:
+    # thread longa: cada bloco cita o anterior com "Em ... escreveu:" no fim do texto
+    rnd = random.Random(11)
+    parts, size = [], 0
+    while size < target_bytes:
+        w = " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(5, 40)))
+        parts.append(w + "\n")
+        size += len(w) + 1
+    parts.append("\nEm seg., 3 de jun. de 2024 às 09:00, Fulano <fulano@ex.com> escreveu:\n> " + w)
+    return "".join(parts)
+
+def marketing_html(target_bytes: int) -> str:
+    rnd = random.Random(7)
+    parts = ["<html><head><style>td{font-family:Arial}</style></head><body>"]
+    size = 0
+    while size < target_bytes:
+        w = " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(3, 25)))
+        row = (
+            '<table role="presentation" cellpadding="0" cellspacing="0" style="width:100%;max-width:600px;'
+            'border-collapse:collapse;background:#ffffff"><tr>'
+            f'<td style="padding:12px 24px;font:14px/20px Arial,sans-serif;color:#333333">{w}</td>'
+            f'<td style="padding:12px;text-align:right"><a href="https://ex.com/?u={size}" '
+            f'style="color:#0066cc;text-decoration:none">{w[:20]}</a></td></tr></table>'
+        )
+        parts.append(row)
+        size += len(row)
+    parts.append("</body></html>")
+    return "".join(parts)
+
+def bench(fn, html: str, rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        fn(html)
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+def main():
+    for kb in (20, 100, 500):
+        html = marketing_html(kb * 1024)
+        old_ms = bench(lambda h: clean_email_text(old_html_to_text(h)), html, 5)
+        new_ms = bench(lambda h: clean_email_text(html_to_text(h, max_chars=MAX_CHARS)), html, 5)
+        same = clean_email_text(old_html_to_text(html)) == clean_email_text(html_to_text(html, max_chars=MAX_CHARS))
+        print(f"{kb:>4} KB  antigo {old_ms:8.1f} ms  streaming {new_ms:7.1f} ms  "
+              f"({old_ms / new_ms:4.1f}x)  mesmo texto: {same}")
+
+    print()
+    for kb in (64, 256, 1024, 4096):
+        thread = forwarded_thread(kb * 1024)
+        new_ms = bench(clean_email_text, thread, 5)
+        old_ms = bench(old_clean_email_text, thread, 3)
+        same = old_clean_email_text(thread) == clean_email_text(thread)
+        print(f"{kb:>5} KB  antigo {old_ms:8.1f} ms  por linha {new_ms:6.2f} ms  mesmo texto: {same}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import argparse, os, random, tempfile, time, uuid
+
+import numpy as np
+
+from app.services.search_index import LocalIndex, add_documents, DOCS_PATH
+import app.services.search_index as search_index
+
+# Latência da busca local (SEARCH_BACKEND=local) num corpus sintético: gera N e-mails,
+# indexa e mede p50/p99 de consultas de 1 a 3 termos (comuns e raros, com e sem acento).
+# Uso: python -m scripts.bench_search --docs 200000
+
+WORDS = ("reunião pagamento fatura boleto contrato proposta cliente suporte acesso senha "
+         "relatório entrega prazo orçamento nota fiscal cobrança cancelamento pedido "
+         "atualização sistema erro urgente projeto equipe agenda").split()
+RARE = [f"protocolo{n}" for n in range(5000)]
+
+def synthetic(n: int, seed: int = 7):
+    rnd = random.Random(seed)
+    for i in range(n):
+        body = " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(20, 80)))
+        yield {
+            "id": str(uuid.UUID(int=i)),
+            "message_uid": f"uid-{i}",
+            "subject": " ".join(rnd.choice(WORDS) for _ in range(4)) + f" {rnd.choice(RARE)}",
+            "summary": body[:140],
+            "body": body,
+            "received_at": None,
+            "category": rnd.choice(["Produtivo", "Improdutivo"]),
+            "importance_label": rnd.choice(["low", "normal", "high", "urgent"]),
+        }
+
+def main():
+    p = argparse.ArgumentParser(description="Benchmark da busca local")
+    p.add_argument("--docs", type=int, default=100000)
+    p.add_argument("--queries", type=int, default=200)
+    args = p.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        search_index.INDEX_DIR = tmp
+        path = os.path.join(tmp, os.path.basename(DOCS_PATH))
+        search_index.DOCS_PATH = path
+        batch = []
+        for doc in synthetic(args.docs):
+            batch.append(doc)
+            if len(batch) >= 5000:
+                add_documents(batch)
+                batch = []
+        add_documents(batch)
+
+        index = LocalIndex(path)
+        t0 = time.perf_counter()
+        index.refresh()
+        print(f"{args.docs} e-mails indexados em {time.perf_counter() - t0:.1f}s")
+
+        rnd = random.Random(1)
+        kinds = {
+            "1 termo comum": lambda: rnd.choice(WORDS),
+            "2 termos comuns": lambda: f"{rnd.choice(WORDS)} {rnd.choice(WORDS)}",
+            "termo raro": lambda: rnd.choice(RARE),
+            "comum + raro": lambda: f"{rnd.choice(WORDS)} {rnd.choice(RARE)}",
+            "sem acento + filtro": lambda: "reuniao orcamento",
+        }
+        index.search("aquecimento")  # compacta listas na 1ª consulta de cada termo
+        for w in WORDS:
+            index.search(w)
+        for name, make in kinds.items():
+            lat = []
+            for _ in range(args.queries):
+                q = make()
+                t0 = time.perf_counter()
+                index.search(q, limit=20, importance="high" if "filtro" in name else None)
+                lat.append((time.perf_counter() - t0) * 1000)
+            print(f"  {name:22s} p50={np.percentile(lat, 50):7.2f}ms  p99={np.percentile(lat, 99):7.2f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 from dotenv import load_dotenv
 from app.services.email_ingest import fetch_unread
 from app.pipeline import translate_email
+from app.services.attachments import release_attachments
 
 def main():
     load_dotenv()
@@ -13,6 +14,7 @@ def main():
             body_html=raw["html"],
             attachments=raw["attachments"],
         )
+        release_attachments(raw["attachments"])
         print(f"=== EMAIL {i} ===")
         print("Assunto:", res["subject"])
         print("Tem texto de PDF?:", res["has_pdf_text"])
@@ -0,0 +1,158 @@
+# backend/scripts/idle_ingest.py
+# Daemon de ingestão push: mantém uma conexão IMAP IDLE por pasta e processa
+# as mensagens novas assim que o servidor avisa (EXISTS), sem esperar o cron; a cada
+# timeout do IDLE (IMAP_IDLE_TIMEOUT) também sincroniza, para nada ficar esperando.
+import os, random, signal, threading, time
+from dotenv import load_dotenv
+from imap_tools import MailBox
+
+load_dotenv()
+
+from app.services.email_ingest import fetch_incremental
+from app.pipeline import build_email_packs
+from app.services.store_email import save_email_packs
+from app.services.draft_pregen import maybe_enqueue
+
+# rfc2177: reemitir o IDLE antes de 29 min para não ser desconectado
+IDLE_TIMEOUT = min(float(os.getenv("IMAP_IDLE_TIMEOUT", "300")), 29 * 60)
+RECONNECT_MAX = float(os.getenv("IMAP_RECONNECT_MAX", "300"))
+# falhas seguidas do mesmo UID (NLP ou gravação com o banco respondendo) antes da quarentena
+MAX_FAILURES = int(os.getenv("IMAP_IDLE_MAX_FAILURES", "3"))
+# e-mails por lote (memória limitada: backlog grande após reconexão vai em vários lotes)
+BATCH = max(1, int(os.getenv("IMAP_IDLE_BATCH", "50")))
+
+_failures: dict = {}  # (pasta, uid) -> falhas seguidas
+
+def _log(folder: str, msg: str):
+    print(f"[idle:{folder}] {msg}", flush=True)
+
+def _err(e: Exception) -> str:
+    return f"{type(e).__name__}: {e}"
+
+def _fail(folder: str, uid: str, reason: str) -> bool:
+    # conta a falha do UID; True => quarentena (o checkpoint passa por ele, fica não lido)
+    key = (folder, uid)
+    n = _failures.get(key, 0) + 1
+    if n >= MAX_FAILURES:
+        _failures.pop(key, None)
+        _log(folder, f"⚠ uid={uid} em quarentena após {n} falhas (fica não lido na pasta): {reason}")
+        return True
+    _failures[key] = n
+    _log(folder, f"✖ falha uid={uid} ({n}/{MAX_FAILURES}): {reason}")
+    return False
+
+def _save_one(raw: dict):
+    # -> (pack, resultado, erro): erro = ("nlp"|"save", mensagem) ou None
+    try:
+        pack = build_email_packs([raw])[0]
+    except Exception as e:
+        return None, None, ("nlp", _err(e))
+    try:
+        res = save_email_packs([pack])[0]
+    except Exception as e:
+        return pack, None, ("save", _err(e))
+    return pack, res, ("save", res["error"]) if res["error"] else None
+
+def _drain(mailbox: MailBox, folder: str, move_folder: str | None) -> int:
+    # lotes de até BATCH UIDs, com commit a cada lote; segue enquanto o lote foi todo
+    # confirmado e há mais acima dele. Um UID que falhou (sem ir para a quarentena) segura o
+    # checkpoint: a drenagem para e ele volta no próximo ciclo, não no próximo lote
+    total = 0
+    while True:
+        source = fetch_incremental(limit=BATCH, folder=folder, mailbox=mailbox)
+        total += _drain_batch(mailbox, folder, move_folder, source)
+        if not source.more:
+            return total
+
+def _drain_batch(mailbox: MailBox, folder: str, move_folder: str | None, source) -> int:
+    raws = list(source)
+    if not raws:
+        source.commit([])  # só duplicatas (ou UIDVALIDITY nova): avança o checkpoint
+        return 0
+    # o lote é classificado e salvo de uma vez; se o lote falhar, cada
+    # e-mail é refeito sozinho, para uma mensagem problemática não travar as outras
+    try:
+        packs = build_email_packs(raws)
+        outcomes = [(pack, res, ("save", res["error"]) if res["error"] else None)
+                    for pack, res in zip(packs, save_email_packs(packs))]
+    except Exception as e:
+        _log(folder, f"✖ falha no lote ({len(raws)} e-mails): {_err(e)}; refazendo um a um")
+        outcomes = [_save_one(raw) for raw in raws]
+
+    saved, skipped, save_errors = [], [], []
+    for raw, (pack, res, err) in zip(raws, outcomes):
+        uid = str(raw.get("uid") or "")
+        if err is None:
+            _failures.pop((folder, uid), None)
+            _log(folder, f"✔ salvo email_id={res['email_id']} | {pack['category']}/{pack['importance_label']} | {raw['subject'][:60]}")
+            if maybe_enqueue(pack, res["email_id"]):
+                _log(folder, f"  rascunho na fila de pré-geração ({pack['importance_label']})")
+            if uid:
+                saved.append(uid)
+        elif err[0] == "save":
+            save_errors.append((uid, err[1]))
+        elif _fail(folder, uid, err[1]):  # NLP: falha da própria mensagem
+            skipped.append(uid)
+    if save_errors:
+        if not saved:
+            # nenhuma gravação deu certo: provavelmente o Supabase, não a mensagem. Sobe para
+            # reconexão/backoff sem contar falha nem mexer no checkpoint
+            raise RuntimeError(f"nenhum e-mail gravado ({len(save_errors)} falhas): {save_errors[0][1]}")
+        for uid, reason in save_errors:
+            if _fail(folder, uid, reason):
+                skipped.append(uid)
+
+    source.commit(saved, skipped)  # checkpoint/\Seen só dos salvos, antes do move (que troca os UIDs)
+    if saved and move_folder:
+        mailbox.move(saved, move_folder)
+        _log(folder, f"→ movidos para '{move_folder}': {len(saved)}")
+    return len(saved)
+
+def watch_folder(folder: str, stop: threading.Event):
+    host = os.getenv("IMAP_HOST", "imap.gmail.com")
+    user = os.getenv("IMAP_USER"); pwd = os.getenv("IMAP_PASS")
+    move_folder = os.getenv("IMAP_PROCESSED_FOLDER")
+    backoff = 1.0
+
+    while not stop.is_set():
+        try:
+            with MailBox(host).login(user, pwd, folder) as mailbox:
+                _log(folder, "conectado, sincronizando pendências...")
+                _drain(mailbox, folder, move_folder)
+                backoff = 1.0  # só depois de sincronizar: falha persistente no lote mantém o backoff
+                while not stop.is_set():
+                    # drena a cada retorno, não só em EXISTS: avisos que chegam durante um
+                    # _drain vão para as respostas do FETCH/flag, e o timeout do IDLE serve
+                    # de varredura periódica (a busca UID N:* sem nada novo é barata)
+                    mailbox.idle.wait(timeout=IDLE_TIMEOUT)
+                    _drain(mailbox, folder, move_folder)
+        except Exception as e:
+            if stop.is_set():
+                break
+            delay = backoff + random.uniform(0, backoff / 2)
+            _log(folder, f"falha ({type(e).__name__}: {e}); reconectando em {delay:.1f}s")
+            stop.wait(delay)
+            backoff = min(backoff * 2, RECONNECT_MAX)
+
+def main():
+    if not (os.getenv("IMAP_USER") and os.getenv("IMAP_PASS")):
+        raise SystemExit("IMAP_USER/IMAP_PASS faltando (.env).")
+
+    folders = [f.strip() for f in os.getenv("IMAP_IDLE_FOLDERS", os.getenv("IMAP_FOLDER", "INBOX")).split(",") if f.strip()]
+    stop = threading.Event()
+
+    def _shutdown(*_):
+        stop.set()
+    signal.signal(signal.SIGINT, _shutdown)
+    signal.signal(signal.SIGTERM, _shutdown)
+
+    threads = [threading.Thread(target=watch_folder, args=(f, stop), name=f"idle-{f}", daemon=True) for f in folders]
+    for t in threads:
+        t.start()
+    print(f"Daemon IDLE ativo em: {', '.join(folders)} (Ctrl+C para sair)")
+    while not stop.is_set():
+        time.sleep(1)
+    print("Encerrando...")
+
+if __name__ == "__main__":
+    main()
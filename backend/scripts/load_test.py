@@ -0,0 +1,84 @@
+import argparse, asyncio, json, time
+from typing import Dict, List, Optional
+
+import httpx
+import numpy as np
+
+# Teste de carga da API: N clientes concorrentes repetem as requisições durante D segundos
+# e o relatório traz requisições/s, erros e latência p50/p90/p99 (ms).
+# Para comparar duas versões (ex.: handlers síncronos x assíncronos), rode com a mesma
+# --concurrency e compare rps no mesmo p99.
+# Uso: python -m scripts.load_test --url http://127.0.0.1:8000 \
+#        --path "/api/emails?limit=20" --path /api/emails/<id> --concurrency 64 --duration 20
+
+async def _worker(client: httpx.AsyncClient, paths: List[str], method: str, body: Optional[Dict],
+                  deadline: float, warmup_until: float, lat: List[float], status: Dict[str, int], offset: int):
+    i = offset
+    while True:
+        now = time.perf_counter()
+        if now >= deadline:
+            return
+        path = paths[i % len(paths)]
+        i += 1
+        t0 = time.perf_counter()
+        try:
+            r = await client.request(method, path, json=body)
+            key = str(r.status_code)
+        except httpx.HTTPError as e:
+            key = type(e).__name__
+        if t0 < warmup_until:
+            continue  # aquecimento: conexões e caches, fora do relatório
+        lat.append(time.perf_counter() - t0)
+        status[key] = status.get(key, 0) + 1
+
+async def run(url: str, paths: List[str], method: str, body: Optional[Dict],
+              concurrency: int, duration: float, warmup: float, http2: bool) -> Dict:
+    lat: List[float] = []
+    status: Dict[str, int] = {}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30.0, http2=http2) as client:
+        start = time.perf_counter()
+        warmup_until = start + warmup
+        deadline = warmup_until + duration
+        await asyncio.gather(*[
+            _worker(client, paths, method, body, deadline, warmup_until, lat, status, k)
+            for k in range(concurrency)
+        ])
+    ms = np.asarray(lat) * 1000.0 if lat else np.zeros(1)
+    ok = sum(n for k, n in status.items() if k.startswith("2"))
+    return {
+        "url": url, "paths": paths, "method": method, "concurrency": concurrency, "duration_s": duration,
+        "requests": len(lat), "ok": ok, "errors": len(lat) - ok, "status": status,
+        "rps": round(len(lat) / duration, 1),
+        "p50_ms": round(float(np.percentile(ms, 50)), 2),
+        "p90_ms": round(float(np.percentile(ms, 90)), 2),
+        "p99_ms": round(float(np.percentile(ms, 99)), 2),
+        "max_ms": round(float(ms.max()), 2),
+    }
+
+def main():
+    p = argparse.ArgumentParser(description="Teste de carga (rps e latência) da API")
+    p.add_argument("--url", default="http://127.0.0.1:8000")
+    p.add_argument("--path", action="append", help="caminho(s) requisitados em rodízio (repetível)")
+    p.add_argument("--method", default="GET")
+    p.add_argument("--json", default=None, help="corpo JSON (POST)")
+    p.add_argument("--concurrency", type=int, default=64)
+    p.add_argument("--duration", type=float, default=20.0)
+    p.add_argument("--warmup", type=float, default=2.0)
+    p.add_argument("--http2", action="store_true", help="cliente em HTTP/2 (servidor precisa suportar)")
+    p.add_argument("--out", default=None, help="grava o relatório em JSON")
+    args = p.parse_args()
+
+    paths = args.path or ["/api/emails?limit=20"]
+    body = json.loads(args.json) if args.json else None
+    report = asyncio.run(run(args.url, paths, args.method.upper(), body,
+                             args.concurrency, args.duration, args.warmup, args.http2))
+    print(f"{report['requests']} requisições em {args.duration:.0f}s com {args.concurrency} clientes "
+          f"-> {report['rps']} req/s | erros: {report['errors']} {report['status']}")
+    print(f"latência p50={report['p50_ms']}ms p90={report['p90_ms']}ms p99={report['p99_ms']}ms max={report['max_ms']}ms")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+if __name__ == "__main__":
+    main()
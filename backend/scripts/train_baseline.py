@@ -5,6 +5,7 @@ from sklearn.linear_model import LogisticRegression
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report, confusion_matrix, accuracy_score
 import joblib
+from app.nlp.frozen import export_frozen
 
 DATA_PATH = "data/examples.csv"
 MODEL_DIR = "app/nlp/models"
@@ -66,7 +67,10 @@ def main():
 
     joblib.dump(vectorizer, VEC_PATH)
     joblib.dump(clf, CLF_PATH)
-    print(f"\n✔ Modelo salvo em:\n  {VEC_PATH}\n  {CLF_PATH}\n")
+    # formato de inferência congelado (vocabulário ordenado + idf + coeficientes, mmap)
+    frozen_paths = export_frozen(vectorizer, clf, MODEL_DIR)
+    paths = "\n  ".join([VEC_PATH, CLF_PATH] + frozen_paths)
+    print(f"\n✔ Modelo salvo em:\n  {paths}\n")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,207 @@
+import argparse, csv, io, json, os, random, time
+from typing import Dict, Iterator, List, Tuple
+
+import joblib
+import numpy as np
+from sklearn.base import clone
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression, SGDClassifier
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import GridSearchCV, RandomizedSearchCV, StratifiedKFold, train_test_split
+from sklearn.pipeline import Pipeline
+
+from app.nlp.frozen import export_frozen
+from scripts.train_baseline import DATA_PATH, MODEL_DIR, VEC_PATH, CLF_PATH, strip_accents
+
+# Seleção de modelo com busca em grade/aleatória (validação cruzada, todos os núcleos)
+# e relatório de custo de inferência por candidato.
+# - O CSV (text,label) é lido em streaming; acima de --max-rows entra uma amostra
+#   uniforme (reservoir sampling), então a memória não cresce com o corpus.
+# - Para cada candidato: acurácia (CV e holdout), tamanho do vocabulário, bytes do modelo
+#   (joblib) e latência p50/p99 de 1 documento e de lote (transform + predict_proba).
+# - Relatório em JSON + markdown (--out); --save-best grava o melhor candidato dentro do
+#   orçamento de latência (--max-p99-ms) nos mesmos artefatos do train_baseline.
+# Uso: python -m scripts.train_search --search random --n-iter 20 --max-p99-ms 5 --save-best
+
+GRID = {
+    "vec__ngram_range": [(1, 1), (1, 2)],
+    "vec__min_df": [1, 2],
+    "vec__sublinear_tf": [False, True],
+    "vec__max_features": [None, 50000],
+    "clf": [
+        LogisticRegression(max_iter=2000, class_weight="balanced", solver="liblinear", C=c)
+        for c in (0.5, 1.0, 4.0)
+    ] + [
+        SGDClassifier(loss="log_loss", alpha=a, class_weight="balanced", random_state=42)
+        for a in (1e-5, 1e-4)
+    ],
+}
+
+def stream_rows(path: str) -> Iterator[Tuple[str, str]]:
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        for row in csv.DictReader(f):
+            t = (row.get("text") or "").strip()
+            y = (row.get("label") or "").strip()
+            if t and y:
+                yield t, y
+
+def reservoir(rows: Iterator[Tuple[str, str]], k: int, seed: int = 42) -> Tuple[List[Tuple[str, str]], int]:
+    # amostra uniforme de até k linhas numa passada (algoritmo R); devolve (amostra, total lido)
+    rnd = random.Random(seed)
+    sample: List[Tuple[str, str]] = []
+    n = 0
+    for n, row in enumerate(rows, start=1):
+        if len(sample) < k:
+            sample.append(row)
+        else:
+            j = rnd.randrange(n)
+            if j < k:
+                sample[j] = row
+    return sample, n
+
+def _describe(params: Dict) -> str:
+    clf = params["clf"]
+    knob = f"C={clf.C}" if isinstance(clf, LogisticRegression) else f"alpha={clf.alpha}"
+    vec = {k.split("__", 1)[1]: v for k, v in params.items() if k.startswith("vec__")}
+    return f"{type(clf).__name__}({knob}) " + " ".join(f"{k}={v}" for k, v in sorted(vec.items()))
+
+def _percentiles(samples: List[float]) -> Tuple[float, float]:
+    arr = np.asarray(samples) * 1000.0
+    return float(np.percentile(arr, 50)), float(np.percentile(arr, 99))
+
+def measure(pipe: Pipeline, docs: List[str], batch: int, rounds: int) -> Dict:
+    vec, clf = pipe.named_steps["vec"], pipe.named_steps["clf"]
+    single: List[float] = []
+    for _ in range(rounds):
+        for d in docs:
+            t0 = time.perf_counter()
+            clf.predict_proba(vec.transform([d]))
+            single.append(time.perf_counter() - t0)
+    batched: List[float] = []
+    for _ in range(rounds):
+        for i in range(0, len(docs), batch):
+            t0 = time.perf_counter()
+            clf.predict_proba(vec.transform(docs[i:i + batch]))
+            batched.append(time.perf_counter() - t0)
+    buf = io.BytesIO()
+    joblib.dump((vec, clf), buf)
+    s50, s99 = _percentiles(single)
+    b50, b99 = _percentiles(batched)
+    return {
+        "vocab_size": len(vec.vocabulary_),
+        "model_bytes": buf.getbuffer().nbytes,
+        "single_p50_ms": round(s50, 3), "single_p99_ms": round(s99, 3),
+        "batch_p50_ms": round(b50, 3), "batch_p99_ms": round(b99, 3),
+    }
+
+def write_markdown(path: str, report: Dict):
+    lines = [
+        f"# Busca de modelo ({report['search']}, {report['cv_folds']} folds)",
+        "",
+        f"Linhas lidas: {report['rows_read']} · usadas: {report['rows_used']} · "
+        f"lote de inferência: {report['batch_size']}",
+        "",
+        "| # | candidato | CV acc | holdout acc | vocab | bytes | 1 doc p50/p99 (ms) | lote p50/p99 (ms) |",
+        "|---|---|---|---|---|---|---|---|",
+    ]
+    for i, c in enumerate(report["candidates"], start=1):
+        lines.append(
+            f"| {i} | {c['name']} | {c['cv_accuracy']:.3f} | {c['holdout_accuracy']:.3f} | {c['vocab_size']} | "
+            f"{c['model_bytes']} | {c['single_p50_ms']:.2f} / {c['single_p99_ms']:.2f} | "
+            f"{c['batch_p50_ms']:.2f} / {c['batch_p99_ms']:.2f} |"
+        )
+    if report.get("selected"):
+        lines += ["", f"Selecionado: **{report['selected']}**"]
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+def main():
+    p = argparse.ArgumentParser(description="Busca de hiperparâmetros + relatório de latência")
+    p.add_argument("--data", default=DATA_PATH)
+    p.add_argument("--max-rows", type=int, default=200000, help="amostra máxima (reservoir sampling)")
+    p.add_argument("--search", choices=["grid", "random"], default="grid")
+    p.add_argument("--n-iter", type=int, default=20, help="candidatos na busca aleatória")
+    p.add_argument("--cv", type=int, default=5)
+    p.add_argument("--n-jobs", type=int, default=-1)
+    p.add_argument("--top", type=int, default=10, help="candidatos (por CV) medidos no relatório")
+    p.add_argument("--batch", type=int, default=int(os.getenv("INGEST_NLP_BATCH", "16")))
+    p.add_argument("--rounds", type=int, default=3, help="repetições da medição de latência")
+    p.add_argument("--max-p99-ms", type=float, default=0.0, help="orçamento de p99 de 1 documento (0 = sem)")
+    p.add_argument("--out", default="reports")
+    p.add_argument("--save-best", action="store_true")
+    args = p.parse_args()
+
+    sample, total = reservoir(stream_rows(args.data), args.max_rows)
+    if not sample:
+        raise SystemExit(f"Nenhum dado em {args.data}. Adicione linhas com 'text,label'.")
+    texts = [strip_accents(t) for t, _ in sample]
+    labels = [y for _, y in sample]
+    print(f"{total} linhas lidas, {len(sample)} usadas")
+
+    X_train, X_test, y_train, y_test = train_test_split(
+        texts, labels, test_size=0.25, random_state=42, stratify=labels
+    )
+    pipe = Pipeline([("vec", TfidfVectorizer(analyzer="word", max_df=0.95)), ("clf", LogisticRegression())])
+    cv = StratifiedKFold(n_splits=args.cv, shuffle=True, random_state=42)
+    if args.search == "grid":
+        search = GridSearchCV(pipe, GRID, cv=cv, n_jobs=args.n_jobs, scoring="accuracy", refit=False)
+    else:
+        search = RandomizedSearchCV(pipe, GRID, n_iter=args.n_iter, cv=cv, n_jobs=args.n_jobs,
+                                    scoring="accuracy", refit=False, random_state=42)
+    t0 = time.perf_counter()
+    search.fit(X_train, y_train)
+    print(f"Busca: {len(search.cv_results_['params'])} candidatos em {time.perf_counter() - t0:.1f}s")
+
+    res = search.cv_results_
+    order = np.argsort(res["rank_test_score"], kind="stable")[: max(1, args.top)]
+    candidates = []
+    for idx in order:
+        params = res["params"][idx]
+        model = clone(pipe).set_params(**params).fit(X_train, y_train)
+        stats = measure(model, X_test, args.batch, args.rounds)
+        candidates.append({
+            "name": _describe(params),
+            "params": {k: (repr(v) if k == "clf" else v) for k, v in params.items()},
+            "cv_accuracy": float(res["mean_test_score"][idx]),
+            "cv_std": float(res["std_test_score"][idx]),
+            "holdout_accuracy": float(accuracy_score(y_test, model.predict(X_test))),
+            **stats,
+            "_model": model,
+        })
+        c = candidates[-1]
+        print(f"  {c['name']}: cv={c['cv_accuracy']:.3f} holdout={c['holdout_accuracy']:.3f} "
+              f"vocab={c['vocab_size']} p99={c['single_p99_ms']:.2f}ms")
+
+    within = [c for c in candidates if not args.max_p99_ms or c["single_p99_ms"] <= args.max_p99_ms]
+    best = max(within, key=lambda c: c["cv_accuracy"]) if within else None
+
+    report = {
+        "search": args.search, "cv_folds": args.cv, "rows_read": total, "rows_used": len(sample),
+        "batch_size": args.batch, "max_p99_ms": args.max_p99_ms,
+        "selected": best["name"] if best else None,
+        "candidates": [{k: v for k, v in c.items() if k != "_model"} for c in candidates],
+    }
+    os.makedirs(args.out, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    json_path = os.path.join(args.out, f"train_search-{stamp}.json")
+    md_path = os.path.join(args.out, f"train_search-{stamp}.md")
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    write_markdown(md_path, report)
+    print(f"\nRelatório: {json_path}\n           {md_path}")
+
+    if args.save_best:
+        if best is None:
+            raise SystemExit("Nenhum candidato dentro do orçamento de latência; nada salvo.")
+        # refit no conjunto inteiro, mesmos artefatos do train_baseline
+        model = clone(best["_model"]).fit(texts, labels)
+        vec, clf = model.named_steps["vec"], model.named_steps["clf"]
+        os.makedirs(MODEL_DIR, exist_ok=True)
+        joblib.dump(vec, VEC_PATH)
+        joblib.dump(clf, CLF_PATH)
+        frozen_paths = export_frozen(vec, clf, MODEL_DIR)
+        paths = "\n  ".join([VEC_PATH, CLF_PATH] + frozen_paths)
+        print(f"\n✔ {best['name']} salvo em:\n  {paths}\n")
+
+if __name__ == "__main__":
+    main()
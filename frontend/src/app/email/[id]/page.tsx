@@ -1,4 +1,4 @@
-import { API_BASE } from "@/lib/api"
+import { API_BASE, fetchRevalidated } from "@/lib/api"
 import ActionPanel from "@/components/ActionPanel"
 import Link from "next/link"
 import { ArrowLeft, Mail, Paperclip } from "lucide-react"
@@ -28,6 +28,7 @@ type EmailResp = {
     message_uid?: string
   }
   content: EmailContent | null
+  draft?: { draft: string; model?: string; source?: string; created_at?: string } | null
 }
 
 export default async function EmailPage({
@@ -38,7 +39,7 @@ export default async function EmailPage({
 }) {
   const { id } = await params
   const url = `${API_BASE}/api/emails/${encodeURIComponent(id)}`
-  const res = await fetch(url, { cache: "no-store" })
+  const res = await fetchRevalidated(url)
 
   if (!res.ok) {
     const txt = await res.text().catch(() => "")
@@ -193,7 +194,14 @@ ${txt}`}
 
           {/* Action Panel */}
           <div className="bg-gray-900/50 border border-gray-700 rounded-lg p-6">
-            <ActionPanel emailId={m.id} defaultToEmail="bbitteste@gmail.com" initialDraft={m.reply_suggested || ""} />
+            {data.draft?.source === "pregen" && (
+              <p className="text-xs text-gray-400 mb-3">Rascunho pré-gerado ({data.draft.model})</p>
+            )}
+            <ActionPanel
+              emailId={m.id}
+              defaultToEmail="bbitteste@gmail.com"
+              initialDraft={data.draft?.draft || m.reply_suggested || ""}
+            />
           </div>
         </div>
       </div>
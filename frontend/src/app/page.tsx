@@ -4,6 +4,7 @@ import { Badge } from "@/components/ui/badge"
 import { Button } from "@/components/ui/button"
 import { Mail, Brain, Sparkles, RefreshCw } from "lucide-react"
 import RefreshButton from "@/components/RefreshButton";
+import { fetchRevalidated } from "@/lib/api";
 
 
 const API_BASE = (process.env.NEXT_PUBLIC_API_BASE ?? "http://127.0.0.1:8000").replace(/\/$/, "");
@@ -17,9 +18,10 @@ type EmailItem = {
   importance_label?: string
   summary?: string
   received_at?: string
+  snippet?: string // só na busca: HTML já escapado pela API, termos em <mark>
 }
 
-type ListResp = { items: EmailItem[]; page: number; limit: number }
+type ListResp = { items: EmailItem[]; limit: number; next_cursor?: string | null; page?: number; has_more?: boolean }
 
 function resolveOpenId(m: EmailItem): string {
   return m.id ?? m.message_uid ?? m.email_id ?? ""
@@ -61,13 +63,24 @@ function getImportanceColor(importance?: string) {
 export const dynamic = 'force-dynamic';
 export const revalidate = 0;
 
-export default async function Page() {
+export default async function Page({
+  searchParams,
+}: {
+  searchParams?: Promise<Record<string, string | string[] | undefined>>
+}) {
   let data: ListResp | null = null;
   let error = false;
+  const sp = (await searchParams) ?? {};
+  const cursor = typeof sp.cursor === "string" ? sp.cursor : "";
+  const q = typeof sp.q === "string" ? sp.q.trim() : "";
+  const page = Math.max(1, Number(typeof sp.page === "string" ? sp.page : "1") || 1);
 
   try {
-    const url = `${API_BASE}/api/emails?limit=50`;
-    const res = await fetch(url, { cache: "no-store" });
+    // busca textual (/api/search, paginada por página) ou lista por cursor (next_cursor opaco)
+    const url = q
+      ? `${API_BASE}/api/search?q=${encodeURIComponent(q)}&limit=20&page=${page}`
+      : `${API_BASE}/api/emails?limit=50${cursor ? `&cursor=${encodeURIComponent(cursor)}` : ""}`;
+    const res = q ? await fetch(url, { cache: "no-store" }) : await fetchRevalidated(url);
     if (res.ok) {
       data = await res.json();
     } else {
@@ -147,6 +160,17 @@ export default async function Page() {
           </Card>
         </div>
 
+        <form action="/" method="get" className="flex gap-2 mb-6">
+          <input
+            type="search"
+            name="q"
+            defaultValue={q}
+            placeholder="Buscar no assunto, resumo e corpo…"
+            className="flex-1 rounded-md border border-border bg-card px-3 py-2 text-sm text-foreground"
+          />
+          <Button type="submit" size="sm">Buscar</Button>
+        </form>
+
         {error && (
           <Card className="bg-red-950/50 border-red-800/50">
             <CardContent className="p-6">
@@ -196,7 +220,12 @@ export default async function Page() {
                   </CardHeader>
 
                   <CardContent className="pt-0">
-                    {email.summary && (
+                    {email.snippet ? (
+                      <p
+                        className="text-muted-foreground text-sm mb-4 text-pretty leading-relaxed line-clamp-3"
+                        dangerouslySetInnerHTML={{ __html: email.snippet }}
+                      />
+                    ) : email.summary && (
                       <p className="text-muted-foreground text-sm mb-4 text-pretty leading-relaxed line-clamp-3">
                         {email.summary}
                       </p>
@@ -223,6 +252,23 @@ export default async function Page() {
                 </Card>
               )
             })}
+            <div className="flex justify-end gap-2 pt-2">
+              {(cursor || page > 1) && (
+                <Button variant="outline" size="sm" asChild>
+                  <Link href={q ? `/?q=${encodeURIComponent(q)}` : "/"}>{q ? "Primeira página" : "Mais recentes"}</Link>
+                </Button>
+              )}
+              {q && data?.has_more && (
+                <Button variant="outline" size="sm" asChild>
+                  <Link href={`/?q=${encodeURIComponent(q)}&page=${page + 1}`}>Próxima página</Link>
+                </Button>
+              )}
+              {!q && data?.next_cursor && (
+                <Button variant="outline" size="sm" asChild>
+                  <Link href={`/?cursor=${encodeURIComponent(data.next_cursor)}`}>Próxima página</Link>
+                </Button>
+              )}
+            </div>
           </div>
         )}
       </main>
@@ -5,10 +5,26 @@ import { Send, Sparkles, Mail, Shield, CheckCircle } from "lucide-react"
 
 const API_BASE = process.env.NEXT_PUBLIC_API_BASE || "http://127.0.0.1:8000"
 
-type GroqSuggestResponse = { draft_reply: string; category: string; confidence: number }
+type SuggestEvent =
+  | { event: "meta"; data: { category: string; confidence: number; cached: boolean } }
+  | { event: "delta"; data: { text: string } }
+  | { event: "done"; data: { draft: string } }
+  | { event: "error"; data: { detail: string } }
 type SendIntentResponse = { request_id: string; masked_to: string }
 type SendConfirmResponse = { queued: boolean }
 
+// um frame SSE ("event: x\ndata: {...}") -> evento tipado
+function parseSseFrame(frame: string): SuggestEvent | null {
+  let event = "message"
+  const data: string[] = []
+  for (const line of frame.split("\n")) {
+    if (line.startsWith("event:")) event = line.slice(6).trim()
+    else if (line.startsWith("data:")) data.push(line.slice(5).trim())
+  }
+  if (!data.length) return null
+  return { event, data: JSON.parse(data.join("\n")) } as SuggestEvent
+}
+
 export default function ActionPanel(props: { emailId: string; defaultToEmail?: string; initialDraft?: string }) {
   const [toEmail, setToEmail] = useState(props.defaultToEmail || "")
   const [draft, setDraft] = useState(props.initialDraft || "")
@@ -23,14 +39,38 @@ export default function ActionPanel(props: { emailId: string; defaultToEmail?: s
     setLoading("suggest")
     setError(null)
     try {
-      const res = await fetch(`${API_BASE}/api/groq/suggest`, {
+      // streaming (SSE): o rascunho aparece token a token no textarea
+      const res = await fetch(`${API_BASE}/api/groq/suggest/stream`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({ email_id: props.emailId }),
       })
-      if (!res.ok) throw new Error(await res.text())
-      const data: GroqSuggestResponse = await res.json()
-      setDraft(data.draft_reply || "")
+      if (!res.ok || !res.body) throw new Error(await res.text())
+      const reader = res.body.getReader()
+      const decoder = new TextDecoder()
+      let buffer = ""
+      let text = ""
+      setDraft("")
+      for (;;) {
+        const { done, value } = await reader.read()
+        if (done) break
+        buffer += decoder.decode(value, { stream: true })
+        let sep = buffer.indexOf("\n\n")
+        while (sep >= 0) {
+          const ev = parseSseFrame(buffer.slice(0, sep))
+          buffer = buffer.slice(sep + 2)
+          sep = buffer.indexOf("\n\n")
+          if (!ev) continue
+          if (ev.event === "delta") {
+            text += ev.data.text
+            setDraft(text)
+          } else if (ev.event === "done") {
+            setDraft(ev.data.draft || text)
+          } else if (ev.event === "error") {
+            throw new Error(ev.data.detail)
+          }
+        }
+      }
     } catch (e: unknown) {
       if (e instanceof Error) {
         setError(e.message)
@@ -3,6 +3,39 @@ export const API_BASE =
   process.env.API_BASE ??
   "http://127.0.0.1:8000";
 
+// GET condicional no servidor do Next: guarda corpo + ETag/Last-Modified por URL e
+// revalida com If-None-Match/If-Modified-Since; no 304 devolve o corpo guardado como 200.
+// A API (/api/emails, /api/emails/{id}) responde 304 sem consultar o banco quando nada mudou.
+const REVALIDATE_MAX = 200;
+const revalidated = new Map<string, { etag: string | null; lastModified: string | null; body: string }>();
+
+export async function fetchRevalidated(url: string): Promise<Response> {
+  const prev = revalidated.get(url);
+  const headers: Record<string, string> = {};
+  if (prev?.etag) headers["If-None-Match"] = prev.etag;
+  else if (prev?.lastModified) headers["If-Modified-Since"] = prev.lastModified;
+
+  const res = await fetch(url, { cache: "no-store", headers });
+  if (res.status === 304 && prev) {
+    revalidated.delete(url); // reinsere no fim: Map em ordem de uso, o mais antigo sai primeiro
+    revalidated.set(url, prev);
+    return new Response(prev.body, { status: 200, headers: { "Content-Type": "application/json" } });
+  }
+  const etag = res.headers.get("etag");
+  const lastModified = res.headers.get("last-modified");
+  if (!res.ok || (!etag && !lastModified)) {
+    revalidated.delete(url);
+    return res;
+  }
+  const body = await res.text();
+  revalidated.delete(url);
+  revalidated.set(url, { etag, lastModified, body });
+  if (revalidated.size > REVALIDATE_MAX) {
+    revalidated.delete(revalidated.keys().next().value as string);
+  }
+  return new Response(body, { status: res.status, headers: res.headers });
+}
+
 export async function apiGet<T>(path: string) {
   const res = await fetch(`${API_BASE}${path}`, { cache: "no-store" });
   if (!res.ok) throw new Error(`GET ${path} -> ${res.status}`);